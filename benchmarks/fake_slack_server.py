@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BENCHMARK_CHANNEL_ID = "CBENCH"
+BENCHMARK_CHANNEL_NAME = "benchmark"
+RANDOM_BLOCK = os.urandom(1024 * 1024)  # image bytes are served from this block, so large files cost no memory
+
+
+def create_file_id(size: int, number: int) -> str:
+    """ The fake server reads the image size back from the file id """
+    return f"F{size}x{number}"
+
+
+def get_size_from_file_id(file_id: str) -> int:
+    return int(file_id[1:].split("x")[0])
+
+
+class FakeSlackRequestHandler(BaseHTTPRequestHandler):
+    """ Answers `files.info` and serves the image bytes the way files.slack.com does """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like Slack
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/api/files.info":
+            self._send_file_info(parse_qs(url.query)["file"][0])
+        elif url.path.startswith("/files/"):
+            self._send_image(url.path.split("/")[2])
+        else:
+            self.send_error(404)
+
+    def _send_file_info(self, file_id: str):
+        base_url = f"http://{self.headers['Host']}"
+        body = json.dumps({
+            "ok": True,
+            "file": {
+                "id": file_id,
+                "name": f"{file_id}.jpg",
+                "size": get_size_from_file_id(file_id),
+                "channels": [BENCHMARK_CHANNEL_ID],
+                "shares": {"public": {BENCHMARK_CHANNEL_ID: [{"channel_name": BENCHMARK_CHANNEL_NAME, "ts": "1"}]}},
+                "url_private": f"{base_url}/files/{file_id}/{file_id}.jpg",
+            },
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_image(self, file_id: str):
+        size = get_size_from_file_id(file_id)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+
+        remaining = size
+        while remaining > 0:
+            chunk = RANDOM_BLOCK[:min(remaining, len(RANDOM_BLOCK))]
+            self.wfile.write(chunk)
+            remaining -= len(chunk)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeSlackServer:
+    """ Local stand-in for slack.com and files.slack.com, running in a background thread """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), FakeSlackRequestHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> "FakeSlackServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
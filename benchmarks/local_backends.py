@@ -0,0 +1,207 @@
+""" Local stand-ins for the storage backends: an S3 endpoint (moto) and an in-process paramiko SFTP server """
+import os
+import socket
+import threading
+
+import paramiko
+
+BENCHMARK_BUCKET = "slack-events-benchmark"
+SFTP_USERNAME = "benchmark"
+SFTP_PASSWORD = "benchmark"
+
+
+class LocalS3Server:
+    """ moto's S3 endpoint - requires the `moto[server]` dependency (only used for benchmarks) """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        from moto.server import ThreadedMotoServer
+
+        self._server = ThreadedMotoServer(ip_address=host, port=port or get_free_port(host), verbose=False)
+        self._host = host
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._server.get_host_and_port()
+        return f"http://{host}:{port}"
+
+    def environment(self) -> dict:
+        """ Environment variables pointing boto3 to the local endpoint """
+        return {
+            "AWS_ENDPOINT_URL_S3": self.endpoint_url,
+            "AWS_ACCESS_KEY_ID": "benchmark",
+            "AWS_SECRET_ACCESS_KEY": "benchmark",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        }
+
+    def start(self) -> "LocalS3Server":
+        import boto3
+
+        self._server.start()
+        environment = self.environment()
+        boto3.client(
+            "s3",
+            endpoint_url=environment["AWS_ENDPOINT_URL_S3"],
+            aws_access_key_id=environment["AWS_ACCESS_KEY_ID"],
+            aws_secret_access_key=environment["AWS_SECRET_ACCESS_KEY"],
+            region_name=environment["AWS_DEFAULT_REGION"],
+        ).create_bucket(Bucket=BENCHMARK_BUCKET)
+        return self
+
+    def stop(self) -> None:
+        self._server.stop()
+
+
+class _PasswordServer(paramiko.ServerInterface):
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (SFTP_USERNAME, SFTP_PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as error:
+            return paramiko.SFTPServer.convert_errno(error.errno)
+
+    def chattr(self, attr):
+        return paramiko.SFTP_OK
+
+
+class _DirectorySFTPServer(paramiko.SFTPServerInterface):
+    """ Serves a local directory - paths are resolved inside `root` """
+
+    root = None
+
+    def _local_path(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def _call(self, func, *args):
+        try:
+            func(*args)
+        except OSError as error:
+            return paramiko.SFTPServer.convert_errno(error.errno)
+        return paramiko.SFTP_OK
+
+    def list_folder(self, path):
+        local_path = self._local_path(path)
+        try:
+            attributes = []
+            for file_name in os.listdir(local_path):
+                attribute = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local_path, file_name)))
+                attribute.filename = file_name
+                attributes.append(attribute)
+            return attributes
+        except OSError as error:
+            return paramiko.SFTPServer.convert_errno(error.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local_path(path)))
+        except OSError as error:
+            return paramiko.SFTPServer.convert_errno(error.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        local_path = self._local_path(path)
+        try:
+            file_descriptor = os.open(local_path, flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as error:
+            return paramiko.SFTPServer.convert_errno(error.errno)
+
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+
+        handle = _SFTPHandle(flags)
+        handle.filename = local_path
+        handle.readfile = handle.writefile = os.fdopen(file_descriptor, mode)
+        return handle
+
+    def remove(self, path):
+        return self._call(os.remove, self._local_path(path))
+
+    def rename(self, old_path, new_path):
+        if os.path.exists(self._local_path(new_path)):
+            return paramiko.SFTP_FAILURE
+        return self._call(os.rename, self._local_path(old_path), self._local_path(new_path))
+
+    def posix_rename(self, old_path, new_path):
+        return self._call(os.replace, self._local_path(old_path), self._local_path(new_path))
+
+    def mkdir(self, path, attr):
+        return self._call(os.mkdir, self._local_path(path))
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, self._local_path(path))
+
+    def chattr(self, path, attr):
+        return paramiko.SFTP_OK
+
+
+class LocalSFTPServer:
+    """ In-process SFTP server storing the files in `root_directory` """
+
+    def __init__(self, root_directory: str, host="127.0.0.1", port=0):
+        self.root_directory = root_directory
+        self._host_key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._transports = []
+        self._running = False
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._socket.getsockname()
+
+    def credentials(self) -> dict:
+        host, port = self.address
+        return {"sftp_host": host, "sftp_port": port, "sftp_username": SFTP_USERNAME, "sftp_password": SFTP_PASSWORD}
+
+    def start(self) -> "LocalSFTPServer":
+        self._socket.listen(100)
+        self._running = True
+        threading.Thread(target=self._accept_connections, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        self._socket.close()
+        for transport in self._transports:
+            transport.close()
+
+    def _accept_connections(self):
+        server_class = type("DirectorySFTPServer", (_DirectorySFTPServer,), {"root": self.root_directory})
+        while self._running:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:  # the server was stopped
+                return
+
+            transport = paramiko.Transport(connection)
+            transport.add_server_key(self._host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, server_class)
+            transport.start_server(server=_PasswordServer())
+            self._transports.append(transport)
+
+
+def get_free_port(host="127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as free_socket:
+        free_socket.bind((host, 0))
+        return free_socket.getsockname()[1]
@@ -0,0 +1,245 @@
+""" Offline benchmarks for cold starts, warm invocations, throughput and peak memory of `main.slack_events_callback`,
+    against a fake Slack server and local S3 (moto) and SFTP (paramiko) stand-ins.
+
+    python -m benchmarks.run_benchmarks --backends s3 sftp --output bench_output.txt
+
+    Each backend runs in fresh interpreters, since the storage backend is read from the config when it is imported.
+    The results are written as JSON so they can be compared between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_slack_server import FakeSlackServer
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_APP_ID = "ABENCHMARK"
+KILOBYTE = 1024
+MEGABYTE = 1024 * KILOBYTE
+
+DEFAULT_IMAGE_SIZES = [64 * KILOBYTE, 1 * MEGABYTE, 8 * MEGABYTE, 32 * MEGABYTE]
+
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(durations_ms: list) -> dict:
+    return {
+        "count": len(durations_ms),
+        "mean_ms": statistics.fmean(durations_ms),
+        "p50_ms": percentile(durations_ms, 50),
+        "p90_ms": percentile(durations_ms, 90),
+        "p99_ms": percentile(durations_ms, 99),
+        "max_ms": max(durations_ms),
+    }
+
+
+def create_lambda_event(file_size: int, number: int) -> dict:
+    """ API Gateway event for a `file_shared` event, unique per number so duplicates aren't skipped """
+    from benchmarks.fake_slack_server import BENCHMARK_CHANNEL_ID, create_file_id
+
+    return {
+        "headers": {"x-slack-request-timestamp": str(int(time.time()))},
+        "queryStringParameters": {},
+        "body": {
+            "type": "event_callback",
+            "api_app_id": BENCHMARK_APP_ID,
+            "event_id": f"Ev{time.time_ns()}{number}",
+            "event": {
+                "type": "file_shared",
+                "file_id": create_file_id(file_size, time.time_ns() + number),
+                "channel_id": BENCHMARK_CHANNEL_ID,
+            },
+        },
+    }
+
+
+def configure_process(backend: str, slack_api_base_url: str) -> None:
+    """ Points the project to the local stand-ins - must run before the project modules are imported """
+    import config
+
+    config.SOURCE_CONNECTION = backend
+    config.PROCESSING_MODE = "sync"
+
+    from slack_api import SlackApiRequester
+    SlackApiRequester.SLACK_API_BASE_URL = slack_api_base_url
+
+
+def invoke(main_module, file_size: int, number: int) -> float:
+    """ Runs one invocation and returns its duration in milliseconds """
+    event = create_lambda_event(file_size, number)
+    start = time.perf_counter()
+    response = main_module.slack_events_callback(event, {})
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    outcome = response["body"].get("outcome")
+    if outcome != "saved":
+        raise RuntimeError(f"Benchmark invocation was not saved: {response}")
+    return duration_ms
+
+
+# Worker processes --------------------------------------------------------------------
+
+def run_cold_start_worker(backend: str, slack_api_base_url: str, file_size: int) -> dict:
+    """ Measures initialization (importing main, with the platform preload) and the first invocation """
+    start = time.perf_counter()
+    import config
+    config.SOURCE_CONNECTION = backend
+    import main
+    init_ms = (time.perf_counter() - start) * 1000
+
+    configure_process(backend, slack_api_base_url)
+    first_invocation_ms = invoke(main, file_size, 0)
+    return {"init_ms": init_ms, "first_invocation_ms": first_invocation_ms}
+
+
+def run_warm_worker(backend: str, slack_api_base_url: str, iterations: int, warm_size: int, sizes: list) -> dict:
+    import tracemalloc
+
+    configure_process(backend, slack_api_base_url)
+    import main
+
+    invoke(main, warm_size, -1)  # the cold invocation isn't counted
+    warm_durations = [invoke(main, warm_size, number) for number in range(iterations)]
+
+    throughput = {}
+    for size in sizes:
+        repetitions = max(1, min(10, (64 * MEGABYTE) // size))
+        durations = [invoke(main, size, number) for number in range(repetitions)]
+        throughput[str(size)] = {
+            "image_bytes": size,
+            **summarize(durations),
+            "mb_per_second": (size * repetitions / MEGABYTE) / (sum(durations) / 1000),
+        }
+
+    peak_memory = {}
+    for size in sizes:
+        tracemalloc.start()
+        invoke(main, size, 0)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_memory[str(size)] = {"image_bytes": size, "peak_python_allocations_bytes": peak_bytes}
+
+    return {
+        "warm_invocation": {"image_bytes": warm_size, **summarize(warm_durations)},
+        "throughput": throughput,
+        "peak_memory": peak_memory,
+    }
+
+
+# Orchestration ------------------------------------------------------------------------
+
+def run_worker_process(mode: str, backend: str, environment: dict, arguments: list) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--worker", mode, "--backends", backend, *arguments],
+        cwd=PROJECT_DIRECTORY,
+        env={**os.environ, **environment},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def start_backend(backend: str, temp_directory: str):
+    """ Returns the running stand-in and the app credentials pointing to it """
+    from benchmarks import local_backends
+
+    credentials = {"slack_app_id": BENCHMARK_APP_ID, "slack_bot_token": "xoxb-benchmark"}
+    if backend == "s3":
+        server = local_backends.LocalS3Server().start()
+        credentials["bucket_name"] = local_backends.BENCHMARK_BUCKET
+        return server, credentials, server.environment()
+    elif backend == "sftp":
+        server = local_backends.LocalSFTPServer(temp_directory).start()
+        credentials.update(server.credentials())
+        return server, credentials, {}
+    raise NotImplementedError(f"Unknown backend: {backend}")
+
+
+def benchmark_backend(backend: str, slack_server: FakeSlackServer, args) -> dict:
+    with tempfile.TemporaryDirectory() as temp_directory:
+        server, credentials, environment = start_backend(backend, temp_directory)
+        environment = {
+            **environment,
+            "SLACK_APP_CREDENTIALS": json.dumps([credentials]),
+            "AWS_LAMBDA_FUNCTION_NAME": "slack-events-benchmark",  # cold starts preload like on Lambda
+        }
+        slack_url = ["--slack-api-base-url", slack_server.api_base_url]
+        try:
+            cold_starts = [
+                run_worker_process("cold", backend, environment, slack_url)
+                for _ in range(args.cold_starts)
+            ]
+            warm = run_worker_process("warm", backend, environment, [
+                *slack_url,
+                "--iterations", str(args.iterations),
+                "--warm-size", str(args.warm_size),
+                "--sizes", *map(str, args.sizes),
+            ])
+        finally:
+            server.stop()
+
+    return {
+        "cold_start": {
+            "init": summarize([result["init_ms"] for result in cold_starts]),
+            "first_invocation": summarize([result["first_invocation_ms"] for result in cold_starts]),
+        },
+        **warm,
+    }
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["s3", "sftp"], choices=["s3", "sftp"])
+    parser.add_argument("--cold-starts", type=int, default=5, help="fresh interpreters started per backend")
+    parser.add_argument("--iterations", type=int, default=50, help="warm invocations used for the percentiles")
+    parser.add_argument("--warm-size", type=int, default=256 * KILOBYTE, help="image bytes of warm invocations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_IMAGE_SIZES, help="image bytes to measure")
+    parser.add_argument("--output", help="file the JSON results are written to (printed otherwise)")
+    parser.add_argument("--worker", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    parser.add_argument("--slack-api-base-url", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+
+    if args.worker == "cold":
+        print(json.dumps(run_cold_start_worker(args.backends[0], args.slack_api_base_url, args.warm_size)))
+        return
+    if args.worker == "warm":
+        result = run_warm_worker(args.backends[0], args.slack_api_base_url, args.iterations, args.warm_size, args.sizes)
+        print(json.dumps(result))
+        return
+
+    slack_server = FakeSlackServer().start()
+    try:
+        results = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "backends": {backend: benchmark_backend(backend, slack_server, args) for backend in args.backends},
+        }
+    finally:
+        slack_server.stop()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,22 @@
+from utils.lazy_import import import_object
+
 from .slack_events_receive_callback import slack_events_receive_callback
-from .gcf_callback import slack_events_url_endpoint_google_cloud_function
-from .aws_callback import slack_events_url_endpoint_aws_lambda
+
+# Platform entry points are only imported when first used, so a platform never loads another one's dependencies
+# (e.g. AWS Lambda never imports `functions_framework` and Flask)
+_LAZY_CALLBACKS = {
+    "slack_events_url_endpoint_google_cloud_function":
+        "callback_functions.gcf_callback:slack_events_url_endpoint_google_cloud_function",
+    "slack_events_url_endpoint_aws_lambda": "callback_functions.aws_callback:slack_events_url_endpoint_aws_lambda",
+    "slack_events_batch_endpoint_aws_lambda":
+        "callback_functions.batch_callback:slack_events_batch_endpoint_aws_lambda",
+    "slack_events_queue_worker": "callback_functions.queue_worker_callback:slack_events_queue_worker",
+    "slack_events_cleanup_callback": "callback_functions.cleanup_callback:slack_events_cleanup_callback",
+    "slack_events_wsgi_app": "callback_functions.wsgi_callback:app",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_CALLBACKS:
+        return import_object(_LAZY_CALLBACKS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
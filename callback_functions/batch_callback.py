@@ -0,0 +1,63 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from config import BATCH_MAX_WORKERS
+from callback_functions.slack_events_receive_callback import process_slack_event, process_slack_event_async
+from slack_api.slack_event_api_handler import EventOutcomes
+
+
+def process_event_batch(jobs: dict, max_workers=BATCH_MAX_WORKERS) -> dict:
+    """ Processes queued jobs concurrently over a bounded thread pool. Jobs of the same Slack app share
+        one event handler (and so one Slack session and storage navigator) through the handler registry.
+
+    Args:
+        jobs: job id -> queued job (or event callback)
+    Returns:
+        job id -> event outcome
+    """
+    if not jobs:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = {job_id: executor.submit(process_slack_event, job) for job_id, job in jobs.items()}
+    return {job_id: future.result() for job_id, future in futures.items()}
+
+
+async def process_event_batch_async(jobs: dict, max_concurrency=None) -> dict:
+    """ Async variant of `process_event_batch` - every job is handled on the running event loop,
+        at most `max_concurrency` at a time when given
+
+    Returns:
+        job id -> event outcome
+    """
+    import asyncio  # keeps asyncio off the synchronous batch endpoint's cold start
+
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def process_job(job):
+        if semaphore is None:
+            return await process_slack_event_async(job)
+        async with semaphore:
+            return await process_slack_event_async(job)
+
+    outcomes = await asyncio.gather(*(process_job(job) for job in jobs.values()))
+    return dict(zip(jobs.keys(), outcomes))
+
+
+def slack_events_batch_endpoint_aws_lambda(event, context):
+    """ SQS triggered Lambda - processes the batch of records and reports the failed ones,
+        so only those are retried (requires "ReportBatchItemFailures" on the event source mapping)
+    """
+    failed_ids = []
+    jobs = {}
+    for record in event.get("Records", []):
+        try:
+            jobs[record["messageId"]] = json.loads(record["body"])
+        except (KeyError, ValueError) as err:
+            print(f"Could not read the queued record: {err}")
+            failed_ids.append(record.get("messageId"))
+
+    outcomes = process_event_batch(jobs)
+    failed_ids += [job_id for job_id, outcome in outcomes.items() if outcome == EventOutcomes.ERROR]
+
+    return {"batchItemFailures": [{"itemIdentifier": job_id} for job_id in failed_ids]}
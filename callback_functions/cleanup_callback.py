@@ -0,0 +1,60 @@
+import json
+import time
+
+from config import GALLERY_PATH, CLEANUP_CUTOFF_SECONDS, CLEANUP_DRY_RUN, CLEANUP_MAX_SECONDS, CLEANUP_BUCKET_ROOT
+from callback_functions.slack_events_receive_callback import credential_store
+from slack_api.event_handler_factory import EventHandlerFactory
+
+handler_factory = EventHandlerFactory()
+
+
+def slack_events_cleanup_callback(dry_run=CLEANUP_DRY_RUN, max_seconds=CLEANUP_MAX_SECONDS) -> dict:
+    """ Removes expired images from the gallery of every registered app, within `max_seconds` in total.
+        Each app's channel directories are walked recursively under `GALLERY_PATH`.
+        Without `GALLERY_PATH` the channel directories are at the root, next to anything else stored there,
+        so the root is only cleaned up with `CLEANUP_BUCKET_ROOT` set (and only on S3).
+    """
+    if not GALLERY_PATH and not CLEANUP_BUCKET_ROOT:
+        message = "Set GALLERY_PATH (or CLEANUP_BUCKET_ROOT for a bucket holding only the gallery) to clean up."
+        print(message)
+        return {"statusCode": 400, "body": {"message": message}}
+
+    directory_path = GALLERY_PATH or ""
+    deadline = time.monotonic() + max_seconds
+    reports = {}
+
+    for app_credentials in credential_store.get_all():
+        slack_app_id = app_credentials["slack_app_id"]
+        remaining_seconds = deadline - time.monotonic()
+        if remaining_seconds <= 0:
+            print(f"Cleanup ran out of time before the gallery of {slack_app_id}.")
+            break
+
+        navigator = None
+        try:
+            # only the storage is needed, not a whole event handler with its Slack session and content index
+            navigator = handler_factory.create_storage_navigator(**app_credentials)
+            report = navigator.cleanup_directory_files(
+                directory_path,
+                cutoff_time_in_seconds=CLEANUP_CUTOFF_SECONDS,
+                dry_run=dry_run,
+                max_seconds=remaining_seconds,
+            )
+            reports[slack_app_id] = report.to_dict()
+        except Exception as err:  # one unreachable gallery shouldn't stop the others
+            print(f"Could not clean up the gallery of {slack_app_id}: {err}")
+            reports[slack_app_id] = {"error": str(err)}
+        finally:
+            if navigator is not None:
+                close_navigator(navigator)
+
+        print(json.dumps({"message": "cleanup report", "slack_app_id": slack_app_id, **reports[slack_app_id]}))
+
+    return {"statusCode": 200, "body": {"reports": reports}}
+
+
+def close_navigator(navigator) -> None:
+    try:
+        navigator.close_connection()
+    except Exception as err:
+        print(f"An error occurred when closing the storage connection: {err}")
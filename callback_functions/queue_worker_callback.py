@@ -0,0 +1,60 @@
+import json
+from collections import Counter
+
+from config import QUEUE_WORKER_MAX_JOBS, QUEUE_RETRY_DELAY_SECONDS, QUEUE_RETRY_MAX_DELAY_SECONDS, QUEUE_MAX_ATTEMPTS
+from event_queue import get_event_queue
+from callback_functions.slack_events_receive_callback import process_slack_event
+from slack_api.slack_event_api_handler import EventOutcomes
+
+
+def slack_events_queue_worker(event_queue=None, max_jobs=QUEUE_WORKER_MAX_JOBS) -> dict:
+    """ Drains the event queue filled in the "queue" processing mode, processing at most `max_jobs` so the worker
+        fits within a function timeout. Failed jobs are returned to the queue to be tried again after a growing delay,
+        and dropped as dead letters after `QUEUE_MAX_ATTEMPTS` deliveries (invalid events are dropped right away).
+        A job rejected in this run isn't processed again in it, even if the queue hands it back.
+    """
+    event_queue = event_queue or get_event_queue()
+    outcomes = Counter()
+    rejected_jobs = set()
+    dead_letters = 0
+
+    processed = 0
+    while processed < max_jobs:
+        jobs = event_queue.receive(max_jobs - processed)
+        if not jobs:
+            break
+
+        is_new_job_received = False
+        for receipt, job in jobs:
+            job_key = json.dumps(job, sort_keys=True)
+            if job_key in rejected_jobs:
+                event_queue.reject(receipt, get_retry_delay(event_queue.get_attempts(receipt)))
+                continue
+
+            is_new_job_received = True
+            outcome = process_slack_event(job)
+            outcomes[outcome] += 1
+            processed += 1
+
+            if outcome != EventOutcomes.ERROR:
+                event_queue.acknowledge(receipt)
+                continue
+
+            attempts = event_queue.get_attempts(receipt)
+            if attempts >= QUEUE_MAX_ATTEMPTS:
+                event_queue.dead_letter(receipt, job)
+                dead_letters += 1
+            else:
+                event_queue.reject(receipt, get_retry_delay(attempts))
+                rejected_jobs.add(job_key)
+
+        if not is_new_job_received:  # only jobs rejected in this run are left
+            break
+
+    body = {"processed": processed, "outcomes": dict(outcomes), "dead_letters": dead_letters}
+    return {"statusCode": 200, "body": body}
+
+
+def get_retry_delay(attempts: int) -> float:
+    """ The delay before a job that failed `attempts` times is tried again, doubled with every attempt """
+    return min(QUEUE_RETRY_DELAY_SECONDS * 2 ** max(attempts - 1, 0), QUEUE_RETRY_MAX_DELAY_SECONDS)
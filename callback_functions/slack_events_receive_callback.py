@@ -1,9 +1,35 @@
 import datetime as dt
 
-from config import CREDENTIALS_PATH
+from config import (
+    CREDENTIALS_PATH,
+    CREDENTIALS_ENV_VAR,
+    PROCESSING_MODE,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_CACHE_SIZE,
+    IDEMPOTENCY_SHARED_STORE,
+    IDEMPOTENCY_SQLITE_PATH,
+)
 from slack_api import SlackEventApiHandler
-from slack_api.event_handler_factory import EventHandlerFactory
-from utils.unpack_credentials import get_app_credentials
+from slack_api.slack_event_api_handler import EventOutcomes
+from slack_api.handler_registry import handler_registry
+from utils.specified_exceptions import (
+    ErrorMessages as Err,
+    UnexpectedEventTypeError,
+    FileFormatError,
+    FileTooLargeError,
+    WrongChannelProvidedError,
+)
+from utils.idempotency_store import create_idempotency_store
+from utils.metrics import EventMetrics, create_event_metrics
+from utils.unpack_credentials import CredentialStore
+
+credential_store = CredentialStore(path=CREDENTIALS_PATH, env_var=CREDENTIALS_ENV_VAR)
+idempotency_store = create_idempotency_store(
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+    max_size=IDEMPOTENCY_CACHE_SIZE,
+    shared_store=IDEMPOTENCY_SHARED_STORE,
+    sqlite_path=IDEMPOTENCY_SQLITE_PATH,
+)
 
 
 def slack_events_receive_callback(request) -> dict:
@@ -24,17 +50,12 @@ def slack_events_receive_callback(request) -> dict:
         response = {"response": "received"}
         slack_app_id = request_data["api_app_id"]
 
-        app_credentials = get_app_credentials(slack_app_id, CREDENTIALS_PATH)
+        app_credentials = credential_store.get(slack_app_id)
         if app_credentials is None:  # no credentials match app_id
             response["status"] = "failed"
             response["message"] = "Slack app not registered in credentials."
         else:
-            try:
-                handler_factory = EventHandlerFactory()
-                event_handler = handler_factory.create(**app_credentials)
-                event_handler.handle_slack_event(request_data)
-            except Exception as err:
-                print(err)
+            response["outcome"] = accept_slack_event(request_data, headers)
 
     else:
         response = {"message": "Received no event type."}
@@ -42,5 +63,147 @@ def slack_events_receive_callback(request) -> dict:
     return {"statusCode": 200, "body": response}
 
 
+def accept_slack_event(request_data: dict, headers: dict) -> str:
+    """ Processes (or queues) the event unless the same event or file was already accepted """
+    metrics = create_event_metrics(request_data)
+    with metrics.time("callback"):
+        idempotency_keys = get_idempotency_keys(request_data)
+        if not claim_idempotency_keys(idempotency_keys):
+            retry_number = get_header(headers, "X-Slack-Retry-Num")
+            retry_reason = get_header(headers, "X-Slack-Retry-Reason")
+            print(f"Ignored duplicate delivery {idempotency_keys} (retry {retry_number}: {retry_reason}).")
+            metrics.set_property("slack_retry_num", retry_number)
+            outcome = EventOutcomes.REDELIVERED
+
+        else:
+            if PROCESSING_MODE == "queue":
+                outcome = enqueue_slack_event(request_data, metrics=metrics)
+            else:
+                outcome = process_slack_event(request_data, metrics=metrics)
+
+            if outcome == EventOutcomes.ERROR:  # let Slack's retry go through
+                idempotency_store.release_all(idempotency_keys)
+
+    record_event_outcome(metrics, outcome)
+    return outcome
+
+
+def record_event_outcome(metrics: EventMetrics, outcome: str) -> None:
+    """ Counts the outcome and emits the event's metrics """
+    metrics.count(outcome)
+    metrics.set_property("outcome", outcome)
+    metrics.emit()
+
+
+def get_idempotency_keys(request_data: dict) -> list[str]:
+    """ The same event can be redelivered with the same event id, or shared again as a new event for the same file """
+    keys = []
+    if request_data.get("event_id"):
+        keys.append(f"event:{request_data['event_id']}")
+
+    event = request_data.get("event", {})
+    if event.get("file_id"):
+        keys.append(f"file:{request_data['api_app_id']}:{event.get('channel_id')}:{event['file_id']}")
+    return keys
+
+
+def claim_idempotency_keys(idempotency_keys: list[str]) -> bool:
+    try:
+        return idempotency_store.claim_all(idempotency_keys)
+    except Exception as err:  # process the event rather than lose it
+        print(f"An error occurred when checking for duplicate events: {err}")
+        return True
+
+
+def get_header(headers: dict, name: str):
+    """ Headers are lowercase with AWS API Gateway and capitalized with Flask """
+    name = name.lower()
+    for header_name, value in headers.items():
+        if header_name.lower() == name:
+            return value
+    return None
+
+
+def process_slack_event(request_data: dict, metrics: EventMetrics = None) -> str:
+    """ Handles an event callback (or a queued job) for a registered Slack app and returns the event outcome
+
+    Args:
+        metrics: the metrics of the callback handling the event - otherwise the event's metrics are emitted here
+    """
+    if metrics is None:  # a queued job
+        metrics = create_event_metrics(request_data)
+        outcome = process_slack_event(request_data, metrics)
+        record_event_outcome(metrics, outcome)
+        return outcome
+
+    try:
+        with metrics.time("process_event"):
+            app_credentials = credential_store.get(request_data["api_app_id"])
+            if app_credentials is None:
+                raise KeyError(f"Slack app {request_data['api_app_id']} not registered in credentials.")
+
+            with metrics.time("get_handler"):
+                event_handler = handler_registry.get_handler(**app_credentials)
+            return event_handler.handle_slack_event(request_data, metrics=metrics)
+    except FileFormatError as err:
+        print(err)
+        return EventOutcomes.WRONG_FORMAT
+    except FileTooLargeError as err:
+        print(err)
+        return EventOutcomes.TOO_LARGE
+    except (UnexpectedEventTypeError, WrongChannelProvidedError) as err:
+        print(err)
+        return EventOutcomes.INVALID
+    except Exception as err:
+        print(err)
+        return EventOutcomes.ERROR
+
+
+async def process_slack_event_async(request_data: dict, metrics: EventMetrics = None) -> str:
+    """ Async variant of `process_slack_event` - the event is handled on the blocking I/O executor,
+        sharing the cached handler's Slack session and storage navigator
+    """
+    from utils.async_io import run_blocking  # keeps asyncio off the synchronous cold start
+
+    return await run_blocking(process_slack_event, request_data, metrics)
+
+
+def enqueue_slack_event(request_data: dict, event_queue=None, metrics: EventMetrics = None) -> str:
+    """ Validates the event and puts a compact job on the event queue for a worker to process """
+    metrics = metrics if metrics is not None else EventMetrics()
+    try:
+        with metrics.time("enqueue"):
+            job = create_event_job(request_data)
+            if event_queue is None:
+                from event_queue import get_event_queue  # only the "queue" processing mode needs the queue
+
+                event_queue = get_event_queue()
+            event_queue.put(job)
+        return EventOutcomes.QUEUED
+    except UnexpectedEventTypeError as err:
+        print(err)
+        return EventOutcomes.INVALID
+    except Exception as err:
+        print(err)
+        return EventOutcomes.ERROR
+
+
+def create_event_job(request_data: dict) -> dict:
+    """ Keeps only what the event handler needs from the event callback """
+    event = request_data["event"]
+    if event["type"] != "file_shared":
+        raise UnexpectedEventTypeError(Err.WRONG_EVENT_TYPE)
+
+    return {
+        "api_app_id": request_data["api_app_id"],
+        "event_id": request_data.get("event_id"),
+        "event": {
+            "type": event["type"],
+            "file_id": event["file_id"],
+            "channel_id": event["channel_id"],
+        },
+    }
+
+
 def is_request_timestamp_valid(timestamp):
     return (int(timestamp) - int(dt.datetime.now().timestamp())) < 60 * 5
@@ -0,0 +1,156 @@
+import argparse
+import json
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+from config import SERVER_HOST, SERVER_PORT, SERVER_WORKER_THREADS, SERVER_DRAIN_TIMEOUT_SECONDS
+from callback_functions import slack_events_receive_callback
+from slack_api.handler_registry import handler_registry
+
+
+class WSGIRequest:
+    """ Mimics flask.request in such a way that 'slack_events_receive_callback' understands
+    """
+
+    def __init__(self, environ: dict):
+        self.headers = {
+            name[len("HTTP_"):].replace("_", "-").lower(): value
+            for name, value in environ.items() if name.startswith("HTTP_")
+        }
+        self.params = environ.get("QUERY_STRING", "")
+        content_length = int(environ.get("CONTENT_LENGTH") or 0)
+        self.body = environ["wsgi.input"].read(content_length) if content_length else b""
+
+    def get_json(self, *args, **kwargs):
+        return json.loads(self.body or b"{}")
+
+
+class SlackEventsWSGIApp:
+    """ WSGI app around `slack_events_receive_callback`, for running as a long-lived server.
+        Requests share the cached event handlers (and so the Slack session and storage connections) of the process.
+        Once draining, new requests get a 503 so Slack retries them elsewhere, and so does the health check so the load
+        balancer stops routing here, while in-flight requests finish.
+    """
+
+    def __init__(self, callback=slack_events_receive_callback, registry=handler_registry):
+        self._callback = callback
+        self._registry = registry
+        self._in_flight = 0
+        self._is_draining = False
+        self._condition = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") == "GET":  # load balancer health check
+            if self._is_draining:
+                return self._respond(start_response, "503 Service Unavailable", {"status": "draining"})
+            return self._respond(start_response, "200 OK", {"status": "ok"})
+        if environ.get("REQUEST_METHOD") != "POST":
+            return self._respond(start_response, "405 Method Not Allowed", {"message": "Only POST is supported."})
+
+        with self._condition:
+            if self._is_draining:
+                return self._respond(start_response, "503 Service Unavailable", {"message": "Shutting down."})
+            self._in_flight += 1
+
+        try:
+            response = self._callback(WSGIRequest(environ))
+            return self._respond(start_response, "200 OK", response["body"])
+        except (KeyError, ValueError) as err:
+            print(f"Could not read the request: {err}")
+            return self._respond(start_response, "400 Bad Request", {"message": "Could not read the request."})
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def drain(self, timeout=SERVER_DRAIN_TIMEOUT_SECONDS) -> bool:
+        """ Turns new requests away, waits for the in-flight ones and closes the storage connections.
+            The server should keep running meanwhile, so the requests are answered with a 503 rather than refused.
+
+        Returns:
+            True if every in-flight request finished in time
+        """
+        with self._condition:
+            self._is_draining = True
+            is_drained = self._condition.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+        if not is_drained:
+            print(f"{self._in_flight} requests were still in flight after {timeout} seconds.")
+        self._registry.clear()
+        return is_drained
+
+    @staticmethod
+    def _respond(start_response, status: str, body: dict):
+        data = json.dumps(body).encode()
+        start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(data)))])
+        return [data]
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """ Handles requests on a bounded pool of worker threads, instead of one at a time """
+
+    def __init__(self, server_address, handler_class, worker_threads=SERVER_WORKER_THREADS):
+        self._executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="wsgi-worker")
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):  # every event is already logged with its metrics
+        pass
+
+
+app = SlackEventsWSGIApp()
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, worker_threads=SERVER_WORKER_THREADS, wsgi_app=app) -> None:
+    """ Runs the server until SIGTERM (or SIGINT), then drains the in-flight requests before exiting """
+    server = ThreadPoolWSGIServer((host, port), QuietWSGIRequestHandler, worker_threads=worker_threads)
+    server.set_app(wsgi_app)
+
+    def shut_down(signal_number, frame):
+        print(f"Received signal {signal_number}, draining {wsgi_app.in_flight} in-flight requests.")
+        # `shutdown` waits for `serve_forever`, which runs on this (the main) thread
+        threading.Thread(target=drain_and_stop, args=(server, wsgi_app)).start()
+
+    signal.signal(signal.SIGTERM, shut_down)
+    signal.signal(signal.SIGINT, shut_down)
+
+    print(f"Serving Slack events on {host}:{port} with {worker_threads} worker threads.")
+    server.serve_forever()
+    server.server_close()
+
+
+def drain_and_stop(server: WSGIServer, wsgi_app: SlackEventsWSGIApp, timeout=SERVER_DRAIN_TIMEOUT_SECONDS) -> None:
+    """ Drains the app while the server keeps answering (with 503s), and only then stops the server """
+    wsgi_app.drain(timeout)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Slack events over HTTP.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--threads", type=int, default=SERVER_WORKER_THREADS)
+    arguments = parser.parse_args()
+    serve(arguments.host, arguments.port, arguments.threads)
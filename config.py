@@ -1,15 +1,151 @@
-# Set where you would like the photo files to be stored - "s3" or "sftp"
+# Set where you would like the photo files to be stored - "s3" or "sftp", or a list such as ["s3", "sftp"]
+# to save every image to each of them from a single download
 SOURCE_CONNECTION = "s3"
 
+# With several destinations: "all" - the event fails (and is retried) unless every destination saved the image,
+# "best_effort" - it only fails when none of them did. Retries only write to destinations missing the image.
+DESTINATION_POLICY = "all"
+
+# On AWS Lambda and Google Cloud Functions, import the platform entry point and the storage backend while the
+# function initializes rather than during the first event (only the ones in use are ever imported)
+PRELOAD_ON_COLD_START = True
+
 # Path to credential JSON file within application
 CREDENTIALS_PATH = "./app-credentials.json"
 
+# Environment variable that can hold the credential JSON instead of the file - when it is set it takes precedence
+CREDENTIALS_ENV_VAR = "SLACK_APP_CREDENTIALS"
+
+# How long (in seconds) S3 keys known to exist are remembered, skipping the HEAD request - `None` disables the cache
+S3_KNOWN_KEY_CACHE_TTL_SECONDS = 60 * 10
+S3_KNOWN_KEY_CACHE_SIZE = 10000
+
+# Images larger than the threshold are sent to S3 as a multipart upload, with parts of `S3_MULTIPART_PART_SIZE`
+# uploaded `S3_MULTIPART_CONCURRENCY` at a time (a failed part is retried on its own)
+S3_MULTIPART_THRESHOLD = 1024 * 1024 * 8
+S3_MULTIPART_PART_SIZE = 1024 * 1024 * 8
+S3_MULTIPART_CONCURRENCY = 4
+
+# How many upload parts of a streamed image S3 may hold in memory at once - parts are only uploaded concurrently
+# as far as they fit, so this should be at least `S3_MULTIPART_CONCURRENCY`
+S3_STREAM_UPLOAD_CHUNKS_IN_MEMORY = 4
+
+# How file events are processed:
+#   "sync" - the image is saved before Slack gets a response
+#   "queue" - Slack gets a response right away and the event is put on the EVENT_QUEUE for a worker to process
+PROCESSING_MODE = "sync"
+
+# Queue used by the "queue" processing mode - "memory", "file", "sqs" or "pubsub" ("memory" and "file" are local only)
+EVENT_QUEUE = "memory"
+EVENT_QUEUE_DIRECTORY = "/tmp/slack-event-queue"  # used by the "file" queue
+SQS_QUEUE_URL = None
+PUBSUB_PROJECT_ID = None
+PUBSUB_TOPIC_ID = None
+PUBSUB_SUBSCRIPTION_ID = None
+
+# Slack redelivers events - deliveries with an already seen event id or file are ignored for this long (in seconds)
+IDEMPOTENCY_TTL_SECONDS = 60 * 60
+IDEMPOTENCY_CACHE_SIZE = 10000
+
+# Store shared between containers, checked after the in-memory one - `None` or "sqlite" (a local stand-in)
+IDEMPOTENCY_SHARED_STORE = None
+IDEMPOTENCY_SQLITE_PATH = "/tmp/slack-events-idempotency.sqlite3"
+
+# Most queued events a worker processes in one invocation
+QUEUE_WORKER_MAX_JOBS = 100
+
+# A failed queued event is retried after QUEUE_RETRY_DELAY_SECONDS, doubled with every attempt up to the max, and
+# dropped as a dead letter after QUEUE_MAX_ATTEMPTS deliveries (logged, or moved to 'dead-letter/' by the "file" queue)
+QUEUE_RETRY_DELAY_SECONDS = 30
+QUEUE_RETRY_MAX_DELAY_SECONDS = 60 * 10  # Pub/Sub can't delay a redelivery longer
+QUEUE_MAX_ATTEMPTS = 5
+# A job received from the "file" queue but neither acknowledged nor rejected within this long (e.g. the worker
+# crashed) is received again, like SQS's visibility timeout - keep it above the longest an event takes to process
+QUEUE_VISIBILITY_TIMEOUT_SECONDS = 60 * 15
+
+# Most records of a queued batch processed at the same time (SLACK_POOL_MAXSIZE should be at least as large)
+BATCH_MAX_WORKERS = 8
+
+# Long-running HTTP server (`python -m callback_functions.wsgi_callback`) for containers behind a load balancer
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8080
+SERVER_WORKER_THREADS = 16  # requests handled at once (SLACK_POOL_MAXSIZE should be at least as large)
+SERVER_DRAIN_TIMEOUT_SECONDS = 30  # how long in-flight requests may finish after SIGTERM
+
+# SFTP sessions are pooled per (host, port, username) and reused between events
+SFTP_POOL_MAX_SIZE = 16  # open sessions across every SFTP host
+SFTP_POOL_IDLE_TIMEOUT_SECONDS = 300  # idle sessions are closed after this long
+SFTP_POOL_CHECKOUT_TIMEOUT_SECONDS = 30  # how long an event waits for a session when all of them are in use
+SFTP_HEALTH_CHECK_IDLE_SECONDS = 60  # sessions idle for longer are probed with a request before being reused
+SFTP_KEEPALIVE_SECONDS = 30
+SFTP_CONNECT_TIMEOUT_SECONDS = 10
+
+# Retention cleanup of the galleries (`slack_events_cleanup_callback` in `main.py`, run on a schedule)
+CLEANUP_CUTOFF_SECONDS = 60 * 60 * 24 * 365  # files last modified longer ago are removed
+CLEANUP_DRY_RUN = False  # only report what would be removed
+CLEANUP_MAX_SECONDS = 60 * 4  # stops early to fit within the function timeout, the next run continues
+CLEANUP_MAX_WORKERS = 4  # SFTP sessions (or S3 DeleteObjects requests) removing files at once
+# Without a GALLERY_PATH the channel directories are at the root, which is only cleaned up on S3 and only when set to
+# True - the whole bucket is then subject to the cleanup, so it should hold nothing but the gallery
+CLEANUP_BUCKET_ROOT = False
+S3_DELETE_BATCH_SIZE = 1000  # keys per DeleteObjects request, at most 1000
+SFTP_REMOVE_BATCH_SIZE = 100  # expired files handed to an SFTP session at once, removed while the walk goes on
+
+# Open the storage connection (SSH handshake, S3 client) in the background as soon as an event is accepted,
+# while Slack is being called, instead of when the file is first checked
+PREPARE_STORAGE_CONNECTION = True
+
+# Content-addressed index (SHA-256) of each gallery: an image identical to a saved one (e.g. reposted in another
+# channel) isn't saved again, and an image named like a different saved one is saved as 'name-1.jpg', 'name-2.jpg', ...
+#   None - duplicates are only detected by name, "sqlite" - a local stand-in, "s3" - objects in the app's bucket
+CONTENT_INDEX = None
+CONTENT_INDEX_SQLITE_PATH = "/tmp/slack-events-content-index.sqlite3"
+CONTENT_SPOOL_MAX_MEMORY = 1024 * 1024 * 16  # hashed images larger than this are spooled to a temporary file
+MAX_NAME_SUFFIX = 100  # most suffixed names tried for an image before giving up
+CONTENT_CLAIM_LEASE_SECONDS = 60 * 15  # an image not saved after this long was abandoned, another event may save it
+
+# Threads the async API uses for the blocking Slack and storage clients - bounds the events in flight at once
+ASYNC_BLOCKING_IO_THREADS = 64
+
 # Set to False if you want to include images sent in Slack message threads (replies)
 EXCLUDE_THREADED_IMAGES = True
 
 # Path to WordPress files gallery
 GALLERY_PATH = None  # an example would be "public_html/wp-content/gallery" - to keep it in the base bucket put `None`
 
+# Connections kept open to Slack - `SLACK_POOL_MAXSIZE` should cover the number of concurrent requests
+SLACK_POOL_CONNECTIONS = 4
+SLACK_POOL_MAXSIZE = 16
+SLACK_REQUEST_TIMEOUT_SECONDS = 30
+
+# Rate limited (429) and failed (5xx) Slack requests are retried, honoring Slack's `Retry-After` header
+SLACK_MAX_RETRIES = 3
+SLACK_RETRY_BACKOFF_SECONDS = 0.5
+SLACK_RETRY_MAX_WAIT_SECONDS = 20  # longer waits are not retried, so the function doesn't time out
+
+# Which version of an image is downloaded from Slack: the smallest thumbnail at least this many pixels wide or high
+# (Slack has thumbnails of 64 up to 1024px), or the original when it is smaller - `None` always downloads the original
+SLACK_IMAGE_TARGET_SIZE = 1024
+# Originals larger than this (in bytes) are replaced by their largest thumbnail, or skipped without one
+# - `None` for no limit
+SLACK_MAX_DOWNLOAD_BYTES = 1024 * 1024 * 100
+
+# Size of the chunks (in bytes) images are streamed in from Slack to the storage destination
+IMAGE_CHUNK_SIZE = 1024 * 256
+
+# Renditions saved next to each image, e.g. {"name": "medium", "max_size": 1024, "format": "webp", "quality": 80}
+# saves 'photo.jpg' as 'photo-medium.webp' too, at most 1024px wide or high and without EXIF metadata.
+# Formats: "webp", "avif", "jpeg" or "png". Requires the `Pillow` dependency when set.
+IMAGE_RENDITIONS = []
+RENDITION_PROCESSES = 2  # processes encoding renditions - 0 uses threads instead, e.g. on AWS Lambda
+
+# Chunks of an image held per destination when it is streamed to several destinations at once
+FAN_OUT_CHUNKS_IN_MEMORY = 8
+
+# Stage timings and outcome counters of every event - "print" logs them as JSON (CloudWatch EMF), `None` turns them off
+METRICS_SINK = "print"
+METRICS_NAMESPACE = "SlackEventsHandler"
+
 # Acceptable image file formats to look for in Slack Event
 ACCEPTABLE_FILE_FORMATS = [
     "avif",
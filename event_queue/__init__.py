@@ -0,0 +1,4 @@
+from .event_queue_base import EventQueueBase
+from .in_memory_event_queue import InMemoryEventQueue
+from .file_event_queue import FileEventQueue
+from .event_queue_factory import EventQueueFactory, get_event_queue
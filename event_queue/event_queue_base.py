@@ -0,0 +1,40 @@
+import json
+from abc import ABC, abstractmethod
+
+
+class EventQueueBase(ABC):
+    """ Abstract base class for the queues file events are put on when they are processed after Slack is answered.
+        Jobs are small JSON-serializable dicts; each received job comes with a receipt used to acknowledge it.
+    """
+
+    @abstractmethod
+    def put(self, job: dict) -> None:
+        """ Abstract method adding a job to the queue """
+        pass
+
+    @abstractmethod
+    def receive(self, max_jobs: int) -> list[tuple[str, dict]]:
+        """ Abstract method taking up to `max_jobs` (receipt, job) pairs off the queue """
+        pass
+
+    @abstractmethod
+    def acknowledge(self, receipt: str) -> None:
+        """ Abstract method removing a received job for good once it has been handled """
+        pass
+
+    @abstractmethod
+    def reject(self, receipt: str, delay_seconds: float = 0) -> None:
+        """ Abstract method returning a received job to the queue so it is tried again after `delay_seconds` """
+        pass
+
+    @abstractmethod
+    def get_attempts(self, receipt: str) -> int:
+        """ Abstract method returning how many times the received job was delivered, this delivery included
+            (0 when the queue doesn't count them)
+        """
+        pass
+
+    def dead_letter(self, receipt: str, job: dict) -> None:
+        """ Removes a job that failed too many times, logging it so it can be replayed """
+        print(json.dumps({"message": "dead letter", "job": job}))
+        self.acknowledge(receipt)
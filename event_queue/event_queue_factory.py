@@ -0,0 +1,42 @@
+from config import (
+    EVENT_QUEUE,
+    EVENT_QUEUE_DIRECTORY,
+    SQS_QUEUE_URL,
+    PUBSUB_PROJECT_ID,
+    PUBSUB_TOPIC_ID,
+    PUBSUB_SUBSCRIPTION_ID,
+)
+from event_queue.event_queue_base import EventQueueBase
+
+
+class EventQueueFactory:
+    """ Factory that instantiates the event queue stated in the Config module.
+        The SQS and Pub/Sub queues are only imported when selected, so their dependencies aren't required otherwise.
+    """
+
+    def create(self, queue_type: str = EVENT_QUEUE) -> EventQueueBase:
+        if queue_type == "memory":
+            from event_queue.in_memory_event_queue import InMemoryEventQueue
+            return InMemoryEventQueue()
+        elif queue_type == "file":
+            from event_queue.file_event_queue import FileEventQueue
+            return FileEventQueue(EVENT_QUEUE_DIRECTORY)
+        elif queue_type == "sqs":
+            from event_queue.sqs_event_queue import SQSEventQueue
+            return SQSEventQueue(SQS_QUEUE_URL)
+        elif queue_type == "pubsub":
+            from event_queue.pubsub_event_queue import PubSubEventQueue
+            return PubSubEventQueue(PUBSUB_PROJECT_ID, PUBSUB_TOPIC_ID, PUBSUB_SUBSCRIPTION_ID)
+        else:
+            raise NotImplementedError(f"Unknown event queue type: {queue_type}")
+
+
+_event_queue = None
+
+
+def get_event_queue() -> EventQueueBase:
+    """ Returns the configured event queue, created once per process """
+    global _event_queue
+    if _event_queue is None:
+        _event_queue = EventQueueFactory().create()
+    return _event_queue
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+import uuid
+
+from config import QUEUE_VISIBILITY_TIMEOUT_SECONDS
+from event_queue.event_queue_base import EventQueueBase
+
+
+class FileEventQueue(EventQueueBase):
+    """ Queue backed by a local directory, one JSON file per job - a local stand-in that several processes can share.
+        Jobs are claimed by renaming them, which is atomic, so a job is only handed to one worker.
+        A job's name starts with the time it is available from and ends with how many times it was delivered.
+        A claimed job not acknowledged or rejected within `visibility_timeout_seconds` is put back on the queue.
+    """
+
+    JOB_EXTENSION = ".json"
+    CLAIMED_EXTENSION = ".claimed"
+    DEAD_LETTER_DIRECTORY = "dead-letter"
+
+    def __init__(self, directory: str, visibility_timeout_seconds: float = QUEUE_VISIBILITY_TIMEOUT_SECONDS):
+        self.directory = directory
+        self.visibility_timeout_seconds = visibility_timeout_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, job: dict) -> None:
+        job_name = self._get_job_name(time.time_ns(), uuid.uuid4().hex, deliveries=0)
+        temporary_path = os.path.join(self.directory, f"{job_name}.tmp")
+        with open(temporary_path, "w") as job_file:
+            json.dump(job, job_file)
+        os.replace(temporary_path, os.path.join(self.directory, f"{job_name}{self.JOB_EXTENSION}"))
+
+    def receive(self, max_jobs: int) -> list[tuple[str, dict]]:
+        self._requeue_expired_claims()
+
+        jobs = []
+        job_names = sorted(name for name in os.listdir(self.directory) if name.endswith(self.JOB_EXTENSION))
+        for job_name in job_names:
+            if len(jobs) >= max_jobs or int(job_name.split("-")[0]) > time.time_ns():  # the rest are delayed
+                break
+
+            receipt = job_name[:-len(self.JOB_EXTENSION)]
+            job_path = os.path.join(self.directory, job_name)
+            try:
+                os.utime(job_path)  # the claim's visibility timeout starts now - a rename keeps the modification time
+                os.rename(job_path, self._claimed_path(receipt))
+            except FileNotFoundError:  # claimed by another worker
+                continue
+
+            with open(self._claimed_path(receipt)) as job_file:
+                jobs.append((receipt, json.load(job_file)))
+        return jobs
+
+    def acknowledge(self, receipt: str) -> None:
+        try:
+            os.remove(self._claimed_path(receipt))
+        except FileNotFoundError:
+            pass
+
+    def reject(self, receipt: str, delay_seconds: float = 0) -> None:
+        try:
+            self._requeue(receipt, delay_seconds)
+        except FileNotFoundError:  # put back on the queue after its visibility timeout
+            pass
+
+    def get_attempts(self, receipt: str) -> int:
+        return int(receipt.split("-")[-1]) + 1
+
+    def dead_letter(self, receipt: str, job: dict) -> None:
+        dead_letter_directory = os.path.join(self.directory, self.DEAD_LETTER_DIRECTORY)
+        os.makedirs(dead_letter_directory, exist_ok=True)
+        dead_letter_path = os.path.join(dead_letter_directory, f"{receipt}{self.JOB_EXTENSION}")
+        try:
+            os.rename(self._claimed_path(receipt), dead_letter_path)
+        except FileNotFoundError:  # put back on the queue after its visibility timeout
+            pass
+
+    def _requeue_expired_claims(self) -> None:
+        """ Puts the jobs claimed longer than the visibility timeout ago back on the queue, e.g. when the worker
+            that received them crashed. The lost delivery counts as an attempt.
+        """
+        expired_before = time.time() - self.visibility_timeout_seconds
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(self.CLAIMED_EXTENSION):
+                continue
+
+            receipt = file_name[:-len(self.CLAIMED_EXTENSION)]
+            try:
+                if os.path.getmtime(self._claimed_path(receipt)) < expired_before:
+                    print(f"The queued job {receipt} was not processed in time and is put back on the queue.")
+                    self._requeue(receipt)
+            except FileNotFoundError:  # finished, or put back by another worker
+                continue
+
+    def _requeue(self, receipt: str, delay_seconds: float = 0) -> None:
+        _, job_id, _ = receipt.split("-")
+        job_name = self._get_job_name(time.time_ns() + int(delay_seconds * 1e9), job_id, self.get_attempts(receipt))
+        os.rename(self._claimed_path(receipt), os.path.join(self.directory, f"{job_name}{self.JOB_EXTENSION}"))
+
+    @staticmethod
+    def _get_job_name(available_from_ns: int, job_id: str, deliveries: int) -> str:
+        return f"{available_from_ns:020d}-{job_id}-{deliveries}"
+
+    def _claimed_path(self, receipt: str) -> str:
+        return os.path.join(self.directory, f"{receipt}{self.CLAIMED_EXTENSION}")
@@ -0,0 +1,59 @@
+import itertools
+import queue
+import threading
+import time
+
+from event_queue.event_queue_base import EventQueueBase
+
+
+class InMemoryEventQueue(EventQueueBase):
+    """ In-process queue - a local stand-in, jobs are lost when the process ends """
+
+    def __init__(self):
+        self._queue = queue.Queue()  # (available from, earlier deliveries, job)
+        self._in_flight = {}
+        self._receipts = itertools.count()
+        self._lock = threading.Lock()
+        self.dead_letters = []
+
+    def put(self, job: dict) -> None:
+        self._queue.put((0.0, 0, job))
+
+    def receive(self, max_jobs: int) -> list[tuple[str, dict]]:
+        jobs = []
+        delayed = []
+        while len(jobs) < max_jobs:
+            try:
+                available_from, deliveries, job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if available_from > time.monotonic():
+                delayed.append((available_from, deliveries, job))
+                continue
+            with self._lock:
+                receipt = str(next(self._receipts))
+                self._in_flight[receipt] = (deliveries + 1, job)
+            jobs.append((receipt, job))
+
+        for delayed_job in delayed:
+            self._queue.put(delayed_job)
+        return jobs
+
+    def acknowledge(self, receipt: str) -> None:
+        with self._lock:
+            self._in_flight.pop(receipt, None)
+
+    def reject(self, receipt: str, delay_seconds: float = 0) -> None:
+        with self._lock:
+            in_flight = self._in_flight.pop(receipt, None)
+        if in_flight is not None:
+            self._queue.put((time.monotonic() + delay_seconds, *in_flight))
+
+    def get_attempts(self, receipt: str) -> int:
+        with self._lock:
+            deliveries, _ = self._in_flight.get(receipt, (0, None))
+        return deliveries
+
+    def dead_letter(self, receipt: str, job: dict) -> None:
+        self.dead_letters.append(job)
+        self.acknowledge(receipt)
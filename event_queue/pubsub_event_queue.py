@@ -0,0 +1,61 @@
+import json
+
+from google.cloud import pubsub_v1  # requires the `google-cloud-pubsub` dependency
+
+from event_queue.event_queue_base import EventQueueBase
+
+
+class PubSubEventQueue(EventQueueBase):
+    """ Google Cloud Pub/Sub queue - jobs are published to a topic and pulled from a subscription to it.
+        Deliveries are only counted when the subscription has a dead-letter policy.
+    """
+
+    MAX_ACK_DEADLINE_SECONDS = 600  # Pub/Sub limit
+
+    def __init__(self, project_id: str, topic_id: str, subscription_id: str):
+        self._publisher = None
+        self._subscriber = None
+        self._delivery_attempts = {}
+        self.topic_path = pubsub_v1.PublisherClient.topic_path(project_id, topic_id)
+        self.subscription_path = pubsub_v1.SubscriberClient.subscription_path(project_id, subscription_id)
+
+    @property
+    def publisher(self):
+        if self._publisher is None:
+            self._publisher = pubsub_v1.PublisherClient()
+        return self._publisher
+
+    @property
+    def subscriber(self):
+        if self._subscriber is None:
+            self._subscriber = pubsub_v1.SubscriberClient()
+        return self._subscriber
+
+    def put(self, job: dict) -> None:
+        self.publisher.publish(self.topic_path, json.dumps(job).encode()).result()
+
+    def receive(self, max_jobs: int) -> list[tuple[str, dict]]:
+        response = self.subscriber.pull(
+            request={"subscription": self.subscription_path, "max_messages": max_jobs},
+            timeout=10,
+        )
+        for message in response.received_messages:
+            self._delivery_attempts[message.ack_id] = message.delivery_attempt
+        return [(message.ack_id, json.loads(message.message.data)) for message in response.received_messages]
+
+    def acknowledge(self, receipt: str) -> None:
+        self._delivery_attempts.pop(receipt, None)
+        self.subscriber.acknowledge(request={"subscription": self.subscription_path, "ack_ids": [receipt]})
+
+    def reject(self, receipt: str, delay_seconds: float = 0) -> None:
+        self._delivery_attempts.pop(receipt, None)
+        self.subscriber.modify_ack_deadline(
+            request={
+                "subscription": self.subscription_path,
+                "ack_ids": [receipt],
+                "ack_deadline_seconds": min(int(delay_seconds), self.MAX_ACK_DEADLINE_SECONDS),
+            }
+        )
+
+    def get_attempts(self, receipt: str) -> int:
+        return self._delivery_attempts.get(receipt, 0)
@@ -0,0 +1,56 @@
+import json
+
+import boto3
+
+from event_queue.event_queue_base import EventQueueBase
+
+
+class SQSEventQueue(EventQueueBase):
+    """ Amazon SQS queue. Unacknowledged jobs are redelivered by SQS once their visibility timeout ends. """
+
+    MAX_MESSAGES_PER_RECEIVE = 10  # SQS limit
+    MAX_VISIBILITY_TIMEOUT = 60 * 60 * 12  # SQS limit
+
+    def __init__(self, queue_url: str, wait_time_seconds=0):
+        self.queue_url = queue_url
+        self.wait_time_seconds = wait_time_seconds
+        self._sqs_client = None
+        self._receive_counts = {}
+
+    @property
+    def sqs_client(self):
+        if self._sqs_client is None:
+            self._sqs_client = boto3.client("sqs")
+        return self._sqs_client
+
+    def put(self, job: dict) -> None:
+        self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(job))
+
+    def receive(self, max_jobs: int) -> list[tuple[str, dict]]:
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_jobs, self.MAX_MESSAGES_PER_RECEIVE),
+            WaitTimeSeconds=self.wait_time_seconds,
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        messages = response.get("Messages", [])
+        for message in messages:
+            self._receive_counts[message["ReceiptHandle"]] = int(
+                message.get("Attributes", {}).get("ApproximateReceiveCount", 0)
+            )
+        return [(message["ReceiptHandle"], json.loads(message["Body"])) for message in messages]
+
+    def acknowledge(self, receipt: str) -> None:
+        self._receive_counts.pop(receipt, None)
+        self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+
+    def reject(self, receipt: str, delay_seconds: float = 0) -> None:
+        self._receive_counts.pop(receipt, None)
+        self.sqs_client.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=receipt,
+            VisibilityTimeout=min(int(delay_seconds), self.MAX_VISIBILITY_TIMEOUT),
+        )
+
+    def get_attempts(self, receipt: str) -> int:
+        return self._receive_counts.get(receipt, 0)
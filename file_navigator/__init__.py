@@ -1,4 +1,17 @@
+from utils.lazy_import import import_object
+
 from .file_navigator_base import FileNavigatorBase
 
-from .s3_file_navigator import S3Navigator
-from .sftp_file_navigator import SFTPNavigator
+# Storage backends are only imported when first used, so only the configured backend's client (boto3 or paramiko)
+# is loaded
+_LAZY_NAVIGATORS = {
+    "S3Navigator": "file_navigator.s3_file_navigator:S3Navigator",
+    "SFTPNavigator": "file_navigator.sftp_file_navigator:SFTPNavigator",
+    "CompositeNavigator": "file_navigator.composite_navigator:CompositeNavigator",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAVIGATORS:
+        return import_object(_LAZY_NAVIGATORS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,63 @@
+import threading
+import time
+
+
+class CleanupReport:
+    """ What a retention cleanup removed - or would have removed, in a dry run.
+        Removals can run on several threads, so the counters are updated under a lock.
+    """
+
+    def __init__(self, directory_path: str, cutoff_timestamp: int, dry_run: bool = False):
+        self.directory_path = directory_path
+        self.cutoff_timestamp = cutoff_timestamp
+        self.dry_run = dry_run
+        self.directories_scanned = 0
+        self.files_scanned = 0
+        self.files_removed = 0
+        self.bytes_reclaimed = 0
+        self.failed_files = []
+        self.is_complete = True  # False when the run time cap stopped the cleanup early
+        self._started_at = time.monotonic()
+        self.duration_seconds = None
+        self._lock = threading.Lock()
+
+    def add_removed(self, file_path: str, size: int) -> None:
+        with self._lock:
+            self.files_removed += 1
+            self.bytes_reclaimed += size
+
+    def add_failed(self, file_path: str, error: Exception) -> None:
+        print(f"Could not remove '{file_path}': {error}")
+        with self._lock:
+            self.failed_files.append(file_path)
+
+    def add_report(self, report: "CleanupReport", destination: str) -> None:
+        """ Adds up the report of one destination, e.g. of a `CompositeNavigator` """
+        with self._lock:
+            self.directories_scanned += report.directories_scanned
+            self.files_scanned += report.files_scanned
+            self.files_removed += report.files_removed
+            self.bytes_reclaimed += report.bytes_reclaimed
+            self.failed_files.extend(f"{destination}:{file_path}" for file_path in report.failed_files)
+            self.is_complete = self.is_complete and report.is_complete
+
+    def stop_early(self) -> None:
+        self.is_complete = False
+
+    def finish(self) -> "CleanupReport":
+        self.duration_seconds = time.monotonic() - self._started_at
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "directory_path": self.directory_path,
+            "cutoff_timestamp": self.cutoff_timestamp,
+            "dry_run": self.dry_run,
+            "directories_scanned": self.directories_scanned,
+            "files_scanned": self.files_scanned,
+            "files_removed": self.files_removed,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "failed_files": list(self.failed_files),
+            "is_complete": self.is_complete,
+            "duration_seconds": self.duration_seconds,
+        }
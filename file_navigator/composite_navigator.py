@@ -0,0 +1,147 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DESTINATION_POLICY
+from file_navigator.file_navigator_base import FileNavigatorBase
+from file_navigator.cleanup_report import CleanupReport
+from utils.stream_fan_out import StreamFanOut
+from utils.specified_exceptions import DestinationWriteError
+from utils.ttl_cache import TTLCache
+
+
+class CompositeNavigator(FileNavigatorBase):
+    """ Saves every image to several destinations (e.g. archived to S3 and published on SFTP) from one download.
+        The destinations are written at the same time, a streamed image being handed to all of them as it downloads.
+
+        With the "all" policy a save fails unless every destination succeeded, so the event is retried; with
+        "best_effort" it only fails when none did. A file only counts as existing once every destination has it,
+        and the save then only writes to the destinations that were missing it.
+    """
+    ALL = "all"
+    BEST_EFFORT = "best_effort"
+    POLICIES = (ALL, BEST_EFFORT)
+
+    def __init__(self, navigators: dict, policy=DESTINATION_POLICY, missing_destinations_cache=None, **kwargs):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown destination policy '{policy}', expected one of {self.POLICIES}.")
+        self.navigators = dict(navigators)  # destination name -> navigator
+        self.policy = policy
+        # file path -> names of the destinations the last existence check didn't find the file in
+        self._missing_destinations = missing_destinations_cache if missing_destinations_cache is not None \
+            else TTLCache()
+
+    def is_file_in_directory(self, directory_path: str, file_name: str) -> bool:
+        results = self._run_on_each(
+            self.navigators, lambda navigator: navigator.is_file_in_directory(directory_path, file_name)
+        )
+
+        missing = []
+        for name, (is_found, error) in results.items():
+            if error is not None:  # the save finds out whether the destination is really unavailable
+                print(f"Could not check for '{directory_path}/{file_name}' in the {name} destination: {error}")
+            if not is_found:
+                missing.append(name)
+
+        if not missing:
+            return True
+        self._missing_destinations.set(f"{directory_path}/{file_name}", missing)
+        return False
+
+    def save_file_to_directory(self, file_data, file_path: str, content_type: str = None) -> dict:
+        """ Saves the file to each destination that doesn't have it yet
+
+        Returns:
+            The seconds each destination took to save the file, by destination name
+        Raises:
+            DestinationWriteError: when the policy isn't met, with the error of each failed destination
+        """
+        names = self._missing_destinations.get(file_path) or list(self.navigators)
+        self._missing_destinations.discard(file_path)
+        navigators = {name: self.navigators[name] for name in names}
+
+        if isinstance(file_data, bytes) or len(navigators) == 1:
+            results = self._run_on_each(
+                navigators, lambda navigator: self._timed_save(navigator, file_data, file_path, content_type)
+            )
+        else:
+            results = self._save_stream(navigators, file_data, file_path, content_type)
+
+        return self._check_results(results, file_path)
+
+    def prepare_connection(self) -> None:
+        results = self._run_on_each(self.navigators, lambda navigator: navigator.prepare_connection())
+        for name, (_, error) in results.items():
+            if error is not None:
+                print(f"Could not prepare the connection of the {name} destination: {error}")
+
+    def is_connection_alive(self) -> bool:
+        return all(navigator.is_connection_alive() for navigator in self.navigators.values())
+
+    def close_connection(self) -> None:
+        for name, navigator in self.navigators.items():
+            try:
+                navigator.close_connection()
+            except Exception as err:
+                print(f"An error occurred when closing the {name} destination: {err}")
+
+    def cleanup_directory_files(self, directory_path, cutoff_time_in_seconds=None, dry_run=False, max_seconds=None):
+        """ Cleans up every destination at the same time, adding up their reports """
+        results = self._run_on_each(self.navigators, lambda navigator: navigator.cleanup_directory_files(
+            directory_path, cutoff_time_in_seconds=cutoff_time_in_seconds, dry_run=dry_run, max_seconds=max_seconds,
+        ))
+
+        report = None
+        for name, (destination_report, error) in results.items():
+            if error is not None:
+                raise error
+            if report is None:
+                report = CleanupReport(directory_path, destination_report.cutoff_timestamp, dry_run=dry_run)
+            report.add_report(destination_report, name)
+        return report.finish()
+
+    def _save_stream(self, navigators: dict, file_stream, file_path: str, content_type: str = None) -> dict:
+        """ Downloads the stream once on this thread while each destination reads its own copy on another """
+        fan_out = StreamFanOut(file_stream, readers=len(navigators))
+        pipes = dict(zip(navigators, fan_out.pipes))
+
+        def save(name):
+            with pipes[name] as pipe:  # closing the pipe early stops the stream being handed to a failed destination
+                return self._timed_save(navigators[name], pipe, file_path, content_type)
+
+        with ThreadPoolExecutor(max_workers=len(navigators)) as executor:
+            futures = {name: executor.submit(save, name) for name in navigators}
+            fan_out.pump()
+        return {name: self._get_result(future) for name, future in futures.items()}
+
+    def _check_results(self, results: dict, file_path: str) -> dict:
+        failures = {name: error for name, (_, error) in results.items() if error is not None}
+        for name, error in failures.items():
+            print(f"Could not save '{file_path}' to the {name} destination: {error}")
+
+        if failures and (self.policy == self.ALL or len(failures) == len(results)):
+            raise DestinationWriteError(f"Saving '{file_path}' failed in: {', '.join(failures)}.", failures)
+        return {name: seconds for name, (seconds, error) in results.items() if error is None}
+
+    @staticmethod
+    def _timed_save(navigator, file_data, file_path: str, content_type: str = None) -> float:
+        start = time.perf_counter()
+        navigator.save_file_to_directory(file_data, file_path, content_type=content_type)
+        return time.perf_counter() - start
+
+    @classmethod
+    def _run_on_each(cls, navigators: dict, function) -> dict:
+        """ Calls the function with each navigator at the same time
+
+        Returns:
+            (result, error) of each destination, by destination name
+        """
+        with ThreadPoolExecutor(max_workers=len(navigators)) as executor:
+            futures = {name: executor.submit(function, navigator) for name, navigator in navigators.items()}
+        return {name: cls._get_result(future) for name, future in futures.items()}
+
+    @staticmethod
+    def _get_result(future) -> tuple:
+        try:
+            return future.result(), None
+        except Exception as err:
+            return None, err
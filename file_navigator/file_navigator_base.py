@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import BinaryIO
 
 
 class FileNavigatorBase(ABC):
@@ -12,6 +13,46 @@ class FileNavigatorBase(ABC):
         pass
 
     @abstractmethod
-    def save_file_to_directory(self, file_data: bytes, file_path: str) -> None:
-        """ Abstract method saving file to location """
+    def save_file_to_directory(self, file_data: bytes | BinaryIO, file_path: str, content_type: str = None) -> None:
+        """ Abstract method saving file to location. The file data is either bytes or a readable file-like stream.
+            `content_type` is the type of the data when known, which may not match the path's extension
+            (e.g. the JPEG thumbnail of a HEIC image).
+        """
         pass
+
+    def prepare_connection(self) -> None:
+        """ Opens the connection ahead of the first operation, e.g. in the background while Slack is being called.
+            Navigators that connect cheaply don't need to override it.
+        """
+        pass
+
+    def is_connection_alive(self) -> bool:
+        """ Checks that a cached connection can still be used. Navigators without a persistent connection
+            are always considered alive.
+        """
+        return True
+
+    def close_connection(self) -> None:
+        """ Releases any connection held by the navigator """
+        pass
+
+    @abstractmethod
+    def cleanup_directory_files(self, directory_path, cutoff_time_in_seconds=None, dry_run=False, max_seconds=None):
+        """ Abstract method removing the files under the directory that were last modified before the cutoff time,
+            stopping early after `max_seconds`. A dry run only reports what would be removed.
+            Implementations check the directory with `check_cleanup_directory` and skip hidden (dot) directories.
+
+        Returns:
+            A CleanupReport
+        """
+        pass
+
+    @staticmethod
+    def check_cleanup_directory(directory_path: str) -> None:
+        """ A cleanup of the root would remove whatever else is stored there (e.g. the SFTP user's home directory) """
+        if not directory_path or directory_path.strip("/") in ("", "."):
+            raise ValueError(f"Refusing to clean up the root directory '{directory_path}', set a gallery path.")
+
+    @staticmethod
+    def is_hidden(name: str) -> bool:
+        return name.startswith(".")
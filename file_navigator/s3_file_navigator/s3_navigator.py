@@ -1,20 +1,77 @@
+import io
+import mimetypes
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime as dt
+from typing import BinaryIO
+
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 
+from config import (
+    S3_KNOWN_KEY_CACHE_SIZE,
+    S3_KNOWN_KEY_CACHE_TTL_SECONDS,
+    S3_MULTIPART_THRESHOLD,
+    S3_MULTIPART_PART_SIZE,
+    S3_MULTIPART_CONCURRENCY,
+    S3_STREAM_UPLOAD_CHUNKS_IN_MEMORY,
+    S3_DELETE_BATCH_SIZE,
+    CLEANUP_MAX_WORKERS,
+    CLEANUP_BUCKET_ROOT,
+)
 from file_navigator import FileNavigatorBase
+from file_navigator.cleanup_report import CleanupReport
+from utils.ttl_cache import TTLCache
 
 
 class S3Navigator(FileNavigatorBase):
 
-    def __init__(self, bucket_name, **kwargs):
+    MISSING_KEY_ERROR_CODES = ("404", "NoSuchKey", "NotFound")
+    DEFAULT_CUTOFF_TIME_IN_SECONDS = 60 * 60 * 24 * 365  # about a year
+    DEFAULT_CONTENT_TYPE = "application/octet-stream"
+    # image formats `mimetypes` doesn't know on every platform
+    CONTENT_TYPES = {
+        ".avif": "image/avif",
+        ".heic": "image/heic",
+        ".heif": "image/heif",
+        ".jpeg2000": "image/jp2",
+        ".raw": "image/x-raw",
+    }
+
+    def __init__(
+            self,
+            bucket_name,
+            known_key_cache=None,
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_part_size=S3_MULTIPART_PART_SIZE,
+            multipart_concurrency=S3_MULTIPART_CONCURRENCY,
+            **kwargs
+    ):
         self._s3_resource = None
         self._s3_bucket = None
         self.bucket_name = bucket_name
+        self._lock = threading.Lock()
+        self._known_keys = known_key_cache
+        if self._known_keys is None and S3_KNOWN_KEY_CACHE_TTL_SECONDS:
+            self._known_keys = TTLCache(max_size=S3_KNOWN_KEY_CACHE_SIZE, ttl_seconds=S3_KNOWN_KEY_CACHE_TTL_SECONDS)
+
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_part_size,
+            max_concurrency=multipart_concurrency,
+        )
+        # not exposed by boto3's TransferConfig, but read by s3transfer when buffering non-seekable streams
+        self.transfer_config.max_in_memory_upload_chunks = max(S3_STREAM_UPLOAD_CHUNKS_IN_MEMORY, multipart_concurrency)
 
     @property
     def s3_resource(self):
-        if self._s3_resource is None:
-            self._s3_resource = boto3.resource("s3")
-            print("Connected to S3 resource.")
+        with self._lock:  # the navigator can be shared by concurrent events
+            if self._s3_resource is None:
+                self._s3_resource = boto3.resource("s3")
+                print("Connected to S3 resource.")
         return self._s3_resource
 
     @property
@@ -23,23 +80,166 @@ class S3Navigator(FileNavigatorBase):
             self._s3_bucket = self.s3_resource.Bucket(self.bucket_name)
         return self._s3_bucket
 
+    @property
+    def s3_client(self):
+        """ Unlike the resource, the client is thread safe """
+        return self.s3_resource.meta.client
+
+    def prepare_connection(self) -> None:
+        """ Creates the client, which loads boto3's service model and credentials """
+        self.s3_client
+
+    @staticmethod
+    def _build_key(directory_path: str, file_name: str) -> str:
+        if not directory_path:
+            return file_name
+        return f"{directory_path.rstrip('/')}/{file_name}"
+
     def is_file_in_directory(self, directory_path: str, file_name: str) -> bool:
-        """ Checks to see if file exists in directory (s3 uses "key")
+        """ Checks to see if file exists in directory (s3 uses "key") with a single HEAD request on the exact key.
+            Keys already known to exist are answered from the in-process cache without a request.
 
         Returns:
             True if file exists
-            False if file does not exist in an existing path, creating path if necessary
+            False if file does not exist (s3 has no directories to create)
         """
-        bucket_collection = self.s3_bucket.objects.filter(Prefix=directory_path)
-        object_name_list = [obj.key for obj in bucket_collection]
-        for name in object_name_list:
-            if file_name in name:
-                return True
-        return False
-
-    def save_file_to_directory(self, file_data: bytes, file_path: str):
+        key = self._build_key(directory_path, file_name)
+        if self._known_keys is not None and key in self._known_keys:
+            return True
+
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in self.MISSING_KEY_ERROR_CODES:
+                return False
+            raise
+
+        self._remember_key(key)
+        return True
+
+    def save_file_to_directory(self, file_data: bytes | BinaryIO, file_path: str, content_type: str = None):
         """ Saves the file to the S3 Bucket, if the path doesn't exist, it will create one
             Thus it is important to have the correct path or there will be variations and different "folders"
+            Small images are sent in a single request. Larger ones, and streams, are sent with a managed upload
+            that switches to concurrent multipart uploads above the threshold, keeping only a few parts in memory.
+            Without a `content_type`, it is guessed from the extension.
+        """
+        content_type = content_type or self.get_content_type(file_path)
+        if isinstance(file_data, bytes) and len(file_data) < self.transfer_config.multipart_threshold:
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=file_path, Body=file_data, ContentType=content_type)
+        else:
+            if isinstance(file_data, bytes):
+                file_data = io.BytesIO(file_data)  # seekable, so the parts are read without copying
+            self.s3_client.upload_fileobj(
+                file_data,
+                self.bucket_name,
+                file_path,
+                ExtraArgs={"ContentType": content_type},
+                Config=self.transfer_config,
+            )
+        self._remember_key(file_path)
+
+    @classmethod
+    def get_content_type(cls, file_path: str) -> str:
+        """ So browsers display the image instead of downloading it """
+        extension = posixpath.splitext(file_path)[1].lower()
+        if extension in cls.CONTENT_TYPES:
+            return cls.CONTENT_TYPES[extension]
+        content_type, _ = mimetypes.guess_type(f"file{extension}", strict=False)
+        return content_type or cls.DEFAULT_CONTENT_TYPE
+
+    def cleanup_directory_files(
+            self,
+            directory_path,
+            cutoff_time_in_seconds=None,
+            dry_run=False,
+            max_seconds=None,
+            max_workers=CLEANUP_MAX_WORKERS,
+            batch_size=S3_DELETE_BATCH_SIZE,
+    ) -> CleanupReport:
+        """ Removes objects under the directory (prefix) if their modified date is earlier than the specified cutoff
+            time. Defaults to a year.
+            The listing is paged and expired keys are deleted `batch_size` at a time with DeleteObjects, at most
+            `max_workers` requests at once, so only a few batches are held in memory however many objects there are.
         """
-        img_obj = self.s3_resource.Object(self.bucket_name, file_path)
-        img_obj.put(Body=file_data)
+        self.check_cleanup_directory(directory_path)
+        cutoff_time = cutoff_time_in_seconds or self.DEFAULT_CUTOFF_TIME_IN_SECONDS
+        oldest_time_possible = int(dt.now().timestamp()) - cutoff_time
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        report = CleanupReport(directory_path, oldest_time_possible, dry_run=dry_run)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for batch in self._iter_expired_batches(directory_path, oldest_time_possible, batch_size, report, deadline):
+                if dry_run:
+                    for key, size in batch:
+                        report.add_removed(key, size)
+                    continue
+
+                if len(pending) >= max_workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self._delete_batch, batch, report))
+            for future in pending:
+                future.result()
+
+        print(f"Cleanup of '{directory_path}' {'would remove' if dry_run else 'removed'} {report.files_removed} objects "
+              f"({report.bytes_reclaimed / 1024 / 1024:.2f} MB).")
+        return report.finish()
+
+    @staticmethod
+    def check_cleanup_directory(directory_path: str) -> None:
+        """ The bucket root holds the channel directories without a gallery path - it is cleaned up only when
+            `CLEANUP_BUCKET_ROOT` says the bucket holds nothing else
+        """
+        if not CLEANUP_BUCKET_ROOT:
+            FileNavigatorBase.check_cleanup_directory(directory_path)
+
+    def _iter_expired_batches(self, directory_path, oldest_time_possible, batch_size, report, deadline):
+        """ Pages through the objects under the directory, yielding the (key, size) of expired ones in batches """
+        is_bucket_root = directory_path.strip("/") in ("", ".")
+        prefix = "" if is_bucket_root else f"{directory_path.rstrip('/')}/"
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+
+        batch = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            if deadline is not None and time.monotonic() >= deadline:
+                report.stop_early()
+                break
+
+            report.directories_scanned += 1  # pages of up to 1000 keys, S3 has no directories
+            for s3_object in page.get("Contents", []):
+                if self._is_in_hidden_directory(s3_object["Key"][len(prefix):]):  # e.g. the content index
+                    continue
+                report.files_scanned += 1
+                if s3_object["LastModified"].timestamp() < oldest_time_possible:
+                    batch.append((s3_object["Key"], s3_object.get("Size", 0)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _is_in_hidden_directory(self, relative_key: str) -> bool:
+        return any(self.is_hidden(directory) for directory in relative_key.split("/")[:-1])
+
+    def _delete_batch(self, batch: list[tuple[str, int]], report: CleanupReport) -> None:
+        try:
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key, _ in batch], "Quiet": True},  # only errors are returned
+            )
+        except ClientError as error:
+            response = {"Errors": [{"Key": key, "Message": str(error)} for key, _ in batch]}
+
+        errors = {error["Key"]: error.get("Message") for error in response.get("Errors", [])}
+        for key, size in batch:
+            if key in errors:
+                report.add_failed(key, errors[key])
+                continue
+            report.add_removed(key, size)
+            if self._known_keys is not None:
+                self._known_keys.discard(key)
+
+    def _remember_key(self, key: str) -> None:
+        if self._known_keys is not None:
+            self._known_keys.set(key)
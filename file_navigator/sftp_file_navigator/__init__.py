@@ -1,2 +1,3 @@
 from .sftp_connector import SFTPConnector
+from .sftp_connection_pool import SFTPConnectionPool, get_sftp_connection_pool
 from .sftp_navigator import SFTPNavigator
@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import (
+    SFTP_POOL_MAX_SIZE,
+    SFTP_POOL_IDLE_TIMEOUT_SECONDS,
+    SFTP_POOL_CHECKOUT_TIMEOUT_SECONDS,
+    SFTP_HEALTH_CHECK_IDLE_SECONDS,
+)
+from file_navigator.sftp_file_navigator.sftp_connector import SFTPConnector
+from utils.specified_exceptions import SFTPTimeoutError
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+class SFTPConnectionPool:
+    """ Bounded pool of SFTP sessions, keyed by (host, port, username) so every tenant's server gets its own sessions.
+
+        A session is checked out for one operation at a time. Idle sessions are checked before being handed out
+        (and probed with a round trip after being idle for a while), replaced transparently when they have dropped,
+        closed after `idle_timeout_seconds`, and the least recently used one is closed to make room for a new
+        connection once `max_size` sessions are open. Sessions are closed after the pool lock is released, so a slow
+        server never holds up the checkouts for the others.
+    """
+
+    def __init__(
+            self,
+            max_size=SFTP_POOL_MAX_SIZE,
+            idle_timeout_seconds=SFTP_POOL_IDLE_TIMEOUT_SECONDS,
+            checkout_timeout_seconds=SFTP_POOL_CHECKOUT_TIMEOUT_SECONDS,
+            health_check_idle_seconds=SFTP_HEALTH_CHECK_IDLE_SECONDS,
+            connector_factory=SFTPConnector,
+            clock=time.monotonic,
+    ):
+        self.max_size = max_size
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.checkout_timeout_seconds = checkout_timeout_seconds
+        self.health_check_idle_seconds = health_check_idle_seconds
+        self._connector_factory = connector_factory
+        self._clock = clock
+        self._idle = OrderedDict()  # connector -> (key, idle since), least recently used first
+        self._keys = {}  # connector -> key, of every open session
+        self._preparing = {}  # key -> sessions being opened ahead of time by `prepare`
+        self._condition = threading.Condition()
+
+    @property
+    def open_sessions(self) -> int:
+        return len(self._keys)
+
+    @property
+    def idle_sessions(self) -> int:
+        return len(self._idle)
+
+    @contextmanager
+    def connection(self, host, port, username, password):
+        """ Checks out a session for the block and returns it to the pool afterwards """
+        connector = self.checkout(host, port, username, password)
+        try:
+            yield connector.sftp_session
+        finally:
+            self.release(connector)
+
+    def checkout(self, host, port, username, password) -> SFTPConnector:
+        """ Returns a live connected session for the server, reusing an idle one when possible """
+        key = (host, port, username)
+        deadline = time.monotonic() + self.checkout_timeout_seconds  # real time, since the condition waits for real
+
+        while True:
+            with self._condition:
+                stale_connectors = self._take_expired_sessions()
+                connector, idle_since = self._take_idle_session(key)
+                if connector is None:
+                    # a session being prepared for the server is closer to ready than a new one
+                    is_waiting = bool(self._preparing.get(key))
+                    if not is_waiting and self.open_sessions >= self.max_size:
+                        least_recently_used = self._take_least_recently_used()
+                        is_waiting = least_recently_used is None
+                        stale_connectors.extend([least_recently_used] if least_recently_used else [])
+                    if is_waiting and not stale_connectors:
+                        remaining_seconds = deadline - time.monotonic()
+                        if remaining_seconds <= 0:
+                            raise SFTPTimeoutError(f"No SFTP session became available in the pool for {key}.")
+                        self._condition.wait(remaining_seconds)
+                        continue
+                    if not is_waiting:
+                        connector = self._connector_factory()
+                        self._keys[connector] = key  # reserves the slot while connecting
+
+            self._close_each(stale_connectors)
+            if connector is None:  # waits once the stale sessions are closed
+                continue
+            if idle_since is None:
+                return self._connect(connector, host, port, username, password)
+            if self._is_usable(connector, idle_since):
+                return connector
+            self._discard(connector)  # dropped - try the next idle session or reconnect
+
+    def prepare(self, host, port, username, password) -> None:
+        """ Opens a session for the server ahead of its first operation, e.g. while Slack is being called,
+            unless one is already idle or being prepared. Checkouts for the server wait for it rather than
+            opening another connection. A failure is only logged - the next checkout connects as usual.
+        """
+        key = (host, port, username)
+        connector = None
+        with self._condition:
+            stale_connectors = self._take_expired_sessions()
+            is_needed = not self._preparing.get(key) and not any(idle_key == key for idle_key, _ in self._idle.values())
+            if is_needed and self.open_sessions < self.max_size:  # never evicts a session just to prepare one
+                connector = self._connector_factory()
+                self._keys[connector] = key
+                self._preparing[key] = self._preparing.get(key, 0) + 1
+
+        self._close_each(stale_connectors)
+        if connector is None:
+            return
+
+        is_connected = False
+        try:
+            connector.set_sftp_session(host=host, username=username, password=password, port=port)
+            is_connected = True
+        except Exception as err:
+            print(f"Could not prepare an SFTP session for {key}: {err}")
+        finally:
+            with self._condition:
+                self._preparing[key] -= 1
+                if not self._preparing[key]:
+                    del self._preparing[key]
+                is_kept = is_connected and connector in self._keys  # unless `close_all` was called in the meantime
+                if is_kept:
+                    self._idle[connector] = (key, self._clock())
+                else:
+                    self._keys.pop(connector, None)
+                self._condition.notify_all()  # every checkout waiting for the server
+            if not is_kept:  # a failed connection may still hold a socket and transport thread
+                self._close(connector)
+
+    def release(self, connector: SFTPConnector) -> None:
+        """ Returns the session to the pool, or closes it if the connection dropped while it was used """
+        if not connector.is_session_active():
+            self._discard(connector)
+            return
+
+        with self._condition:
+            key = self._keys.get(connector)
+            if key is not None:  # unless closed by `close_all` in the meantime
+                self._idle[connector] = (key, self._clock())
+                self._condition.notify()
+        if key is None:
+            self._close(connector)
+
+    def close_idle(self, host, port, username) -> None:
+        """ Closes the idle sessions of one server, e.g. when its credentials changed """
+        key = (host, port, username)
+        with self._condition:
+            stale_connectors = [connector for connector, (idle_key, _) in self._idle.items() if idle_key == key]
+            for connector in stale_connectors:
+                self._remove(connector)
+        self._close_each(stale_connectors)
+
+    def close_all(self) -> None:
+        """ Closes the idle sessions and forgets the checked out ones, which are closed when released """
+        with self._condition:
+            idle_connectors = list(self._idle)
+            self._idle.clear()
+            self._keys.clear()
+            self._condition.notify_all()
+        self._close_each(idle_connectors)
+
+    def _connect(self, connector, host, port, username, password) -> SFTPConnector:
+        try:
+            connector.set_sftp_session(host=host, username=username, password=password, port=port)
+        except Exception:
+            with self._condition:
+                self._remove(connector)
+            self._close(connector)  # a failed connection may still hold a socket and transport thread
+            raise
+        return connector
+
+    def _is_usable(self, connector, idle_since: float) -> bool:
+        if self._clock() - idle_since >= self.health_check_idle_seconds:
+            return connector.is_session_responsive()
+        return connector.is_session_active()
+
+    def _take_idle_session(self, key):
+        """ The most recently used session of the server, which is the least likely to have dropped """
+        for connector, (idle_key, idle_since) in reversed(self._idle.items()):
+            if idle_key == key:
+                del self._idle[connector]
+                return connector, idle_since
+        return None, None
+
+    def _take_least_recently_used(self) -> SFTPConnector | None:
+        """ Removes the least recently used idle session from the pool, for the caller to close """
+        if not self._idle:
+            return None
+        connector = next(iter(self._idle))
+        self._remove(connector)
+        return connector
+
+    def _take_expired_sessions(self) -> list[SFTPConnector]:
+        """ Removes the sessions idle past the timeout from the pool, for the caller to close """
+        now = self._clock()
+        expired = [connector for connector, (_, idle_since) in self._idle.items()
+                   if now - idle_since >= self.idle_timeout_seconds]
+        for connector in expired:
+            self._remove(connector)
+        return expired
+
+    def _discard(self, connector) -> None:
+        with self._condition:
+            self._remove(connector)
+        self._close(connector)
+
+    def _remove(self, connector) -> None:
+        self._idle.pop(connector, None)
+        self._keys.pop(connector, None)
+        self._condition.notify()
+
+    def _close_each(self, connectors) -> None:
+        for connector in connectors:
+            self._close(connector)
+
+    @staticmethod
+    def _close(connector) -> None:
+        try:
+            connector.close_sftp_session()
+        except Exception as err:
+            print(f"An error occurred when closing an SFTP session: {err}")
+
+
+def get_sftp_connection_pool() -> SFTPConnectionPool:
+    """ The pool shared by every SFTP navigator in the process, created on first use """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SFTPConnectionPool()
+        return _shared_pool
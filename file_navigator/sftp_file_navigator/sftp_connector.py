@@ -1,14 +1,22 @@
 import paramiko
 from paramiko.ssh_exception import AuthenticationException, SSHException
 
-from utils.specified_exceptions import FailedSFTPSessionConnectionError, SFTPAuthenticationError
+from config import SFTP_KEEPALIVE_SECONDS, SFTP_CONNECT_TIMEOUT_SECONDS
+from utils.specified_exceptions import FailedSFTPSessionConnectionError, SFTPAuthenticationError, SFTPTimeoutError
 
 
 class SFTPConnector:
 
-    def __init__(self, ssh_client=paramiko.SSHClient()):
-        self._ssh_client = ssh_client
+    def __init__(
+            self,
+            ssh_client=None,
+            keepalive_seconds=SFTP_KEEPALIVE_SECONDS,
+            connect_timeout_seconds=SFTP_CONNECT_TIMEOUT_SECONDS,
+    ):
+        self._ssh_client = ssh_client if ssh_client is not None else paramiko.SSHClient()
         self._sftp_session = None
+        self.keepalive_seconds = keepalive_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
 
     @property
     def sftp_session(self):
@@ -17,12 +25,22 @@ class SFTPConnector:
     def _connect_to_sftp(self, host=None, username=None, password=None, port=None):
         try:
             self._ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self._ssh_client.connect(hostname=host, port=port, username=username, password=password)
+            self._ssh_client.connect(
+                hostname=host, port=port, username=username, password=password, timeout=self.connect_timeout_seconds
+            )
             print("Connected to SFTP server.")
         except AuthenticationException as error:
             raise SFTPAuthenticationError(f"Authentication Failed: {error}")
         except TimeoutError as error:
-            print(f"Connection Timedout: {error}")
+            raise SFTPTimeoutError(f"Connection Timedout: {error}")
+        except (SSHException, OSError) as error:
+            raise FailedSFTPSessionConnectionError(f"Failed to connect to the SFTP server: {error}")
+
+        transport = self._ssh_client.get_transport()
+        if transport is None:
+            return
+        if self.keepalive_seconds:  # stops firewalls and NATs from dropping idle sessions
+            transport.set_keepalive(self.keepalive_seconds)
 
     def set_sftp_session(self, host, username, password, port=22):
         self._connect_to_sftp(host=host, username=username, password=password, port=port)
@@ -31,7 +49,25 @@ class SFTPConnector:
         except SSHException as error:
             raise FailedSFTPSessionConnectionError(f"Failed to open a SFTP session SSH session is not active: {error}")
 
+    def is_session_active(self) -> bool:
+        """ Checks that the SFTP session was opened and its SSH transport is still connected """
+        if self._sftp_session is None:
+            return False
+        transport = self._ssh_client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def is_session_responsive(self) -> bool:
+        """ Makes a round trip to the server - unlike `is_session_active`, this notices connections dropped silently """
+        if not self.is_session_active():
+            return False
+        try:
+            self._sftp_session.normalize(".")
+            return True
+        except (OSError, SSHException, EOFError):
+            return False
+
     def close_sftp_session(self):
-        self._sftp_session.close()
+        if self._sftp_session is not None:
+            self._sftp_session.close()
         self._ssh_client.close()
         print("Closed SFTP session and disconnected from SFTP server.")
@@ -1,7 +1,20 @@
+import posixpath
+import stat
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime as dt
+from typing import BinaryIO
 
+from config import IMAGE_CHUNK_SIZE, CLEANUP_MAX_WORKERS, SFTP_REMOVE_BATCH_SIZE
 from file_navigator import FileNavigatorBase
-from file_navigator.sftp_file_navigator import SFTPConnector
+from file_navigator.cleanup_report import CleanupReport
+from file_navigator.sftp_file_navigator.sftp_connection_pool import get_sftp_connection_pool
+
+
+MEGABYTE = 1024 * 1024
 
 
 def log(text):
@@ -12,30 +25,126 @@ def log(text):
 class SFTPNavigator(FileNavigatorBase):
 
     DEFAULT_CUTOFF_TIME_IN_SECONDS = 60 * 60 * 24 * 365  # about a year
+    DEFAULT_PORT = 22
 
-    def __init__(self, host=None, username=None, password=None, port=None, sftp_connector=SFTPConnector(), **kwargs):
-        self._host = host
-        self._username = username
-        self._password = password
-        self._port = port
+    def __init__(
+            self, host=None, username=None, password=None, port=None, sftp_connector=None, connection_pool=None, **kwargs
+    ):
+        # the app credentials name these `sftp_host`, `sftp_username`, ... (see app-credentials-layout.json)
+        self._host = host if host is not None else kwargs.get("sftp_host")
+        self._username = username if username is not None else kwargs.get("sftp_username")
+        self._password = password if password is not None else kwargs.get("sftp_password")
+        self._port = port if port is not None else kwargs.get("sftp_port") or self.DEFAULT_PORT
+        # a given connector is a dedicated connection, otherwise every operation checks a session out of the pool
         self._connector = sftp_connector
+        if sftp_connector is not None:
+            self._pool = None
+        else:
+            self._pool = connection_pool if connection_pool is not None else get_sftp_connection_pool()
         self._sftp_session = None
+        # directories known to exist on the server - the pooled sessions all log in to it as the same user, so they
+        # share what they know, and a directory removed since is forgotten when saving to it fails
+        self._known_directories = set()
+        # a paramiko SFTP session can't serve concurrent requests, so events sharing a dedicated connection take turns
+        self._lock = threading.RLock()
 
     @property
     def sftp_session(self):
-        if self._sftp_session is None:
-            self._connector.set_sftp_session(
-                host=self._host,
-                username=self._username,
-                password=self._password,
-                port=self._port,
-            )
-            self._sftp_session = self._connector.sftp_session
+        """ The session of the dedicated connection """
+        with self._lock:
+            if self._sftp_session is None:
+                self._connector.set_sftp_session(
+                    host=self._host,
+                    username=self._username,
+                    password=self._password,
+                    port=self._port,
+                )
+                self._sftp_session = self._connector.sftp_session
+                self._known_directories = set()
         return self._sftp_session
 
-    def _create_file(self, path: str) -> None:
-        self.sftp_session.mkdir(path)
-        log(f"File '{path}' created.")
+    @contextmanager
+    def _session(self):
+        """ A session for one operation - the dedicated one, or one checked out of the pool """
+        if self._pool is None:
+            with self._lock:
+                yield self.sftp_session
+            return
+
+        with self._pool.connection(self._host, self._port, self._username, self._password) as sftp_session:
+            yield sftp_session
+
+    def prepare_connection(self) -> None:
+        """ The SSH handshake often takes longer than the Slack calls, so the session is opened while they run """
+        if self._pool is not None:
+            self._pool.prepare(self._host, self._port, self._username, self._password)
+            return
+        self.sftp_session
+
+    def is_connection_alive(self) -> bool:
+        if self._pool is not None:  # the pool checks every session before handing it out
+            return True
+        if self._sftp_session is None:  # not connected yet, the session is opened lazily
+            return True
+        return self._connector.is_session_active()
+
+    def close_connection(self) -> None:
+        if self._pool is not None:
+            self._pool.close_idle(self._host, self._port, self._username)
+            return
+
+        with self._lock:
+            if self._sftp_session is not None:
+                self._connector.close_sftp_session()
+                self._sftp_session = None
+                self._known_directories = set()
+
+    @staticmethod
+    def _create_directory(sftp_session, path: str) -> None:
+        try:
+            sftp_session.mkdir(path)
+        except OSError:  # it may have been created in the meantime
+            sftp_session.stat(path)
+            return
+        log(f"Directory '{path}' created.")
+
+    def _ensure_directory(self, sftp_session, directory_path: str) -> bool:
+        """ Makes sure the directory exists, creating it and any missing parents
+
+        Returns:
+            True if the directory had to be created
+            False if it already existed
+        """
+        if not directory_path or directory_path in self._known_directories:
+            return False
+
+        created = False
+        try:
+            sftp_session.stat(directory_path)
+        except FileNotFoundError:
+            self._ensure_directory(sftp_session, posixpath.dirname(directory_path.rstrip("/")))
+            self._create_directory(sftp_session, directory_path)
+            created = True
+
+        self._known_directories.add(directory_path)
+        return created
+
+    def _forget_directory(self, directory_path: str) -> None:
+        """ Checks the directory and its parents again next time, as any of them may have been removed """
+        while directory_path:
+            self._known_directories.discard(directory_path)
+            parent_path = posixpath.dirname(directory_path.rstrip("/"))
+            if parent_path == directory_path:  # the root
+                break
+            directory_path = parent_path
+
+    @staticmethod
+    def _is_file(sftp_session, file_path: str) -> bool:
+        try:
+            sftp_session.stat(file_path)
+            return True
+        except FileNotFoundError:
+            return False
 
     def is_file_in_directory(self, directory_path: str, file_name: str) -> bool:
         """ Checks to see if file exists in directory
@@ -44,27 +153,163 @@ class SFTPNavigator(FileNavigatorBase):
             True if file exists
             False if file does not exist in an existing path, creating path if necessary
         """
+        with self._session() as sftp_session:
+            if self._ensure_directory(sftp_session, directory_path):  # a new directory is empty
+                return False
+            return self._is_file(sftp_session, f"{directory_path}/{file_name}")
+
+    def save_file_to_directory(self, file_data: bytes | BinaryIO, file_path: str, content_type: str = None):
+        """ Writes the file to the SFTP server, streams are written chunk by chunk.
+            The data goes to a temporary file that is renamed into place, so nobody sees a half-written image.
+            SFTP stores no content type, so `content_type` is ignored.
+        """
+        temp_path = self._get_temp_path(file_path)
+        start = time.perf_counter()
+
+        with self._session() as sftp_session:
+            try:
+                size = self._write_file(sftp_session, file_data, temp_path)
+                self._rename(sftp_session, temp_path, file_path)
+            except FileNotFoundError:  # the directory was removed since it was checked, the retry creates it again
+                self._forget_directory(posixpath.dirname(file_path))
+                self._remove_quietly(sftp_session, temp_path)
+                raise
+            except Exception:
+                self._remove_quietly(sftp_session, temp_path)
+                raise
+
+        seconds = time.perf_counter() - start
+        log(f"Uploaded '{file_path}' ({size / MEGABYTE:.2f} MB) in {seconds:.2f} s, "
+            f"{size / MEGABYTE / max(seconds, 1e-6):.2f} MB/s.")
+
+    @staticmethod
+    def _write_file(sftp_session, file_data: bytes | BinaryIO, file_path: str) -> int:
+        """ Writes without waiting for the server to acknowledge each write (pipelined) - errors surface on close
+
+        Returns:
+            the number of bytes written
+        """
+        size = 0
+        with sftp_session.open(file_path, "wb") as file:
+            file.set_pipelined(True)
+            if isinstance(file_data, bytes):
+                file.write(file_data)
+                return len(file_data)
+
+            while chunk := file_data.read(IMAGE_CHUNK_SIZE):
+                file.write(chunk)
+                size += len(chunk)
+        return size
+
+    @staticmethod
+    def _rename(sftp_session, source_path: str, destination_path: str) -> None:
+        """ Atomically replaces the destination - plain SFTP renames fail when the destination exists """
         try:
-            directory_contents = self.sftp_session.listdir(directory_path)
-            return file_name in directory_contents
-        except FileNotFoundError:  # no directory found
-            self._create_file(directory_path)
-            return False
+            sftp_session.posix_rename(source_path, destination_path)
+        except OSError as err:
+            if err.errno is not None:  # e.g. permission denied - not an unsupported extension
+                raise
+            try:
+                sftp_session.remove(destination_path)
+            except FileNotFoundError:
+                pass
+            sftp_session.rename(source_path, destination_path)
 
-    def save_file_to_directory(self, file_data: bytes, file_path: str):
-        with self.sftp_session.open(file_path, "wb+") as file:
-            file.write(file_data)
+    @staticmethod
+    def _remove_quietly(sftp_session, file_path: str) -> None:
+        try:
+            sftp_session.remove(file_path)
+        except (OSError, EOFError) as err:
+            log(f"Could not remove the partial upload '{file_path}': {err}")
+
+    @staticmethod
+    def _get_temp_path(file_path: str) -> str:
+        """ A hidden file next to the destination, unique per upload """
+        directory_path, file_name = posixpath.split(file_path)
+        return posixpath.join(directory_path, f".{file_name}.{uuid.uuid4().hex[:8]}.part")
 
-    def cleanup_directory_files(self, directory_path, cutoff_time_in_seconds=None):
-        """ Removes files in a directory if the file's modified date is earlier than the specified cutoff time
-            Defaults to a year
+    def cleanup_directory_files(
+            self,
+            directory_path,
+            cutoff_time_in_seconds=None,
+            dry_run=False,
+            max_seconds=None,
+            max_workers=CLEANUP_MAX_WORKERS,
+            batch_size=SFTP_REMOVE_BATCH_SIZE,
+    ) -> CleanupReport:
+        """ Removes files in a directory and its subdirectories if the file's modified date is earlier than the
+            specified cutoff time. Defaults to a year.
+            Expired files are removed `batch_size` at a time on up to `max_workers` sessions while the walk goes on,
+            so a cleanup stopped after `max_seconds` has still removed what it found.
         """
+        self.check_cleanup_directory(directory_path)
         cutoff_time = cutoff_time_in_seconds or self.DEFAULT_CUTOFF_TIME_IN_SECONDS
+        oldest_time_possible = int(dt.now().timestamp()) - cutoff_time
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        report = CleanupReport(directory_path, oldest_time_possible, dry_run=dry_run)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for batch in self._iter_expired_batches(directory_path, oldest_time_possible, batch_size, report, deadline):
+                if dry_run:
+                    for file_path, size in batch:
+                        report.add_removed(file_path, size)
+                    continue
+
+                if len(pending) >= max_workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self._remove_files, batch, report, deadline))
+            for future in pending:
+                future.result()
+
+        log(f"Cleanup of '{directory_path}' {'would remove' if dry_run else 'removed'} {report.files_removed} files "
+            f"({report.bytes_reclaimed / MEGABYTE:.2f} MB).")
+        return report.finish()
+
+    def _iter_expired_batches(self, directory_path, oldest_time_possible, batch_size, report, deadline):
+        """ Walks the directory tree, yielding the (path, size) of files modified before `oldest_time_possible` in
+            batches. The session is only held while a directory is listed, so the removals can share it.
+        """
+        batch = []
+        directories = [directory_path]
+        while directories:
+            if self._is_past(deadline):
+                report.stop_early()
+                break
+
+            directory = directories.pop()
+            report.directories_scanned += 1
+            with self._session() as sftp_session:
+                entries = sftp_session.listdir_attr(directory)
+
+            for attributes in entries:
+                path = posixpath.join(directory, attributes.filename)
+                if stat.S_ISDIR(attributes.st_mode or 0):
+                    if not self.is_hidden(attributes.filename):  # e.g. .ssh, or the content index
+                        directories.append(path)
+                    continue
+
+                report.files_scanned += 1
+                if oldest_time_possible > attributes.st_mtime:
+                    batch.append((path, attributes.st_size or 0))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
 
-        directory_contents = self.sftp_session.listdir_attr(directory_path)
-        current_timestamp = int(dt.now().timestamp())
+    def _remove_files(self, expired_files: list[tuple[str, int]], report: CleanupReport, deadline) -> None:
+        with self._session() as sftp_session:
+            for file_path, size in expired_files:
+                if self._is_past(deadline):
+                    report.stop_early()
+                    return
+                try:
+                    sftp_session.remove(file_path)
+                    report.add_removed(file_path, size)
+                except OSError as err:
+                    report.add_failed(file_path, err)
 
-        oldest_time_possible = current_timestamp - cutoff_time
-        expired_files = [file.filename for file in directory_contents if oldest_time_possible > file.st_mtime]
-        for filename in expired_files:
-            self.sftp_session.remove(f"{directory_path}/{filename}")
+    @staticmethod
+    def _is_past(deadline) -> bool:
+        return deadline is not None and time.monotonic() >= deadline
@@ -1,4 +1,14 @@
-from callback_functions import slack_events_url_endpoint_google_cloud_function, slack_events_url_endpoint_aws_lambda
+import os
+
+from config import PRELOAD_ON_COLD_START
+from utils.lazy_import import import_object
+
+# Platform entry points, imported when first called so a platform only loads its own dependencies
+PLATFORM_ENTRY_POINTS = {
+    "gcf": "callback_functions.gcf_callback:slack_events_url_endpoint_google_cloud_function",
+    "aws": "callback_functions.aws_callback:slack_events_url_endpoint_aws_lambda",
+    "aws_batch": "callback_functions.batch_callback:slack_events_batch_endpoint_aws_lambda",
+}
 
 
 def slack_events_callback(*args):
@@ -7,8 +17,54 @@ def slack_events_callback(*args):
 
 def slack_events_callback_factory(*args):
     if len(args) == 1:
-        return slack_events_url_endpoint_google_cloud_function(*args)
+        return import_object(PLATFORM_ENTRY_POINTS["gcf"])(*args)
+    elif len(args) == 2 and is_queue_batch(args[0]):
+        return import_object(PLATFORM_ENTRY_POINTS["aws_batch"])(*args)
     elif len(args) == 2:
-        return slack_events_url_endpoint_aws_lambda(*args)
+        return import_object(PLATFORM_ENTRY_POINTS["aws"])(*args)
     else:  # more than two arguments returned
         raise NotImplementedError("Expected only one or two arguments passed.")
+
+
+def is_queue_batch(event) -> bool:
+    """ SQS triggered Lambdas receive a batch of "Records" instead of an API Gateway request """
+    return isinstance(event, dict) and "Records" in event
+
+
+def slack_events_worker_callback(*args):
+    """ Entry point of the worker draining the event queue in the "queue" processing mode.
+        Triggered on a schedule (or by the queue), any arguments given by the platform are ignored.
+    """
+    from callback_functions import slack_events_queue_worker
+    return slack_events_queue_worker()
+
+
+def slack_events_cleanup_callback(*args):
+    """ Entry point of the retention cleanup of the galleries, triggered on a schedule.
+        Any arguments given by the platform are ignored.
+    """
+    from callback_functions import slack_events_cleanup_callback
+    return slack_events_cleanup_callback()
+
+
+def detect_platform() -> str | None:
+    """ Recognizes the serverless runtime from the environment variables it sets """
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        return "aws"
+    if os.environ.get("K_SERVICE") or os.environ.get("FUNCTION_TARGET"):
+        return "gcf"
+    return None
+
+
+def preload(platform: str) -> None:
+    """ Imports what the platform and configured storage backend need while the function initializes,
+        instead of during the first event
+    """
+    from slack_api.event_handler_factory import EventHandlerFactory
+
+    import_object(PLATFORM_ENTRY_POINTS[platform])
+    EventHandlerFactory().get_storage_navigator_classes()
+
+
+if PRELOAD_ON_COLD_START and detect_platform():
+    preload(detect_platform())
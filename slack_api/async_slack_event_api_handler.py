@@ -0,0 +1,21 @@
+from slack_api.slack_event_api_handler import SlackEventApiHandler
+from utils.async_io import run_blocking
+from utils.metrics import EventMetrics
+
+
+class AsyncSlackEventApiHandler:
+    """ Async wrapper of the SlackEventApiHandler, so one event loop can handle many file events at once.
+        Every step of an event is a blocking client call, so the event is handled by the synchronous handler
+        on the bounded blocking I/O executor - one thread per event either way, and only one flow to maintain.
+    """
+
+    def __init__(self, handler: SlackEventApiHandler):
+        self.handler = handler
+
+    @classmethod
+    def from_handler(cls, handler: SlackEventApiHandler) -> "AsyncSlackEventApiHandler":
+        """ Wraps a (cached) synchronous handler, sharing its Slack session and storage navigator """
+        return cls(handler)
+
+    async def handle_slack_event(self, event_data: dict, metrics: EventMetrics = None) -> str:
+        return await run_blocking(self.handler.handle_slack_event, event_data, metrics=metrics)
@@ -1,27 +1,53 @@
-from config import SOURCE_CONNECTION
-from file_navigator.s3_file_navigator import S3Navigator
-from file_navigator.sftp_file_navigator import SFTPNavigator
+from config import SOURCE_CONNECTION, IMAGE_RENDITIONS, GALLERY_PATH, CONTENT_INDEX, CONTENT_INDEX_SQLITE_PATH
 from slack_api import SlackEventApiHandler, SlackApiRequester
+from utils.content_index import create_content_index
+from utils.lazy_import import import_object
 
 
 class EventHandlerFactory:
     """ Factory that instantiates the handler class with the correct connection destination """
 
+    # Navigators are imported by path when first needed, so only the configured backend's client is loaded
     CONNECTION_MAP = {
-        "s3": S3Navigator,
-        "sftp": SFTPNavigator,
+        "s3": "file_navigator.s3_file_navigator:S3Navigator",
+        "sftp": "file_navigator.sftp_file_navigator:SFTPNavigator",
     }
+    COMPOSITE_NAVIGATOR = "file_navigator.composite_navigator:CompositeNavigator"
+    # imports Pillow, so only when renditions are configured
+    RENDITION_PROCESSOR = "utils.image_renditions:get_rendition_processor"
+
+    def get_storage_navigator_class(self, connection: str = SOURCE_CONNECTION):
+        return import_object(self.CONNECTION_MAP[connection])
+
+    def get_storage_navigator_classes(self, connection: str | list = SOURCE_CONNECTION) -> dict:
+        """ The navigator class of each destination, by connection name """
+        connections = [connection] if isinstance(connection, str) else connection
+        return {name: self.get_storage_navigator_class(name) for name in connections}
+
+    def create_storage_navigator(self, connection: str | list = SOURCE_CONNECTION, **credentials):
+        """ A navigator for the connection, or a `CompositeNavigator` writing to each one of a list of connections """
+        if isinstance(connection, str):
+            return self.get_storage_navigator_class(connection)(**credentials)
+
+        navigators = {
+            name: navigator_class(**credentials)
+            for name, navigator_class in self.get_storage_navigator_classes(connection).items()
+        }
+        return import_object(self.COMPOSITE_NAVIGATOR)(navigators)
 
     def create(self, **credentials):
         """ Creates and instantiates the handler
             Determines which type of connection as stated in the Config module
         """
-        storage_navigator_class = self.CONNECTION_MAP[SOURCE_CONNECTION]
-        storage_navigator = storage_navigator_class(**credentials)
+        storage_navigator = self.create_storage_navigator(**credentials)
         slack_api_requester = SlackApiRequester(bot_token=credentials["slack_bot_token"])
 
         handler = SlackEventApiHandler(
             file_storage_navigator=storage_navigator,
             slack_api_requester=slack_api_requester,
+            rendition_processor=import_object(self.RENDITION_PROCESSOR)() if IMAGE_RENDITIONS else None,
+            content_index=create_content_index(
+                CONTENT_INDEX, gallery_path=GALLERY_PATH, sqlite_path=CONTENT_INDEX_SQLITE_PATH, **credentials
+            ),
         )
         return handler
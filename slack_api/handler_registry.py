@@ -0,0 +1,67 @@
+import threading
+
+from slack_api.event_handler_factory import EventHandlerFactory
+
+
+class EventHandlerRegistry:
+    """ Keeps event handlers alive between warm serverless invocations, keyed by the Slack app id.
+        The handler holds the Slack requester and the storage navigator, so their clients and connections
+        are reused instead of being rebuilt on every request.
+    """
+
+    def __init__(self, handler_factory=None):
+        self._handler_factory = handler_factory if handler_factory is not None else EventHandlerFactory()
+        self._handlers = {}  # slack_app_id -> (credentials, handler)
+        self._lock = threading.Lock()
+
+    def get_handler(self, **credentials):
+        """ Returns the cached handler for the app, rebuilding it if the credentials changed
+            or the storage connection has gone stale
+        """
+        slack_app_id = credentials["slack_app_id"]
+        with self._lock:
+            cached = self._handlers.get(slack_app_id)
+            if cached is not None:
+                cached_credentials, handler = cached
+                if cached_credentials == credentials and self._is_handler_usable(handler):
+                    return handler
+                self._discard_handler(handler)
+
+            handler = self._handler_factory.create(**credentials)
+            self._handlers[slack_app_id] = (dict(credentials), handler)
+            return handler
+
+    def clear(self) -> None:
+        """ Closes every cached connection, stops the rendition worker processes and empties the registry """
+        with self._lock:
+            rendition_processors = []
+            for _, handler in self._handlers.values():
+                self._discard_handler(handler)
+                processor = getattr(handler, "rendition_processor", None)
+                if processor is not None and processor not in rendition_processors:  # shared by the handlers
+                    rendition_processors.append(processor)
+            self._handlers.clear()
+
+        for processor in rendition_processors:
+            try:
+                processor.close()
+            except Exception as err:
+                print(f"An error occurred when stopping the rendition processes: {err}")
+
+    @staticmethod
+    def _is_handler_usable(handler) -> bool:
+        try:
+            return handler.storage_navigator.is_connection_alive()
+        except Exception as err:
+            print(f"Could not check the storage connection, it will be rebuilt: {err}")
+            return False
+
+    @staticmethod
+    def _discard_handler(handler) -> None:
+        try:
+            handler.storage_navigator.close_connection()
+        except Exception as err:
+            print(f"An error occurred when closing a stale storage connection: {err}")
+
+
+handler_registry = EventHandlerRegistry()
@@ -1,4 +1,39 @@
+import random
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    IMAGE_CHUNK_SIZE,
+    SLACK_POOL_CONNECTIONS,
+    SLACK_POOL_MAXSIZE,
+    SLACK_REQUEST_TIMEOUT_SECONDS,
+    SLACK_MAX_RETRIES,
+    SLACK_RETRY_BACKOFF_SECONDS,
+    SLACK_RETRY_MAX_WAIT_SECONDS,
+)
+from utils.chunked_stream import ChunkedStream
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def create_slack_session(pool_connections=SLACK_POOL_CONNECTIONS, pool_maxsize=SLACK_POOL_MAXSIZE) -> requests.Session:
+    """ Session keeping connections to slack.com and files.slack.com open between requests """
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """ The session shared by every requester in the process, created on first use """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_slack_session()
+        return _shared_session
 
 
 class SlackApiRequester:
@@ -6,23 +41,77 @@ class SlackApiRequester:
     FILE_INFO_ENDPOINT = "files.info"
     CHAT_INFO_ENDPOINT = "conversations.info"
 
-    def __init__(self, bot_token, requester=requests) -> None:
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(
+            self,
+            bot_token,
+            requester=None,
+            max_retries=SLACK_MAX_RETRIES,
+            backoff_seconds=SLACK_RETRY_BACKOFF_SECONDS,
+            max_wait_seconds=SLACK_RETRY_MAX_WAIT_SECONDS,
+            sleep=time.sleep,
+    ) -> None:
         self._bot_token = bot_token
         self.request_headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self._bot_token}",
         }
-        self.requester = requester
+        self.requester = requester if requester is not None else get_shared_session()
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._sleep = sleep
 
     def _make_request(self, method, url, jsonify, **kwargs):
         if method == "GET":
-            response = self.requester.get(url, headers=self.request_headers, **kwargs)
+            response = self._get_with_retries(url, **kwargs)
             response.raise_for_status()
 
             if jsonify is True:
                 return response.json()
             return response
 
+    def _get_with_retries(self, url, **kwargs):
+        """ Retries rate limited (429) and server error responses, as well as connection errors,
+            waiting for as long as Slack's `Retry-After` header asks or a jittered exponential backoff otherwise.
+            The last response is returned once the retries run out or the wait would be too long.
+        """
+        for attempt in range(self.max_retries + 1):
+            is_last_attempt = attempt == self.max_retries
+            try:
+                response = self.requester.get(
+                    url, headers=self.request_headers, timeout=SLACK_REQUEST_TIMEOUT_SECONDS, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if is_last_attempt:
+                    raise
+                print(f"Slack request failed, retrying: {error}")
+                self._sleep(self._get_backoff(attempt))
+                continue
+
+            if response.status_code not in self.RETRY_STATUS_CODES or is_last_attempt:
+                return response
+
+            wait_seconds = self._get_retry_wait(response, attempt)
+            if wait_seconds > self.max_wait_seconds:
+                return response
+
+            print(f"Slack responded with {response.status_code}, retrying in {wait_seconds:.2f} seconds.")
+            response.close()
+            self._sleep(wait_seconds)
+
+    def _get_retry_wait(self, response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After")
+        try:
+            return float(retry_after) + random.uniform(0, self.backoff_seconds)
+        except (TypeError, ValueError):
+            return self._get_backoff(attempt)
+
+    def _get_backoff(self, attempt: int) -> float:
+        """ "Full jitter" backoff, so requests that were rate limited together don't retry together """
+        return random.uniform(0, min(self.max_wait_seconds, self.backoff_seconds * 2 ** attempt))
+
     def get_file_data(self, file_id: str) -> dict:
         file_response = self._make_request(
             "GET",
@@ -35,3 +124,12 @@ class SlackApiRequester:
     def get_image_data(self, file_url):
         image_response = self._make_request("GET", file_url, jsonify=False)
         return image_response.content
+
+    def get_image_stream(self, file_url, chunk_size=IMAGE_CHUNK_SIZE) -> ChunkedStream:
+        """ Streams the image instead of loading it into memory. The stream must be closed to release the connection. """
+        image_response = self._make_request("GET", file_url, jsonify=False, stream=True)
+        return ChunkedStream(
+            image_response.iter_content(chunk_size=chunk_size),
+            on_close=image_response.close,
+            content_type=image_response.headers.get("Content-Type"),
+        )
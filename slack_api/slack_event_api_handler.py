@@ -1,15 +1,27 @@
+import posixpath
+import re
+from contextlib import closing
+
 from config import (
     GALLERY_PATH,
     ACCEPTABLE_FILE_FORMATS,
-    EXCLUDE_THREADED_IMAGES
+    EXCLUDE_THREADED_IMAGES,
+    PREPARE_STORAGE_CONNECTION,
+    SLACK_IMAGE_TARGET_SIZE,
+    SLACK_MAX_DOWNLOAD_BYTES,
+    MAX_NAME_SUFFIX,
 )
+from utils.content_index import spool_and_hash
+from utils.blocking_io import get_blocking_io_executor
+from utils.metrics import EventMetrics
 from utils.specified_exceptions import (
     ErrorMessages as Err,
     UnexpectedEventTypeError,
     SlackApiError,
     FileFormatError,
+    FileTooLargeError,
+    FileAlreadyExistsError,
     WrongChannelProvidedError,
-    FileAlreadyExistsError
 )
 
 
@@ -20,19 +32,38 @@ def return_status(status, message):
     }
 
 
+class EventOutcomes:
+    """ How a file event ended - reported back to the callback so it can be counted """
+    SAVED = "saved"
+    DUPLICATE = "duplicate"  # the file already exists, nothing was downloaded
+    REDELIVERED = "redelivered"  # the event or file was already accepted, the delivery was ignored
+    THREADED = "threaded"
+    QUEUED = "queued"  # acknowledged, a worker processes it later
+    WRONG_FORMAT = "wrong_format"  # the file isn't an acceptable image format
+    TOO_LARGE = "too_large"  # the file is larger than SLACK_MAX_DOWNLOAD_BYTES, without a smaller thumbnail
+    INVALID = "invalid"  # the event can never be handled (wrong event type or channel)
+    ERROR = "error"
+
+
 class SlackEventApiHandler:
 
     SUCCESSFUL_CHALLENGE_MESSAGE = "A valid challenge received."
     FAILED_CHALLENGE_MESSAGE = "Did not receive a valid challenge."
+    ORIGINAL_URL_KEY = "url_private"
+    THUMBNAIL_URL_KEY = re.compile(r"thumb_(\d+)")  # e.g. thumb_360, at most 360px wide and high
 
     def __init__(
             self,
             file_storage_navigator=None,
             slack_api_requester=None,
+            rendition_processor=None,
+            content_index=None,
             **kwargs
     ) -> None:
         self.storage_navigator = file_storage_navigator
         self.slack_api_requester = slack_api_requester
+        self.rendition_processor = rendition_processor  # saves resized copies next to the images, when given
+        self.content_index = content_index  # detects duplicates by content rather than by name, when given
 
     @classmethod
     def respond_to_url_verification(cls, response: dict) -> dict:
@@ -51,37 +82,279 @@ class SlackEventApiHandler:
 
         return data
 
-    def handle_slack_event(self, event_data: dict) -> None:
-        """ When a Slack event arrives, determines how the event is to be handled by event type. """
+    def handle_slack_event(self, event_data: dict, metrics: EventMetrics = None) -> str:
+        """ When a Slack event arrives, determines how the event is to be handled by event type.
+
+        Args:
+            metrics: records the duration of each stage, when given
+        Returns:
+            The event outcome (one of `EventOutcomes`)
+        """
         if event_data["event"]["type"] != "file_shared":
             raise UnexpectedEventTypeError(Err.WRONG_EVENT_TYPE)
 
-        self._handle_new_file_event(event_data)
+        return self._handle_new_file_event(event_data, metrics if metrics is not None else EventMetrics())
 
-    def _handle_new_file_event(self, file_event_data: dict) -> None:
+    def _handle_new_file_event(self, file_event_data: dict, metrics: EventMetrics) -> str:
         """ When a file creation event is received from Slack, this method responds to slack to obtain the file data,
-            the image data and downloads the image to the correct SFTP location.
+            checks the destination and, only if the file isn't there yet, downloads the image to the correct location.
         """
         file_id = file_event_data["event"]["file_id"]
         file_channel_id = file_event_data["event"]["channel_id"]
 
-        file_data = self._get_file_data_from_slack(file_id, file_channel_id)
+        self._prepare_connection_in_background()
+        with metrics.time("files_info"):
+            file_data = self._get_file_data_from_slack(file_id, file_channel_id)
+
+        if self._is_excluded_thread(file_data, file_channel_id):
+            return EventOutcomes.THREADED
+
+        file_url = self._get_file_url(file_data, metrics)
+        directory_path, file_name = self._get_destination(file_data, file_channel_id)
+        if self.content_index is None:  # with the index, a file of the same name may be a different image
+            with metrics.time("exists_check"):
+                is_file_saved = self.storage_navigator.is_file_in_directory(directory_path, file_name)
+            if is_file_saved:
+                print(f"{Err.FILE_EXISTS} Skipped downloading '{directory_path}/{file_name}'.")
+                return EventOutcomes.DUPLICATE
+
+        with metrics.time("download"):
+            image_stream = self.slack_api_requester.get_image_stream(file_url)
+        content_type = self._get_content_type(file_data, file_url, image_stream)
+        with closing(image_stream):
+            if self.content_index is not None:
+                return self._save_unique_image(image_stream, directory_path, file_name, content_type, metrics)
+
+            with metrics.time("upload"):
+                outcome, renditions = self._save_image(image_stream, f"{directory_path}/{file_name}", content_type)
+            self._record_image_transfer(metrics, image_stream)
+
+        self._save_renditions(renditions, outcome, metrics)
+        return outcome
+
+    def _save_unique_image(
+            self, image_stream, directory_path: str, file_name: str, content_type: str | None, metrics: EventMetrics
+    ) -> str:
+        """ Reads the image into a spooled file while hashing it, and saves it unless the gallery already has
+            the same content. A different image with the same name is saved under a suffixed name.
+        """
+        with metrics.time("download"):  # waiting on Slack, the spooled file is local
+            image_spool, content_hash = spool_and_hash(image_stream)
+        metrics.set_bytes("image_bytes", image_stream.bytes_read)
+
+        with image_spool:
+            with metrics.time("exists_check"):
+                file_path = self._claim_content_path(content_hash, directory_path, file_name, metrics)
+            if file_path is None:
+                return EventOutcomes.DUPLICATE
+
+            outcome = EventOutcomes.ERROR
+            try:
+                with metrics.time("upload"):
+                    outcome, renditions = self._save_image(image_spool, file_path, content_type)
+            finally:
+                if outcome == EventOutcomes.SAVED:
+                    self.content_index.commit(content_hash, file_path)
+                else:  # so the retry saves it
+                    self.content_index.release(content_hash, file_path)
+                self.content_index.release_path(file_path)
+
+        self._save_renditions(renditions, outcome, metrics)
+        return outcome
+
+    def _claim_content_path(self, content_hash: str, directory_path: str, file_name: str, metrics: EventMetrics):
+        """ The path to save the content at, claimed and reserved, or None when the gallery already has it """
+        indexed = self.content_index.get(content_hash)
+        if indexed is not None and indexed.is_pending:
+            print(f"{Err.CONTENT_EXISTS} '{directory_path}/{file_name}' is identical to an image being saved.")
+            return None
+        if indexed is not None and self._is_path_saved(indexed.file_path):
+            print(f"{Err.CONTENT_EXISTS} '{directory_path}/{file_name}' is identical to '{indexed.file_path}'.")
+            metrics.set_property("duplicate_of", indexed.file_path)
+            self._reference_content(indexed.file_path, directory_path, file_name, metrics)
+            return None
+
+        file_path = self._reserve_free_path(directory_path, file_name)
+        replaced_path = indexed.file_path if indexed is not None else None  # removed, e.g. by the retention cleanup
+        if not self.content_index.claim(content_hash, file_path, replaced_path):
+            self.content_index.release_path(file_path)
+            print(f"{Err.CONTENT_EXISTS} '{directory_path}/{file_name}' is identical to an image saved concurrently.")
+            return None
+        return file_path
+
+    def _reference_content(self, stored_path: str, directory_path: str, file_name: str, metrics: EventMetrics) -> None:
+        """ An image stored in another channel's gallery is referenced at a path of this channel's gallery,
+            so the channel still has it. The same image shared again in the channel keeps its first reference.
+        """
+        if posixpath.dirname(stored_path) == directory_path:
+            return
+
+        for file_path in self._get_candidate_paths(directory_path, file_name):
+            referenced_path = self.content_index.resolve(file_path)
+            if referenced_path == stored_path:
+                metrics.set_property("referenced_as", file_path)
+                return
+            if referenced_path is None and not self._is_path_saved(file_path):
+                break
+
+        try:
+            file_path = self._reserve_free_path(directory_path, file_name)
+        except FileAlreadyExistsError as err:  # the image is stored regardless, only the reference is missing
+            print(err)
+            return
+        try:
+            if self.content_index.add_reference(file_path, stored_path):
+                metrics.set_property("referenced_as", file_path)
+        finally:
+            self.content_index.release_path(file_path)
+
+    def _is_path_saved(self, file_path: str) -> bool:
+        return self.storage_navigator.is_file_in_directory(*posixpath.split(file_path))
+
+    def _reserve_free_path(self, directory_path: str, file_name: str) -> str:
+        """ The path of the file, suffixed as 'name-1.jpg', 'name-2.jpg', ... when a different image has its name,
+            is being saved at it or is referenced at it. The path is reserved before it is checked, so it stays free
+            until released.
+        """
+        for file_path in self._get_candidate_paths(directory_path, file_name):
+            if not self.content_index.reserve_path(file_path):
+                continue
+            if not self._is_path_saved(file_path) and self.content_index.resolve(file_path) is None:
+                return file_path
+            self.content_index.release_path(file_path)
+        raise FileAlreadyExistsError(f"{Err.FILE_EXISTS} Every suffix of '{directory_path}/{file_name}' is taken.")
+
+    @staticmethod
+    def _get_candidate_paths(directory_path: str, file_name: str) -> list[str]:
+        stem, extension = posixpath.splitext(file_name)
+        return [f"{directory_path}/{file_name}"] + [
+            f"{directory_path}/{stem}-{number}{extension}" for number in range(1, MAX_NAME_SUFFIX + 1)
+        ]
+
+    def _save_image(self, image_data, file_path: str, content_type: str = None):
+        """ Saves the image and, when renditions are configured, starts creating them
+
+        Returns:
+            The outcome, and the future of the renditions (None without renditions)
+        """
+        if self.rendition_processor is None:
+            return self._save_image_to_file(image_data, file_path, content_type), None
+
+        image_data, renditions = self._start_renditions(image_data, file_path)
+        return self._save_image_to_file(image_data, file_path, content_type), renditions
+
+    def _start_renditions(self, image_stream, file_path: str):
+        """ The renditions need the whole image, so it is read into memory and they are encoded
+            (in another process) while the original uploads
+
+        Returns:
+            The image data and the future of its renditions
+        """
+        image_data = image_stream.read()
+        return image_data, self.rendition_processor.submit(image_data, file_path)
+
+    def _get_renditions(self, renditions, outcome: str, metrics: EventMetrics) -> dict:
+        """ The renditions to save, none when the original wasn't saved or they couldn't be created """
+        if outcome != EventOutcomes.SAVED:
+            renditions.cancel()
+            return {}
+        try:
+            return renditions.result()
+        except Exception as err:  # e.g. a format Pillow can't decode - the original is saved regardless
+            print(f"Could not create the renditions of the image: {err}")
+            metrics.count("rendition_errors")
+            return {}
+
+    def _save_renditions(self, renditions, outcome: str, metrics: EventMetrics) -> None:
+        if renditions is None:
+            return
 
-        if EXCLUDE_THREADED_IMAGES:
-            is_thread = file_data["file"]["shares"]["public"][file_channel_id][0].get("thread_ts", False)
-            if is_thread:
-                return None
+        with metrics.time("renditions"):
+            for file_path, rendition_data in self._get_renditions(renditions, outcome, metrics).items():
+                try:
+                    self.storage_navigator.save_file_to_directory(rendition_data, file_path)
+                    metrics.count("renditions")
+                except Exception as err:
+                    print(f"An error occurred when saving the rendition '{file_path}': {err}")
+                    metrics.count("rendition_errors")
+
+    def _prepare_connection_in_background(self) -> None:
+        """ Opens the storage connection while Slack is called, so the two overlap instead of adding up """
+        if PREPARE_STORAGE_CONNECTION:
+            get_blocking_io_executor().submit(self._prepare_connection)
+
+    def _prepare_connection(self) -> None:
+        try:
+            self.storage_navigator.prepare_connection()
+        except Exception as err:  # the first operation on the storage connects (and fails) as usual
+            print(f"Could not prepare the storage connection: {err}")
 
+    @staticmethod
+    def _record_image_transfer(metrics: EventMetrics, image_stream) -> None:
+        """ The upload reads the image while it downloads, so the time spent waiting on Slack
+            is moved from the upload to the download
+        """
+        metrics.add_duration("download", image_stream.wait_seconds)
+        metrics.add_duration("upload", -image_stream.wait_seconds)
+        metrics.set_bytes("image_bytes", image_stream.bytes_read)
+
+    @staticmethod
+    def _is_excluded_thread(file_data: dict, file_channel_id: str) -> bool:
+        if not EXCLUDE_THREADED_IMAGES:
+            return False
+        return bool(file_data["file"]["shares"]["public"][file_channel_id][0].get("thread_ts", False))
+
+    def _get_destination(self, file_data: dict, file_channel_id: str) -> tuple[str, str]:
+        """ Returns the directory path and the file name the image is saved to """
         file_name = file_data["file"]["name"]
         channel_name = file_data["file"]["shares"]["public"][file_channel_id][0]["channel_name"]
+        return self._get_directory_path(channel_name), file_name
 
-        file_url = file_data["file"].get("thumb_1024")
-        if file_url is None:  # The image's sides are less than 1024px
-            file_url = file_data["file"]["url_private"]
+    def _get_file_url(self, file_data: dict, metrics: EventMetrics = None) -> str:
+        """ The URL of the image version to download (recorded as the `download_source` metrics property) """
+        url_key = self._select_url_key(file_data["file"])
+        if metrics is not None:
+            metrics.set_property("download_source", url_key)
+        return file_data["file"][url_key]
 
-        image = self.slack_api_requester.get_image_data(file_url)
+    def _get_content_type(self, file_data: dict, file_url: str, image_stream) -> str | None:
+        """ The type of the downloaded version, which the file name can't tell: the thumbnail of a HEIC, TIFF or RAW
+            image is a JPEG. Slack's `mimetype` only describes the original, so the response's type comes first.
+        """
+        content_type = (image_stream.content_type or "").split(";")[0].strip()
+        if content_type.startswith("image/"):
+            return content_type
+        if file_url == file_data["file"].get(self.ORIGINAL_URL_KEY):
+            return file_data["file"].get("mimetype")
+        return None
 
-        self._save_image_to_file(image, file_name, channel_name)
+    @classmethod
+    def _select_url_key(
+            cls, file: dict, target_size=SLACK_IMAGE_TARGET_SIZE, max_download_bytes=SLACK_MAX_DOWNLOAD_BYTES
+    ) -> str:
+        """ Picks the smallest thumbnail at least `target_size` pixels wide or high. Slack only makes thumbnails
+            smaller than the image, so without one the original is the smallest that meets the target.
+            An original larger than `max_download_bytes` (files.info's `size`) is replaced by the largest thumbnail.
+
+        Raises:
+            FileTooLargeError: when the original is too large and there is no thumbnail
+        """
+        thumbnails = sorted(
+            (int(match.group(1)), key) for key in file
+            if (match := cls.THUMBNAIL_URL_KEY.fullmatch(key)) and file[key]
+        )
+        if target_size is not None:
+            for size, key in thumbnails:
+                if size >= target_size:
+                    return key
+
+        file_size = file.get("size") or 0
+        if max_download_bytes is None or file_size <= max_download_bytes:
+            return cls.ORIGINAL_URL_KEY
+        if thumbnails:
+            print(f"The original is {file_size} bytes, downloading the largest thumbnail instead.")
+            return thumbnails[-1][1]
+        raise FileTooLargeError(f"{Err.FILE_TOO_LARGE}: {file_size} bytes")
 
     def _get_file_data_from_slack(self, file_id: str, file_channel_id: str) -> dict:
         file_data = self.slack_api_requester.get_file_data(file_id)
@@ -113,13 +386,15 @@ class SlackEventApiHandler:
     def _is_file_from_expected_channel(expected_channel: str, source_channels: list) -> bool:
         return expected_channel in source_channels
 
-    def _save_image_to_file(self, image_data, image_name, channel_name):
-        try:
-            directory_path = f"{GALLERY_PATH}/{channel_name}" if GALLERY_PATH else channel_name
-            if self.storage_navigator.is_file_in_directory(directory_path, image_name):
-                raise FileAlreadyExistsError(Err.FILE_EXISTS)
+    @staticmethod
+    def _get_directory_path(channel_name: str) -> str:
+        return f"{GALLERY_PATH}/{channel_name}" if GALLERY_PATH else channel_name
 
-            self.storage_navigator.save_file_to_directory(image_data, f"{directory_path}/{image_name}")
+    def _save_image_to_file(self, image_data, file_path: str, content_type: str = None) -> str:
+        try:
+            self.storage_navigator.save_file_to_directory(image_data, file_path, content_type=content_type)
+            return EventOutcomes.SAVED
 
         except Exception as err:
             print(f"An error occurred when saving the file: {err}")
+            return EventOutcomes.ERROR
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import Mock, patch
+
+from file_navigator import FileNavigatorBase
+from slack_api.async_slack_event_api_handler import AsyncSlackEventApiHandler
+from slack_api.slack_event_api_handler import SlackEventApiHandler, EventOutcomes
+from utils.content_index import SQLiteContentIndex
+from utils.specified_exceptions import UnexpectedEventTypeError, FileFormatError
+
+channel_id = "6789"
+channel_name = "general"
+image_url = "https://private_url_to_image.com"
+image_name = "image.jpg"
+fake_file_data = {
+    "file": {
+        "name": image_name,
+        "channels": [channel_id],
+        "shares": {"public": {channel_id: [{"channel_name": channel_name, "ts": "1733519316"}]}},
+        "thumb_1024": image_url,
+    }
+}
+fake_event_data = {"event": {"type": "file_shared", "file_id": "12345", "channel_id": channel_id}}
+image_stream = Mock(name="image_stream", content_type=None, wait_seconds=0.0, bytes_read=0)
+
+
+class FakeNavigator(FileNavigatorBase):
+    def __init__(self, existing_paths=()):
+        self.existing_paths = set(existing_paths)
+        self.saved = {}
+
+    def is_file_in_directory(self, directory_path: str, file_name: str) -> bool:
+        return f"{directory_path}/{file_name}" in self.existing_paths
+
+    def save_file_to_directory(self, file_data, file_path: str, content_type: str = None) -> None:
+        self.saved[file_path] = file_data
+        self.existing_paths.add(file_path)
+
+    def cleanup_directory_files(self, directory_path, cutoff_time_in_seconds=None, dry_run=False, max_seconds=None):
+        raise NotImplementedError
+
+
+class TestAsyncSlackEventApiHandler(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.mock_requester = Mock(**{
+            "get_file_data.return_value": fake_file_data,
+            "get_image_stream.return_value": image_stream,
+        })
+        self.navigator = FakeNavigator()
+        self.api_handler = AsyncSlackEventApiHandler.from_handler(
+            SlackEventApiHandler(file_storage_navigator=self.navigator, slack_api_requester=self.mock_requester)
+        )
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    async def test_handle_slack_event__file_shared_event__saves_the_image(self):
+        actual = await self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.SAVED, actual)
+        self.assertEqual({f"{channel_name}/{image_name}": image_stream}, self.navigator.saved)
+        self.mock_requester.get_image_stream.assert_called_once_with(image_url)
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    async def test_handle_slack_event__renditions_configured__saves_them_next_to_the_image(self):
+        renditions = Future()
+        renditions.set_result({f"{channel_name}/image-medium.webp": b"medium"})
+        self.api_handler.handler.rendition_processor = Mock(**{"submit.return_value": renditions})
+        stream = Mock(
+            name="image_stream", content_type=None, wait_seconds=0.0, bytes_read=5, **{"read.return_value": b"image"}
+        )
+        self.mock_requester.get_image_stream.return_value = stream
+
+        actual = await self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.SAVED, actual)
+        self.assertEqual(
+            {f"{channel_name}/{image_name}": b"image", f"{channel_name}/image-medium.webp": b"medium"},
+            self.navigator.saved,
+        )
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    async def test_handle_slack_event__file_already_exists__does_not_download_the_image(self):
+        self.navigator.existing_paths.add(f"{channel_name}/{image_name}")
+
+        actual = await self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.DUPLICATE, actual)
+        self.mock_requester.get_image_stream.assert_not_called()
+
+    async def test_handle_slack_event__many_events__are_handled_concurrently(self):
+        all_saving = threading.Barrier(20, timeout=5)  # broken, failing the saves, unless all 20 events save at once
+        self.api_handler.handler.storage_navigator = Mock(**{
+            "is_file_in_directory.return_value": False,
+            "save_file_to_directory.side_effect": lambda *args, **kwargs: all_saving.wait(),
+        })
+
+        outcomes = await asyncio.gather(*(self.api_handler.handle_slack_event(fake_event_data) for _ in range(20)))
+
+        self.assertEqual([EventOutcomes.SAVED] * 20, outcomes)
+
+    def _use_content_index(self, *contents):
+        index_path = os.path.join(tempfile.mkdtemp(), "content-index.sqlite3")
+        self.api_handler.handler.content_index = SQLiteContentIndex(index_path, gallery="A123")
+        self.mock_requester.get_image_stream.side_effect = [
+            Mock(
+                name="image_stream",
+                content_type=None,
+                wait_seconds=0.0,
+                bytes_read=len(content),
+                **{"read.side_effect": [content, b""]},
+            )
+            for content in contents
+        ]
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    async def test_handle_slack_event__identical_images_concurrently__saves_one_copy(self):
+        self._use_content_index(*[b"same image"] * 5)
+
+        outcomes = await asyncio.gather(*(self.api_handler.handle_slack_event(fake_event_data) for _ in range(5)))
+
+        self.assertEqual([EventOutcomes.SAVED] + [EventOutcomes.DUPLICATE] * 4, sorted(outcomes, reverse=True))
+        self.assertEqual(1, len(self.navigator.saved))  # a concurrent event may have held the name, and suffixed it
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    async def test_handle_slack_event__different_images_with_one_name_concurrently__saves_each_at_its_own_path(self):
+        self._use_content_index(*[f"image {number}".encode() for number in range(5)])
+
+        outcomes = await asyncio.gather(*(self.api_handler.handle_slack_event(fake_event_data) for _ in range(5)))
+
+        self.assertEqual([EventOutcomes.SAVED] * 5, outcomes)
+        self.assertEqual(
+            {f"{channel_name}/{image_name}"} | {f"{channel_name}/image-{number}.jpg" for number in range(1, 5)},
+            set(self.navigator.saved),
+        )
+
+    async def test_handle_slack_event__the_wrong_event_type__raises_expected_exception(self):
+        with self.assertRaises(UnexpectedEventTypeError):
+            await self.api_handler.handle_slack_event({"event": {"type": "wrong_type"}})
+
+    async def test_handle_slack_event__file_is_an_unacceptable_format__raises_expected_exception(self):
+        self.mock_requester.get_file_data.return_value = {"file": {"name": "myfile.mov"}}
+        with self.assertRaises(FileFormatError):
+            await self.api_handler.handle_slack_event(fake_event_data)
+
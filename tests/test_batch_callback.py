@@ -0,0 +1,65 @@
+import json
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from callback_functions import slack_events_batch_endpoint_aws_lambda
+from callback_functions.batch_callback import process_event_batch
+from slack_api.slack_event_api_handler import EventOutcomes
+
+
+def create_record(message_id, file_id):
+    job = {"api_app_id": "A123", "event": {"type": "file_shared", "file_id": file_id, "channel_id": "C123"}}
+    return {"messageId": message_id, "body": json.dumps(job)}
+
+
+def fake_process_slack_event(job):
+    return EventOutcomes.ERROR if job["event"]["file_id"] == "broken" else EventOutcomes.SAVED
+
+
+class TestBatchCallback(TestCase):
+
+    def setUp(self) -> None:
+        self.patch_process = patch(
+            "callback_functions.batch_callback.process_slack_event", side_effect=fake_process_slack_event
+        )
+        self.process_slack_event = self.patch_process.start()
+
+    def tearDown(self) -> None:
+        self.patch_process.stop()
+
+    def test_slack_events_batch_endpoint_aws_lambda__all_records_succeed__reports_no_failures(self):
+        event = {"Records": [create_record("1", "F1"), create_record("2", "F2")]}
+
+        actual = slack_events_batch_endpoint_aws_lambda(event, {})
+
+        self.assertEqual({"batchItemFailures": []}, actual)
+        self.assertEqual(2, self.process_slack_event.call_count)
+
+    def test_slack_events_batch_endpoint_aws_lambda__some_records_fail__reports_only_those(self):
+        event = {"Records": [create_record("1", "F1"), create_record("2", "broken"), create_record("3", "F3")]}
+
+        actual = slack_events_batch_endpoint_aws_lambda(event, {})
+
+        self.assertEqual({"batchItemFailures": [{"itemIdentifier": "2"}]}, actual)
+
+    def test_slack_events_batch_endpoint_aws_lambda__unreadable_record__reports_it_as_failed(self):
+        event = {"Records": [{"messageId": "1", "body": "not json"}, create_record("2", "F2")]}
+
+        actual = slack_events_batch_endpoint_aws_lambda(event, {})
+
+        self.assertEqual({"batchItemFailures": [{"itemIdentifier": "1"}]}, actual)
+
+    def test_process_event_batch__processes_jobs_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)  # only passes when all three jobs are in flight together
+
+        def wait_for_other_jobs(job):
+            barrier.wait()
+            return EventOutcomes.SAVED
+
+        self.process_slack_event.side_effect = wait_for_other_jobs
+        jobs = {str(number): {"event": {}} for number in range(3)}
+
+        actual = process_event_batch(jobs, max_workers=3)
+
+        self.assertEqual({"0": "saved", "1": "saved", "2": "saved"}, actual)
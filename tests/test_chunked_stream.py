@@ -0,0 +1,34 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from utils.chunked_stream import ChunkedStream
+
+
+class TestChunkedStream(TestCase):
+
+    def test_read__chunks_of_any_size__returns_all_data_in_order(self):
+        stream = ChunkedStream([b"ab", b"", b"cdef", b"g"])
+        self.assertEqual([b"abc", b"def", b"g", b""], [stream.read(3) for _ in range(4)])
+
+    def test_read__no_size_given__returns_everything(self):
+        stream = ChunkedStream([b"ab", b"cd"])
+        self.assertEqual(b"abcd", stream.read())
+        self.assertEqual(4, stream.bytes_read)
+
+    def test_iter_chunks__yields_chunks_of_at_most_the_given_size(self):
+        stream = ChunkedStream([b"abcde"])
+        self.assertEqual([b"ab", b"cd", b"e"], list(stream.iter_chunks(2)))
+
+    def test_read__measures_the_time_spent_waiting_for_chunks(self):
+        clock = Mock(side_effect=[0.0, 0.5, 1.0, 1.25])
+        stream = ChunkedStream([b"ab", b"cd"], clock=clock)
+        stream.read(2)
+        stream.read(2)
+        self.assertEqual(0.75, stream.wait_seconds)
+
+    def test_close__calls_on_close_once(self):
+        on_close = Mock()
+        stream = ChunkedStream([b"ab"], on_close=on_close)
+        stream.close()
+        stream.close()
+        on_close.assert_called_once()
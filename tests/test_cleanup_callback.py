@@ -0,0 +1,58 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from callback_functions.cleanup_callback import slack_events_cleanup_callback
+from file_navigator.cleanup_report import CleanupReport
+
+app_credentials = [
+    {"slack_app_id": "A1", "slack_bot_token": "token_one"},
+    {"slack_app_id": "A2", "slack_bot_token": "token_two"},
+]
+
+
+class TestCleanupCallback(TestCase):
+
+    def setUp(self) -> None:
+        patch("callback_functions.cleanup_callback.credential_store", **{"get_all.return_value": app_credentials}).start()
+        patch("callback_functions.cleanup_callback.GALLERY_PATH", "gallery").start()
+        self.handler_factory = patch("callback_functions.cleanup_callback.handler_factory").start()
+        self.navigator = self.handler_factory.create_storage_navigator.return_value
+        self.navigator.cleanup_directory_files.return_value = CleanupReport("gallery", 0).finish()
+
+    def tearDown(self) -> None:
+        patch.stopall()
+
+    def test_slack_events_cleanup_callback__cleans_up_the_gallery_of_every_app(self):
+        response = slack_events_cleanup_callback(dry_run=True)
+
+        self.assertEqual({"A1", "A2"}, set(response["body"]["reports"]))
+        self.assertTrue(self.navigator.cleanup_directory_files.call_args.kwargs["dry_run"])
+
+    def test_slack_events_cleanup_callback__builds_and_closes_only_the_storage_navigator(self):
+        slack_events_cleanup_callback()
+
+        self.handler_factory.create_storage_navigator.assert_called_with(**app_credentials[1])
+        self.handler_factory.create.assert_not_called()
+        self.assertEqual(2, self.navigator.close_connection.call_count)
+
+    def test_slack_events_cleanup_callback__no_gallery_path_and_bucket_root_enabled__cleans_up_the_root(self):
+        with patch("callback_functions.cleanup_callback.GALLERY_PATH", None), \
+                patch("callback_functions.cleanup_callback.CLEANUP_BUCKET_ROOT", True):
+            response = slack_events_cleanup_callback()
+
+        self.assertEqual(200, response["statusCode"])
+        self.assertEqual("", self.navigator.cleanup_directory_files.call_args.args[0])
+
+    def test_slack_events_cleanup_callback__no_gallery_path__cleans_up_nothing(self):
+        with patch("callback_functions.cleanup_callback.GALLERY_PATH", None):
+            response = slack_events_cleanup_callback()
+
+        self.assertEqual(400, response["statusCode"])
+        self.navigator.cleanup_directory_files.assert_not_called()
+
+    def test_slack_events_cleanup_callback__one_gallery_fails__still_cleans_up_the_others(self):
+        self.navigator.cleanup_directory_files.side_effect = [OSError("unreachable"), Mock(**{"to_dict.return_value": {}})]
+        response = slack_events_cleanup_callback()
+
+        self.assertEqual({"error": "unreachable"}, response["body"]["reports"]["A1"])
+        self.assertEqual({}, response["body"]["reports"]["A2"])
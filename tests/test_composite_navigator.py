@@ -0,0 +1,120 @@
+import io
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from file_navigator import FileNavigatorBase
+from file_navigator.cleanup_report import CleanupReport
+from file_navigator.composite_navigator import CompositeNavigator
+from slack_api.event_handler_factory import EventHandlerFactory
+from utils.specified_exceptions import DestinationWriteError
+
+
+class FakeNavigator(FileNavigatorBase):
+
+    def __init__(self, existing=(), error=None):
+        self.existing = set(existing)
+        self.saved = {}
+        self.error = error
+
+    def is_file_in_directory(self, directory_path: str, file_name: str) -> bool:
+        return f"{directory_path}/{file_name}" in self.existing
+
+    def save_file_to_directory(self, file_data, file_path: str, content_type: str = None) -> None:
+        if self.error is not None:
+            raise self.error
+        self.saved[file_path] = file_data if isinstance(file_data, bytes) else file_data.read()
+
+    def cleanup_directory_files(self, directory_path, cutoff_time_in_seconds=None, dry_run=False, max_seconds=None):
+        report = CleanupReport(directory_path, 100, dry_run=dry_run)
+        report.add_removed("old.jpg", 10)
+        return report.finish()
+
+
+class TestCompositeNavigator(TestCase):
+
+    def setUp(self) -> None:
+        self.s3 = FakeNavigator()
+        self.sftp = FakeNavigator()
+
+    def _navigator(self, policy="all"):
+        return CompositeNavigator({"s3": self.s3, "sftp": self.sftp}, policy=policy)
+
+    def test_save_file_to_directory__stream__every_destination_gets_the_whole_file(self):
+        stream = io.BytesIO(b"image" * 100000)
+
+        durations = self._navigator().save_file_to_directory(stream, "gallery/a.jpg")
+
+        self.assertEqual(b"image" * 100000, self.s3.saved["gallery/a.jpg"])
+        self.assertEqual(b"image" * 100000, self.sftp.saved["gallery/a.jpg"])
+        self.assertEqual({"s3", "sftp"}, set(durations))
+
+    def test_save_file_to_directory__bytes__are_saved_to_every_destination(self):
+        self._navigator().save_file_to_directory(b"image", "gallery/a.jpg")
+
+        self.assertEqual({"gallery/a.jpg": b"image"}, self.s3.saved)
+        self.assertEqual({"gallery/a.jpg": b"image"}, self.sftp.saved)
+
+    def test_save_file_to_directory__all_policy_and_one_destination_fails__raises_error(self):
+        self.sftp.error = OSError("disk full")
+
+        with self.assertRaises(DestinationWriteError) as context:
+            self._navigator().save_file_to_directory(io.BytesIO(b"image"), "gallery/a.jpg")
+
+        self.assertEqual(["sftp"], list(context.exception.failures))
+        self.assertEqual(b"image", self.s3.saved["gallery/a.jpg"])
+
+    def test_save_file_to_directory__best_effort_policy_and_one_destination_fails__saves_the_others(self):
+        self.sftp.error = OSError("disk full")
+
+        durations = self._navigator(policy="best_effort").save_file_to_directory(b"image", "gallery/a.jpg")
+
+        self.assertEqual(["s3"], list(durations))
+
+    def test_save_file_to_directory__best_effort_policy_and_every_destination_fails__raises_error(self):
+        self.s3.error = self.sftp.error = OSError("unreachable")
+
+        with self.assertRaises(DestinationWriteError):
+            self._navigator(policy="best_effort").save_file_to_directory(b"image", "gallery/a.jpg")
+
+    def test_is_file_in_directory__only_some_destinations_have_it__returns_false(self):
+        self.s3.existing.add("gallery/a.jpg")
+
+        self.assertFalse(self._navigator().is_file_in_directory("gallery", "a.jpg"))
+
+    def test_is_file_in_directory__every_destination_has_it__returns_true(self):
+        self.s3.existing.add("gallery/a.jpg")
+        self.sftp.existing.add("gallery/a.jpg")
+
+        self.assertTrue(self._navigator().is_file_in_directory("gallery", "a.jpg"))
+
+    def test_save_file_to_directory__after_an_existence_check__only_saves_to_the_missing_destinations(self):
+        self.s3.existing.add("gallery/a.jpg")
+        navigator = self._navigator()
+
+        navigator.is_file_in_directory("gallery", "a.jpg")
+        navigator.save_file_to_directory(io.BytesIO(b"image"), "gallery/a.jpg")
+
+        self.assertEqual({}, self.s3.saved)
+        self.assertEqual({"gallery/a.jpg": b"image"}, self.sftp.saved)
+
+    def test_cleanup_directory_files__adds_up_the_reports_of_every_destination(self):
+        report = self._navigator().cleanup_directory_files("gallery", dry_run=True)
+
+        self.assertEqual(2, report.files_removed)
+        self.assertEqual(20, report.bytes_reclaimed)
+
+    def test_init__unknown_policy__raises_error(self):
+        with self.assertRaises(ValueError):
+            self._navigator(policy="most")
+
+
+class TestEventHandlerFactory(TestCase):
+
+    def test_create_storage_navigator__list_of_connections__creates_a_composite_navigator(self):
+        navigator_class = Mock()
+        with patch.object(EventHandlerFactory, "get_storage_navigator_class", return_value=navigator_class):
+            navigator = EventHandlerFactory().create_storage_navigator(["s3", "sftp"], bucket_name="my_bucket")
+
+        self.assertIsInstance(navigator, CompositeNavigator)
+        self.assertEqual(["s3", "sftp"], list(navigator.navigators))
+        navigator_class.assert_called_with(bucket_name="my_bucket")
@@ -0,0 +1,206 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+from unittest.mock import Mock
+
+from botocore.exceptions import ClientError
+
+from utils.content_index import (
+    IndexedContent, SQLiteContentIndex, S3ContentIndex, spool_and_hash, create_content_index
+)
+
+
+class TestSQLiteContentIndex(TestCase):
+
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "content-index.sqlite3")
+        self.index = SQLiteContentIndex(self.path, gallery="A123")
+
+    def test_claim__new_content__indexes_it_as_pending(self):
+        self.assertTrue(self.index.claim("abc", "general/photo.jpg"))
+        self.assertEqual(IndexedContent("general/photo.jpg", is_pending=True), self.index.get("abc"))
+
+    def test_claim__content_already_claimed__keeps_the_first_path(self):
+        self.index.claim("abc", "general/photo.jpg")
+
+        self.assertFalse(self.index.claim("abc", "random/photo.jpg"))
+        self.assertEqual("general/photo.jpg", self.index.get("abc").file_path)
+
+    def test_claim__pending_claim_abandoned__takes_it_over(self):
+        self.index.lease_seconds = -1
+        self.index.claim("abc", "general/photo.jpg")
+
+        self.assertIsNone(self.index.get("abc"))
+        self.assertTrue(self.index.claim("abc", "random/photo.jpg"))
+
+    def test_claim__another_gallery__is_indexed_separately(self):
+        self.index.claim("abc", "general/photo.jpg")
+
+        self.assertTrue(SQLiteContentIndex(self.path, gallery="B456").claim("abc", "general/photo.jpg"))
+
+    def test_commit__marks_the_content_as_saved(self):
+        self.index.claim("abc", "general/photo.jpg")
+        self.index.commit("abc", "general/photo.jpg")
+
+        self.assertEqual(IndexedContent("general/photo.jpg", is_pending=False), self.index.get("abc"))
+
+    def test_claim__replaced_path__reclaims_the_saved_content_only_once(self):
+        self.index.claim("abc", "general/photo.jpg")
+        self.index.commit("abc", "general/photo.jpg")
+
+        self.assertTrue(self.index.claim("abc", "general/photo-1.jpg", replaced_path="general/photo.jpg"))
+        self.assertFalse(self.index.claim("abc", "general/photo-2.jpg", replaced_path="general/photo.jpg"))
+        self.assertEqual(IndexedContent("general/photo-1.jpg", is_pending=True), self.index.get("abc"))
+
+    def test_release__forgets_the_pending_claim(self):
+        self.index.claim("abc", "general/photo.jpg")
+        self.index.release("abc", "general/photo.jpg")
+
+        self.assertIsNone(self.index.get("abc"))
+
+    def test_release__another_events_claim__is_kept(self):
+        self.index.claim("abc", "general/photo.jpg")
+        self.index.release("abc", "random/photo.jpg")
+
+        self.assertIsNotNone(self.index.get("abc"))
+
+    def test_reserve_path__reserved_until_released(self):
+        self.assertTrue(self.index.reserve_path("general/photo.jpg"))
+        self.assertFalse(self.index.reserve_path("general/photo.jpg"))
+
+        self.index.release_path("general/photo.jpg")
+
+        self.assertTrue(self.index.reserve_path("general/photo.jpg"))
+
+    def test_add_reference__path_not_referenced__resolves_to_the_stored_path(self):
+        self.assertTrue(self.index.add_reference("random/photo.jpg", "general/photo.jpg"))
+
+        self.assertEqual("general/photo.jpg", self.index.resolve("random/photo.jpg"))
+        self.assertIsNone(self.index.resolve("general/photo.jpg"))
+
+    def test_add_reference__path_already_referenced__keeps_the_first_reference(self):
+        self.index.add_reference("random/photo.jpg", "general/photo.jpg")
+
+        self.assertFalse(self.index.add_reference("random/photo.jpg", "general/other.jpg"))
+        self.assertEqual("general/photo.jpg", self.index.resolve("random/photo.jpg"))
+
+
+class TestS3ContentIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.s3_client = Mock()
+        self.index = S3ContentIndex("my_bucket", "gallery/.content-index/", s3_client=self.s3_client)
+
+    def _set_object(self, content=None, body=None, minutes_old=0):
+        self.s3_client.get_object.return_value = {
+            "Body": io.BytesIO(body if body is not None else json.dumps(content).encode()),
+            "ETag": '"etag"',
+            "LastModified": datetime.now(timezone.utc) - timedelta(minutes=minutes_old),
+        }
+
+    def test_claim__new_content__writes_a_pending_claim_only_if_the_key_is_absent(self):
+        self.assertTrue(self.index.claim("abc", "general/photo.jpg"))
+
+        self.s3_client.put_object.assert_called_once_with(
+            Bucket="my_bucket",
+            Key="gallery/.content-index/abc",
+            Body=b'{"file_path": "general/photo.jpg", "is_pending": true}',
+            IfNoneMatch="*",
+        )
+
+    def test_claim__key_claimed_recently__returns_false(self):
+        self.s3_client.put_object.side_effect = ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": True})
+
+        self.assertFalse(self.index.claim("abc", "random/photo.jpg"))
+        self.s3_client.put_object.assert_called_once()
+
+    def test_claim__pending_claim_abandoned__takes_it_over_if_unchanged(self):
+        precondition_failed = ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.s3_client.put_object.side_effect = [precondition_failed, {}]
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": True}, minutes_old=60)
+
+        self.assertTrue(self.index.claim("abc", "random/photo.jpg"))
+        self.assertEqual('"etag"', self.s3_client.put_object.call_args.kwargs["IfMatch"])
+
+    def test_claim__replaced_path__overwrites_the_saved_entry_if_unchanged(self):
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": False})
+
+        self.assertTrue(self.index.claim("abc", "general/photo-1.jpg", replaced_path="general/photo.jpg"))
+        self.s3_client.put_object.assert_called_once()
+        self.assertEqual('"etag"', self.s3_client.put_object.call_args.kwargs["IfMatch"])
+
+    def test_commit__marks_the_claim_as_saved(self):
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": True})
+
+        self.index.commit("abc", "general/photo.jpg")
+
+        saved_body = self.s3_client.put_object.call_args.kwargs["Body"]
+        self.assertEqual(b'{"file_path": "general/photo.jpg", "is_pending": false}', saved_body)
+
+    def test_release__another_events_claim__is_kept(self):
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": True})
+
+        self.index.release("abc", "random/photo.jpg")
+
+        self.s3_client.delete_object.assert_not_called()
+
+    def test_reserve_path__path_reserved_recently__returns_false(self):
+        self.s3_client.put_object.side_effect = ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self._set_object(body=b"")
+
+        self.assertFalse(self.index.reserve_path("general/photo.jpg"))
+        reserved_key = self.s3_client.put_object.call_args.kwargs["Key"]
+        self.assertEqual("gallery/.content-index/paths/general/photo.jpg", reserved_key)
+
+    def test_add_reference__writes_the_stored_path_only_if_the_key_is_absent(self):
+        self.assertTrue(self.index.add_reference("random/photo.jpg", "general/photo.jpg"))
+
+        self.s3_client.put_object.assert_called_once_with(
+            Bucket="my_bucket",
+            Key="gallery/.content-index/references/random/photo.jpg",
+            Body=b'{"file_path": "general/photo.jpg", "is_pending": false}',
+            IfNoneMatch="*",
+        )
+
+    def test_resolve__referenced_path__returns_the_stored_path(self):
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": False})
+        self.assertEqual("general/photo.jpg", self.index.resolve("random/photo.jpg"))
+
+    def test_get__indexed_content__returns_its_path(self):
+        self._set_object({"file_path": "general/photo.jpg", "is_pending": False})
+        self.assertEqual(IndexedContent("general/photo.jpg", is_pending=False), self.index.get("abc"))
+
+    def test_get__content_not_indexed__returns_none(self):
+        self.s3_client.get_object.side_effect = ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        self.assertIsNone(self.index.get("abc"))
+
+    def test_get__unexpected_error__raises_error(self):
+        self.s3_client.get_object.side_effect = ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+        with self.assertRaises(ClientError):
+            self.index.get("abc")
+
+
+class TestSpoolAndHash(TestCase):
+
+    def test_spool_and_hash__returns_the_rewound_content_and_its_sha256(self):
+        data = os.urandom(1000)
+
+        spool, content_hash = spool_and_hash(io.BytesIO(data), chunk_size=64, max_memory=100)
+
+        with spool:
+            self.assertEqual(data, spool.read())
+        self.assertEqual(hashlib.sha256(data).hexdigest(), content_hash)
+
+    def test_create_content_index__none__turns_the_index_off(self):
+        self.assertIsNone(create_content_index(None, slack_app_id="A123"))
+
+    def test_create_content_index__s3__is_stored_next_to_the_gallery(self):
+        index = create_content_index("s3", gallery_path="wp-content/gallery", slack_app_id="A123", bucket_name="b")
+
+        self.assertEqual("wp-content/gallery/.content-index/", index.prefix)
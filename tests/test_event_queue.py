@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from event_queue import InMemoryEventQueue, FileEventQueue
+
+first_job = {"api_app_id": "A123", "event": {"type": "file_shared", "file_id": "F1", "channel_id": "C1"}}
+second_job = {"api_app_id": "A123", "event": {"type": "file_shared", "file_id": "F2", "channel_id": "C1"}}
+
+
+class EventQueueTests:
+    """ Behaviour every event queue shares """
+
+    def create_queue(self):
+        raise NotImplementedError
+
+    def setUp(self) -> None:
+        self.queue = self.create_queue()
+
+    def test_receive__jobs_put__returns_jobs_in_order(self):
+        self.queue.put(first_job)
+        self.queue.put(second_job)
+
+        jobs = [job for _, job in self.queue.receive(10)]
+        self.assertEqual([first_job, second_job], jobs)
+
+    def test_receive__more_jobs_than_requested__returns_at_most_max_jobs(self):
+        self.queue.put(first_job)
+        self.queue.put(second_job)
+        self.assertEqual(1, len(self.queue.receive(1)))
+
+    def test_receive__job_already_received__is_not_returned_again(self):
+        self.queue.put(first_job)
+        self.queue.receive(10)
+        self.assertEqual([], self.queue.receive(10))
+
+    def test_reject__job_returned_to_the_queue__is_received_again(self):
+        self.queue.put(first_job)
+        [(receipt, _)] = self.queue.receive(10)
+        self.queue.reject(receipt)
+
+        self.assertEqual([first_job], [job for _, job in self.queue.receive(10)])
+
+    def test_reject__with_a_delay__is_not_received_before_it(self):
+        self.queue.put(first_job)
+        [(receipt, _)] = self.queue.receive(10)
+        self.queue.reject(receipt, delay_seconds=60)
+
+        self.assertEqual([], self.queue.receive(10))
+
+    def test_get_attempts__counts_every_delivery(self):
+        self.queue.put(first_job)
+        [(receipt, _)] = self.queue.receive(10)
+        self.assertEqual(1, self.queue.get_attempts(receipt))
+        self.queue.reject(receipt)
+
+        [(receipt, _)] = self.queue.receive(10)
+        self.assertEqual(2, self.queue.get_attempts(receipt))
+
+    def test_acknowledge__job_is_not_received_again(self):
+        self.queue.put(first_job)
+        [(receipt, _)] = self.queue.receive(10)
+        self.queue.acknowledge(receipt)
+        self.assertEqual([], self.queue.receive(10))
+
+
+class TestInMemoryEventQueue(EventQueueTests, TestCase):
+
+    def create_queue(self):
+        return InMemoryEventQueue()
+
+
+class TestFileEventQueue(EventQueueTests, TestCase):
+
+    def create_queue(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        return FileEventQueue(self.temp_dir.name)
+
+    def test_receive__queue_shared_between_instances__job_is_only_handed_out_once(self):
+        other_queue = FileEventQueue(self.temp_dir.name)
+        self.queue.put(first_job)
+
+        self.assertEqual(1, len(self.queue.receive(10)))
+        self.assertEqual([], other_queue.receive(10))
+
+    def test_dead_letter__job_is_moved_aside(self):
+        self.queue.put(first_job)
+        [(receipt, job)] = self.queue.receive(10)
+        self.queue.dead_letter(receipt, job)
+
+        self.assertEqual([], self.queue.receive(10))
+        self.assertEqual(1, len(os.listdir(os.path.join(self.temp_dir.name, FileEventQueue.DEAD_LETTER_DIRECTORY))))
+
+    def test_receive__claim_older_than_the_visibility_timeout__job_is_received_again(self):
+        self.queue.put(first_job)
+        [(receipt, _)] = self.queue.receive(10)
+        claimed_at = time.time() - self.queue.visibility_timeout_seconds - 1
+        os.utime(os.path.join(self.temp_dir.name, f"{receipt}{FileEventQueue.CLAIMED_EXTENSION}"), (claimed_at,) * 2)
+
+        [(new_receipt, job)] = self.queue.receive(10)
+
+        self.assertEqual(first_job, job)
+        self.assertEqual(2, self.queue.get_attempts(new_receipt))
+
+    def test_receive__job_put_long_ago__claim_is_not_expired_right_away(self):
+        self.queue.put(first_job)
+        [job_name] = os.listdir(self.temp_dir.name)
+        put_at = time.time() - self.queue.visibility_timeout_seconds - 1
+        os.utime(os.path.join(self.temp_dir.name, job_name), (put_at,) * 2)
+
+        self.assertEqual(1, len(self.queue.receive(10)))
+        self.assertEqual([], self.queue.receive(10))
@@ -0,0 +1,71 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from slack_api.handler_registry import EventHandlerRegistry
+
+credentials = {
+    "slack_app_id": "A123",
+    "slack_bot_token": "some_token",
+    "bucket_name": "my_bucket",
+}
+other_credentials = {
+    "slack_app_id": "B456",
+    "slack_bot_token": "another_token",
+    "bucket_name": "my_bucket",
+}
+
+
+class TestEventHandlerRegistry(TestCase):
+
+    def setUp(self) -> None:
+        self.mock_factory = Mock(**{
+            "create.side_effect": lambda **kwargs: Mock(**{
+                "storage_navigator.is_connection_alive.return_value": True,
+            }),
+        })
+        self.registry = EventHandlerRegistry(handler_factory=self.mock_factory)
+
+    def test_get_handler__same_app_requested_twice__reuses_the_handler(self):
+        first = self.registry.get_handler(**credentials)
+        second = self.registry.get_handler(**credentials)
+
+        self.assertIs(first, second)
+        self.mock_factory.create.assert_called_once_with(**credentials)
+
+    def test_get_handler__different_apps__creates_a_handler_per_app(self):
+        first = self.registry.get_handler(**credentials)
+        second = self.registry.get_handler(**other_credentials)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(2, self.mock_factory.create.call_count)
+
+    def test_get_handler__connection_is_stale__rebuilds_the_handler(self):
+        first = self.registry.get_handler(**credentials)
+        first.storage_navigator.is_connection_alive.return_value = False
+
+        second = self.registry.get_handler(**credentials)
+
+        self.assertIsNot(first, second)
+        first.storage_navigator.close_connection.assert_called_once()
+
+    def test_get_handler__credentials_changed__rebuilds_the_handler(self):
+        first = self.registry.get_handler(**credentials)
+        second = self.registry.get_handler(**{**credentials, "slack_bot_token": "rotated_token"})
+
+        self.assertIsNot(first, second)
+
+    def test_clear__closes_cached_connections(self):
+        handler = self.registry.get_handler(**credentials)
+        self.registry.clear()
+
+        handler.storage_navigator.close_connection.assert_called_once()
+        self.assertIsNot(handler, self.registry.get_handler(**credentials))
+
+    def test_clear__shared_rendition_processor__is_closed_once(self):
+        rendition_processor = Mock()
+        for app_credentials in (credentials, other_credentials):
+            self.registry.get_handler(**app_credentials).rendition_processor = rendition_processor
+
+        self.registry.clear()
+
+        rendition_processor.close.assert_called_once()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from utils.idempotency_store import InMemoryIdempotencyStore, SQLiteIdempotencyStore, LayeredIdempotencyStore
+
+
+class TestInMemoryIdempotencyStore(TestCase):
+
+    def setUp(self) -> None:
+        self.store = InMemoryIdempotencyStore(ttl_seconds=60)
+
+    def test_claim__new_key__returns_true(self):
+        self.assertTrue(self.store.claim("event:1"))
+
+    def test_claim__key_already_claimed__returns_false(self):
+        self.store.claim("event:1")
+        self.assertFalse(self.store.claim("event:1"))
+
+    def test_claim__key_released__returns_true(self):
+        self.store.claim("event:1")
+        self.store.release("event:1")
+        self.assertTrue(self.store.claim("event:1"))
+
+    def test_claim_all__one_key_already_claimed__releases_the_other_keys(self):
+        self.store.claim("file:1")
+        self.assertFalse(self.store.claim_all(["event:1", "file:1"]))
+        self.assertTrue(self.store.claim("event:1"))
+
+
+class TestSQLiteIdempotencyStore(TestCase):
+
+    def setUp(self) -> None:
+        self.now = 0
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "idempotency.sqlite3")
+        self.store = SQLiteIdempotencyStore(self.path, ttl_seconds=60, clock=lambda: self.now)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_claim__key_claimed_by_another_instance__returns_false(self):
+        other_store = SQLiteIdempotencyStore(self.path, ttl_seconds=60, clock=lambda: self.now)
+        self.store.claim("event:1")
+        self.assertFalse(other_store.claim("event:1"))
+
+    def test_claim__claim_expired__returns_true(self):
+        self.store.claim("event:1")
+        self.now = 60
+        self.assertTrue(self.store.claim("event:1"))
+
+    def test_claim__key_released__returns_true(self):
+        self.store.claim("event:1")
+        self.store.release("event:1")
+        self.assertTrue(self.store.claim("event:1"))
+
+
+class TestLayeredIdempotencyStore(TestCase):
+
+    def test_claim__key_claimed_in_the_shared_store__returns_false(self):
+        shared_store = InMemoryIdempotencyStore(ttl_seconds=60)
+        shared_store.claim("event:1")
+        store = LayeredIdempotencyStore(InMemoryIdempotencyStore(ttl_seconds=60), shared_store)
+
+        self.assertFalse(store.claim("event:1"))
@@ -0,0 +1,73 @@
+import io
+from unittest import TestCase, skipUnless
+
+try:
+    from PIL import Image
+    from utils.image_renditions import RenditionProcessor, create_renditions, get_rendition_path
+except ImportError:  # Pillow is only required when renditions are configured
+    Image = None
+
+medium_webp = {"name": "medium", "max_size": 64, "format": "webp", "quality": 80}
+small_jpeg = {"name": "small", "max_size": 16, "format": "jpeg"}
+
+
+def create_image(size=(200, 100), mode="RGBA", orientation=None) -> bytes:
+    image = Image.new(mode, size, color=(255, 0, 0, 128) if mode == "RGBA" else (255, 0, 0))
+    exif = Image.Exif()
+    exif[0x0110] = "Some Camera"  # model
+    if orientation is not None:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="png" if mode == "RGBA" else "jpeg", exif=exif)
+    return buffer.getvalue()
+
+
+@skipUnless(Image, "requires the Pillow dependency")
+class TestImageRenditions(TestCase):
+
+    def test_get_rendition_path__returns_the_path_next_to_the_original(self):
+        self.assertEqual("gallery/general/photo-medium.webp", get_rendition_path("gallery/general/photo.jpg", medium_webp))
+        self.assertEqual("photo.v2-small.jpg", get_rendition_path("photo.v2.png", small_jpeg))
+
+    def test_create_renditions__resizes_to_each_rendition_keeping_the_aspect_ratio(self):
+        rendered = create_renditions(create_image(), "gallery/photo.png", [medium_webp, small_jpeg])
+
+        with Image.open(io.BytesIO(rendered["gallery/photo-medium.webp"])) as medium:
+            self.assertEqual(("WEBP", (64, 32)), (medium.format, medium.size))
+        with Image.open(io.BytesIO(rendered["gallery/photo-small.jpg"])) as small:
+            self.assertEqual(("JPEG", (16, 8), "RGB"), (small.format, small.size, small.mode))
+
+    def test_create_renditions__image_smaller_than_the_rendition__is_not_enlarged(self):
+        rendered = create_renditions(create_image(size=(10, 10)), "photo.png", [medium_webp])
+
+        with Image.open(io.BytesIO(rendered["photo-medium.webp"])) as medium:
+            self.assertEqual((10, 10), medium.size)
+
+    def test_create_renditions__strips_the_exif_data_and_keeps_the_orientation(self):
+        rotated = create_image(size=(200, 100), mode="RGB", orientation=6)  # displayed rotated by 90 degrees
+
+        rendered = create_renditions(rotated, "photo.jpg", [small_jpeg])
+
+        with Image.open(io.BytesIO(rendered["photo-small.jpg"])) as small:
+            self.assertEqual((8, 16), small.size)
+            self.assertEqual(0, len(small.getexif()))
+
+    def test_init__unknown_format__raises_error(self):
+        with self.assertRaises(ValueError):
+            RenditionProcessor(renditions=[{"name": "x", "max_size": 10, "format": "bmp"}])
+
+    def test_submit__with_processes__creates_the_renditions_in_processes_not_forked_from_this_one(self):
+        processor = RenditionProcessor(renditions=[medium_webp], processes=1)
+        self.addCleanup(processor.close)
+
+        rendered = processor.submit(create_image(), "photo.png").result(timeout=30)
+
+        self.assertEqual(["photo-medium.webp"], list(rendered))
+        self.assertNotEqual("fork", processor.executor._mp_context.get_start_method())
+
+    def test_submit__without_processes__creates_the_renditions_on_threads(self):
+        processor = RenditionProcessor(renditions=[medium_webp], processes=0)
+
+        rendered = processor.submit(create_image(), "photo.png").result(timeout=10)
+
+        self.assertEqual(["photo-medium.webp"], list(rendered))
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+from unittest import TestCase
+from unittest.mock import patch
+
+import main
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_imported_modules(code: str, env=None) -> set:
+    """ Runs the code in a fresh interpreter, as a cold start would, and returns the modules it imported """
+    script = f"import json, sys\n{code}\nprint(json.dumps(sorted(sys.modules)))"
+    platform_variables = ("AWS_LAMBDA_FUNCTION_NAME", "K_SERVICE", "FUNCTION_TARGET")
+    environment = {key: value for key, value in os.environ.items() if key not in platform_variables}
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=PROJECT_DIRECTORY, env={**environment, **(env or {})},
+        capture_output=True, text=True, check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+class TestMain(TestCase):
+
+    def test_import_main__no_platform_detected__imports_no_backend_or_platform_dependency(self):
+        modules = get_imported_modules("import main")
+        self.assertFalse({"boto3", "paramiko", "functions_framework", "flask", "requests"} & modules)
+
+    def test_import_main__on_aws_lambda__preloads_only_what_aws_needs(self):
+        modules = get_imported_modules("import main", env={"AWS_LAMBDA_FUNCTION_NAME": "slack-events"})
+        self.assertIn("callback_functions.aws_callback", modules)
+        self.assertFalse({"functions_framework", "flask"} & modules)
+
+    def test_event_handler_factory__sftp_configured__does_not_import_boto3(self):
+        code = "from slack_api.event_handler_factory import EventHandlerFactory\n" \
+               "EventHandlerFactory().get_storage_navigator_class('sftp')"
+        modules = get_imported_modules(code)
+        self.assertIn("paramiko", modules)
+        self.assertNotIn("boto3", modules)
+
+    def test_slack_events_callback_factory__sqs_batch__uses_the_batch_entry_point(self):
+        with patch("callback_functions.batch_callback.slack_events_batch_endpoint_aws_lambda") as batch_endpoint:
+            main.slack_events_callback({"Records": []}, {})
+        batch_endpoint.assert_called_once_with({"Records": []}, {})
@@ -0,0 +1,45 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from utils.metrics import EventMetrics, ListMetricsSink
+
+
+class TestEventMetrics(TestCase):
+
+    def setUp(self) -> None:
+        self.sink = ListMetricsSink()
+        self.clock = Mock(side_effect=[1.0, 1.25, 2.0, 2.5])
+        self.metrics = EventMetrics(sink=self.sink, namespace="Test", clock=self.clock, event_id="Ev123")
+
+    def test_time__records_the_duration_in_milliseconds(self):
+        with self.metrics.time("upload"):
+            pass
+        self.assertEqual(250, self.metrics.get("upload_ms"))
+
+    def test_time__same_stage_twice__adds_up_the_durations(self):
+        for _ in range(2):
+            with self.metrics.time("upload"):
+                pass
+        self.assertEqual(750, self.metrics.get("upload_ms"))
+
+    def test_time__block_raises__still_records_the_duration(self):
+        with self.assertRaises(OSError):
+            with self.metrics.time("upload"):
+                raise OSError
+        self.assertEqual(250, self.metrics.get("upload_ms"))
+
+    def test_emit__writes_an_embedded_metric_format_record(self):
+        self.metrics.count("saved")
+        self.metrics.emit()
+
+        [record] = self.sink.records
+        [directive] = record["_aws"]["CloudWatchMetrics"]
+        self.assertEqual("Test", directive["Namespace"])
+        self.assertEqual([["Backend"]], directive["Dimensions"])
+        self.assertEqual([{"Name": "saved", "Unit": "Count"}], directive["Metrics"])
+        self.assertEqual(1, record["saved"])
+        self.assertEqual("Ev123", record["event_id"])
+        self.assertIn("Backend", record)
+
+    def test_emit__no_sink__does_nothing(self):
+        EventMetrics().emit()  # should not raise
@@ -1,14 +1,25 @@
+import io
+from datetime import datetime, timedelta, timezone
 from unittest import TestCase
-from unittest.mock import patch, Mock
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
 
 from file_navigator.s3_file_navigator import S3Navigator
+from utils.ttl_cache import TTLCache
 
 fake_image_name = "some_image.jpg"
+existing_keys = [f"gallery/{fake_image_name}"]
+
+
+def fake_head_object(Bucket, Key):
+    if Key not in existing_keys:
+        raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+    return {"ContentLength": 1}
+
+
 mocked_response = {
-    "resource.return_value.Bucket.return_value.objects.filter.return_value": [
-        Mock(**{"key": "gallery/"}),
-        Mock(**{"key": f"gallery/{fake_image_name}"}),
-    ],
+    "resource.return_value.meta.client.head_object.side_effect": fake_head_object,
 }
 
 
@@ -18,6 +29,7 @@ class TestS3Navigator(TestCase):
         self.patched_boto = patch("file_navigator.s3_file_navigator.s3_navigator.boto3", **mocked_response)
         self.fake_boto3 = self.patched_boto.start()
         self.navigator = S3Navigator(bucket_name="my_bucket")
+        self.head_object = self.fake_boto3.resource.return_value.meta.client.head_object
 
     def tearDown(self) -> None:
         self.patched_boto.stop()
@@ -30,10 +42,172 @@ class TestS3Navigator(TestCase):
         actual = self.navigator.is_file_in_directory("gallery/", "another_image.jpg")
         self.assertFalse(actual)
 
+    def test_is_file_in_directory__name_is_a_suffix_of_an_existing_key__returns_false(self):
+        actual = self.navigator.is_file_in_directory("gallery", "image.jpg")
+        self.assertFalse(actual)
+
+    def test_is_file_in_directory__makes_a_head_request_on_the_exact_key(self):
+        self.navigator.is_file_in_directory("gallery", fake_image_name)
+        self.head_object.assert_called_once_with(Bucket="my_bucket", Key=f"gallery/{fake_image_name}")
+
+    def test_is_file_in_directory__key_already_known__does_not_make_a_request(self):
+        self.navigator.is_file_in_directory("gallery", fake_image_name)
+        self.navigator.is_file_in_directory("gallery", fake_image_name)
+        self.head_object.assert_called_once()
+
+    def test_is_file_in_directory__key_was_saved__does_not_make_a_request(self):
+        self.navigator.save_file_to_directory(b"this is a file", "gallery/new_image.jpg")
+        self.assertTrue(self.navigator.is_file_in_directory("gallery", "new_image.jpg"))
+        self.head_object.assert_not_called()
+
+    def test_is_file_in_directory__known_key_expired__makes_a_new_request(self):
+        now = [0]
+        self.navigator = S3Navigator(bucket_name="my_bucket", known_key_cache=TTLCache(ttl_seconds=10, clock=lambda: now[0]))
+        self.navigator.is_file_in_directory("gallery", fake_image_name)
+        now[0] = 11
+        self.navigator.is_file_in_directory("gallery", fake_image_name)
+        self.assertEqual(2, self.head_object.call_count)
+
+    def test_is_file_in_directory__unexpected_error__raises_error(self):
+        self.head_object.side_effect = ClientError({"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject")
+        with self.assertRaises(ClientError):
+            self.navigator.is_file_in_directory("gallery", fake_image_name)
+
     def test_save_file_to_directory__makes_expected_request_to_save_the_file(self):
         file_bytes = b"this is a file"
         file_path = "the/path/to/the/file.mp4"
         self.navigator.save_file_to_directory(file_bytes, file_path)
-        self.fake_boto3.resource.return_value.Object.assert_called_once_with(self.navigator.bucket_name, file_path)
-        self.fake_boto3.resource.return_value.Object.return_value.put.assert_called_once_with(Body=file_bytes)
+        self.fake_boto3.resource.return_value.meta.client.put_object.assert_called_once_with(
+            Bucket=self.navigator.bucket_name, Key=file_path, Body=file_bytes, ContentType="video/mp4"
+        )
         pass
+
+    def test_save_file_to_directory__stream_given__uploads_the_stream_without_reading_it(self):
+        file_stream = io.BytesIO(b"this is a file")
+        file_path = "the/path/to/the/file.jpg"
+        self.navigator.save_file_to_directory(file_stream, file_path)
+
+        upload_fileobj = self.fake_boto3.resource.return_value.meta.client.upload_fileobj
+        upload_fileobj.assert_called_once()
+        self.assertEqual((file_stream, self.navigator.bucket_name, file_path), upload_fileobj.call_args[0])
+        self.assertEqual(0, file_stream.tell())
+
+    def test_save_file_to_directory__stream_given__uploads_with_the_content_type_and_multipart_config(self):
+        self.navigator.save_file_to_directory(io.BytesIO(b"this is a file"), "gallery/photo.HEIC")
+
+        upload_fileobj = self.fake_boto3.resource.return_value.meta.client.upload_fileobj
+        self.assertEqual({"ContentType": "image/heic"}, upload_fileobj.call_args.kwargs["ExtraArgs"])
+        self.assertIs(self.navigator.transfer_config, upload_fileobj.call_args.kwargs["Config"])
+
+    def test_save_file_to_directory__bytes_above_the_threshold__uses_a_multipart_upload(self):
+        navigator = S3Navigator(bucket_name="my_bucket", multipart_threshold=4, multipart_part_size=5 * 1024 ** 2)
+        navigator.save_file_to_directory(b"large image", "gallery/photo.tiff")
+
+        client = self.fake_boto3.resource.return_value.meta.client
+        client.put_object.assert_not_called()
+        [uploaded_file, _, _] = client.upload_fileobj.call_args.args
+        self.assertEqual(b"large image", uploaded_file.read())
+
+    def test_save_file_to_directory__content_type_given__is_used_instead_of_the_extensions(self):
+        self.navigator.save_file_to_directory(b"jpeg thumbnail", "gallery/photo.heic", content_type="image/jpeg")
+
+        client = self.fake_boto3.resource.return_value.meta.client
+        self.assertEqual("image/jpeg", client.put_object.call_args.kwargs["ContentType"])
+
+    def test_get_content_type__known_and_unknown_extensions__returns_the_expected_type(self):
+        self.assertEqual("image/jpeg", S3Navigator.get_content_type("a/b.JPG"))
+        self.assertEqual("image/avif", S3Navigator.get_content_type("a/b.avif"))
+        self.assertEqual("application/octet-stream", S3Navigator.get_content_type("a/b"))
+
+    def _set_listing(self, pages):
+        client = self.fake_boto3.resource.return_value.meta.client
+        client.get_paginator.return_value.paginate.return_value = pages
+        client.delete_objects.return_value = {}
+        return client
+
+    @staticmethod
+    def _objects(count, days_old, prefix="gallery/"):
+        last_modified = datetime.now(timezone.utc) - timedelta(days=days_old)
+        return [{"Key": f"{prefix}{number}.jpg", "Size": 10, "LastModified": last_modified} for number in range(count)]
+
+    def test_cleanup_directory_files__expired_objects__deletes_them_in_batches(self):
+        client = self._set_listing([{"Contents": self._objects(1000, 400)}, {"Contents": self._objects(500, 400, "x/")}])
+
+        report = self.navigator.cleanup_directory_files("gallery")
+
+        client.get_paginator.return_value.paginate.assert_called_once_with(Bucket="my_bucket", Prefix="gallery/")
+        batch_sizes = sorted(len(call.kwargs["Delete"]["Objects"]) for call in client.delete_objects.call_args_list)
+        self.assertEqual([500, 1000], batch_sizes)
+        self.assertEqual(1500, report.files_removed)
+        self.assertEqual(15000, report.bytes_reclaimed)
+
+    def test_cleanup_directory_files__recent_objects__are_kept(self):
+        client = self._set_listing([{"Contents": self._objects(3, 400) + self._objects(2, 10, "new/")}])
+
+        report = self.navigator.cleanup_directory_files("gallery")
+
+        [deleted] = client.delete_objects.call_args_list
+        self.assertEqual(3, len(deleted.kwargs["Delete"]["Objects"]))
+        self.assertEqual(5, report.files_scanned)
+        self.assertEqual(3, report.files_removed)
+
+    def test_cleanup_directory_files__dry_run__reports_without_deleting(self):
+        client = self._set_listing([{"Contents": self._objects(3, 400)}])
+
+        report = self.navigator.cleanup_directory_files("gallery", dry_run=True)
+
+        client.get_paginator.return_value.paginate.assert_called_once_with(Bucket="my_bucket", Prefix="gallery/")
+        client.delete_objects.assert_not_called()
+        self.assertEqual(3, report.files_removed)
+
+    def test_cleanup_directory_files__hidden_directories__are_kept(self):
+        hidden_objects = self._objects(2, 400, "gallery/.content-index/")
+        client = self._set_listing([{"Contents": self._objects(2, 400) + hidden_objects}])
+
+        report = self.navigator.cleanup_directory_files("gallery")
+
+        [deleted] = client.delete_objects.call_args_list
+        deleted_keys = [deleted_object["Key"] for deleted_object in deleted.kwargs["Delete"]["Objects"]]
+        self.assertEqual(["gallery/0.jpg", "gallery/1.jpg"], deleted_keys)
+        self.assertEqual(2, report.files_scanned)
+
+    def test_cleanup_directory_files__root_directory__is_refused(self):
+        client = self._set_listing([{"Contents": self._objects(2, 400)}])
+
+        self.assertRaises(ValueError, self.navigator.cleanup_directory_files, ".")
+        client.delete_objects.assert_not_called()
+
+    def test_cleanup_directory_files__bucket_root_enabled__lists_the_whole_bucket(self):
+        client = self._set_listing([{"Contents": self._objects(2, 400, "general/") + self._objects(1, 400, ".index/")}])
+
+        with patch("file_navigator.s3_file_navigator.s3_navigator.CLEANUP_BUCKET_ROOT", True):
+            report = self.navigator.cleanup_directory_files("")
+
+        client.get_paginator.return_value.paginate.assert_called_once_with(Bucket="my_bucket", Prefix="")
+        self.assertEqual(2, report.files_removed)
+
+    def test_cleanup_directory_files__keys_fail_to_delete__reports_them_as_failed(self):
+        client = self._set_listing([{"Contents": self._objects(3, 400)}])
+        client.delete_objects.return_value = {"Errors": [{"Key": "gallery/1.jpg", "Message": "Access Denied"}]}
+
+        report = self.navigator.cleanup_directory_files("gallery")
+
+        self.assertEqual(["gallery/1.jpg"], report.failed_files)
+        self.assertEqual(2, report.files_removed)
+
+    def test_cleanup_directory_files__request_fails__reports_the_batch_as_failed(self):
+        client = self._set_listing([{"Contents": self._objects(2, 400)}])
+        client.delete_objects.side_effect = ClientError({"Error": {"Code": "500"}}, "DeleteObjects")
+
+        report = self.navigator.cleanup_directory_files("gallery")
+
+        self.assertEqual(["gallery/0.jpg", "gallery/1.jpg"], report.failed_files)
+        self.assertEqual(0, report.files_removed)
+
+    def test_cleanup_directory_files__time_cap_reached__stops_early(self):
+        client = self._set_listing([{"Contents": self._objects(2, 400)}])
+
+        report = self.navigator.cleanup_directory_files("gallery", max_seconds=-1)
+
+        client.delete_objects.assert_not_called()
+        self.assertFalse(report.is_complete)
@@ -0,0 +1,221 @@
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock, Mock
+
+from file_navigator.sftp_file_navigator import SFTPConnectionPool, SFTPNavigator
+from utils.specified_exceptions import SFTPTimeoutError
+
+server_one = ("host_one", 22, "user", "password")
+server_two = ("host_two", 22, "user", "password")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_connector():
+    return MagicMock(**{"is_session_active.return_value": True, "is_session_responsive.return_value": True})
+
+
+class TestSFTPConnectionPool(TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.connector_factory = Mock(side_effect=create_connector)
+        self.pool = SFTPConnectionPool(
+            max_size=2,
+            idle_timeout_seconds=300,
+            checkout_timeout_seconds=0.05,
+            health_check_idle_seconds=60,
+            connector_factory=self.connector_factory,
+            clock=self.clock,
+        )
+
+    def test_checkout__released_session__is_reused_without_reconnecting(self):
+        connector = self.pool.checkout(*server_one)
+        self.pool.release(connector)
+
+        self.assertIs(connector, self.pool.checkout(*server_one))
+        connector.set_sftp_session.assert_called_once_with(host="host_one", username="user", password="password", port=22)
+
+    def test_checkout__another_server__does_not_get_the_idle_session(self):
+        self.pool.release(self.pool.checkout(*server_one))
+        self.pool.checkout(*server_two)
+
+        self.assertEqual(2, self.connector_factory.call_count)
+
+    def test_checkout__idle_session_dropped__reconnects_transparently(self):
+        connector = self.pool.checkout(*server_one)
+        self.pool.release(connector)
+        connector.is_session_active.return_value = False
+
+        new_connector = self.pool.checkout(*server_one)
+
+        self.assertIsNot(connector, new_connector)
+        connector.close_sftp_session.assert_called_once()
+        self.assertEqual(1, self.pool.open_sessions)
+
+    def test_checkout__session_idle_for_a_while__is_probed_before_reuse(self):
+        connector = self.pool.checkout(*server_one)
+        self.pool.release(connector)
+        self.clock.now += 61
+        connector.is_session_responsive.return_value = False
+
+        self.assertIsNot(connector, self.pool.checkout(*server_one))
+
+    def test_checkout__session_idle_past_timeout__is_closed(self):
+        connector = self.pool.checkout(*server_one)
+        self.pool.release(connector)
+        self.clock.now += 301
+
+        self.pool.checkout(*server_two)
+
+        connector.close_sftp_session.assert_called_once()
+        self.assertEqual(1, self.pool.open_sessions)
+
+    def test_checkout__pool_full__closes_the_least_recently_used_idle_session(self):
+        first = self.pool.checkout(*server_one)
+        second = self.pool.checkout(*server_one)
+        self.pool.release(first)
+        self.pool.release(second)
+
+        self.pool.checkout(*server_two)
+
+        first.close_sftp_session.assert_called_once()
+        second.close_sftp_session.assert_not_called()
+        self.assertEqual(2, self.pool.open_sessions)
+
+    def test_checkout__every_session_in_use__raises_once_the_wait_times_out(self):
+        self.pool.checkout(*server_one)
+        self.pool.checkout(*server_one)
+
+        with self.assertRaises(SFTPTimeoutError):
+            self.pool.checkout(*server_two)
+
+    def test_checkout__every_session_in_use__waits_for_one_to_be_released(self):
+        self.pool.checkout_timeout_seconds = 5
+        first = self.pool.checkout(*server_one)
+        self.pool.checkout(*server_one)
+
+        threading.Timer(0.05, self.pool.release, args=(first,)).start()
+
+        self.assertIs(first, self.pool.checkout(*server_one))
+
+    def test_checkout__connecting_fails__frees_the_slot(self):
+        self.connector_factory.side_effect = lambda: Mock(**{"set_sftp_session.side_effect": OSError("refused")})
+
+        with self.assertRaises(OSError):
+            self.pool.checkout(*server_one)
+        self.assertEqual(0, self.pool.open_sessions)
+
+    def test_checkout__connecting_fails__closes_the_half_open_connection(self):
+        failing = create_connector()
+        failing.set_sftp_session.side_effect = TimeoutError("authentication timed out")
+        self.connector_factory.side_effect = [failing]
+
+        with self.assertRaises(TimeoutError):
+            self.pool.checkout(*server_one)
+        failing.close_sftp_session.assert_called_once()
+
+    def test_checkout__pool_full__closes_the_evicted_session_outside_the_pool_lock(self):
+        first = self.pool.checkout(*server_one)
+        second = self.pool.checkout(*server_one)
+        self.pool.release(first)
+        self.pool.release(second)
+        is_lock_held = []
+        first.close_sftp_session.side_effect = lambda: is_lock_held.append(self.pool._condition._is_owned())
+
+        self.pool.checkout(*server_two)
+
+        self.assertEqual([False], is_lock_held)
+
+    def test_checkout__session_idle_past_timeout__is_closed_outside_the_pool_lock(self):
+        connector = self.pool.checkout(*server_one)
+        self.pool.release(connector)
+        is_lock_held = []
+        connector.close_sftp_session.side_effect = lambda: is_lock_held.append(self.pool._condition._is_owned())
+
+        self.clock.now += 301
+        self.pool.checkout(*server_one)
+
+        self.assertEqual([False], is_lock_held)
+
+    def test_release__connection_dropped_while_in_use__closes_it(self):
+        connector = self.pool.checkout(*server_one)
+        connector.is_session_active.return_value = False
+
+        self.pool.release(connector)
+
+        connector.close_sftp_session.assert_called_once()
+        self.assertEqual(0, self.pool.open_sessions)
+
+    def test_close_all__closes_idle_sessions_and_the_checked_out_ones_once_released(self):
+        idle = self.pool.checkout(*server_one)
+        in_use = self.pool.checkout(*server_two)
+        self.pool.release(idle)
+
+        self.pool.close_all()
+        idle.close_sftp_session.assert_called_once()
+        in_use.close_sftp_session.assert_not_called()
+
+        self.pool.release(in_use)
+        in_use.close_sftp_session.assert_called_once()
+
+    def test_prepare__no_idle_session__opens_one_ahead_of_the_checkout(self):
+        self.pool.prepare(*server_one)
+        self.assertEqual(1, self.pool.idle_sessions)
+
+        connector = self.pool.checkout(*server_one)
+
+        self.assertEqual(1, self.connector_factory.call_count)
+        connector.set_sftp_session.assert_called_once()
+
+    def test_prepare__session_already_idle__does_not_open_another(self):
+        self.pool.release(self.pool.checkout(*server_one))
+        self.pool.prepare(*server_one)
+
+        self.assertEqual(1, self.connector_factory.call_count)
+
+    def test_prepare__fails_to_connect__the_checkout_connects_as_usual(self):
+        failing = create_connector()
+        failing.set_sftp_session.side_effect = OSError("host unreachable")
+        self.connector_factory.side_effect = [failing, create_connector()]
+
+        self.pool.prepare(*server_one)
+        self.pool.checkout(*server_one)
+
+        self.assertEqual(2, self.connector_factory.call_count)
+        self.assertEqual(1, self.pool.open_sessions)
+        failing.close_sftp_session.assert_called_once()
+
+    def test_checkout__session_being_prepared__waits_for_it_instead_of_connecting(self):
+        is_connecting = threading.Event()
+        may_connect = threading.Event()
+        preparing = create_connector()
+        preparing.set_sftp_session.side_effect = lambda **_: is_connecting.set() or may_connect.wait()
+        self.connector_factory.side_effect = [preparing]
+        self.pool.checkout_timeout_seconds = 5
+        thread = threading.Thread(target=self.pool.prepare, args=server_one)
+        thread.start()
+        is_connecting.wait()
+
+        threading.Timer(0.05, may_connect.set).start()
+        connector = self.pool.checkout(*server_one)
+        thread.join()
+
+        self.assertIs(preparing, connector)
+        self.assertEqual(1, self.connector_factory.call_count)
+
+    def test_sftp_navigator__no_connector_given__uses_a_pooled_session_per_operation(self):
+        navigator = SFTPNavigator(
+            sftp_host="host_one", sftp_username="user", sftp_password="password", sftp_port=22, connection_pool=self.pool
+        )
+        navigator.is_file_in_directory("directory", "file.jpg")
+        navigator.save_file_to_directory(b"data", "directory/file.jpg")
+
+        self.assertEqual(1, self.connector_factory.call_count)
+        self.assertEqual(1, self.pool.idle_sessions)
@@ -4,7 +4,7 @@ from unittest.mock import Mock
 from paramiko.ssh_exception import SSHException, AuthenticationException
 
 from file_navigator.sftp_file_navigator import SFTPConnector
-from utils.specified_exceptions import FailedSFTPSessionConnectionError, SFTPAuthenticationError
+from utils.specified_exceptions import FailedSFTPSessionConnectionError, SFTPAuthenticationError, SFTPTimeoutError
 
 host = "some_host"
 username = "cool_username"
@@ -21,13 +21,13 @@ class TestSFTPConnector(TestCase):
     def test_set_sftp_session__makes_expected_request_to_connect_session(self):
         self.connector.set_sftp_session(host, username, password, specific_port)
         self.mock_client.connect.assert_called_once_with(**{
-            "hostname": host, "username": username, "password": password, "port": specific_port
+            "hostname": host, "username": username, "password": password, "port": specific_port, "timeout": 10
         })
 
     def test_set_sftp_session__no_port_specified__sets_default_port_value(self):
         self.connector.set_sftp_session(host, username, password)
         self.mock_client.connect.assert_called_once_with(**{
-            "hostname": host, "username": username, "password": password, "port": default_port
+            "hostname": host, "username": username, "password": password, "port": default_port, "timeout": 10
         })
 
     def test_close_sftp_session__makes_expected_requests_to_close_session(self):
@@ -46,3 +46,35 @@ class TestSFTPConnector(TestCase):
         with self.assertRaises(SFTPAuthenticationError):
             self.mock_client.connect.side_effect = AuthenticationException()
             self.connector.set_sftp_session(host, username, password, default_port)
+
+    def test_is_session_active__transport_is_active__returns_true(self):
+        self.mock_client.get_transport.return_value.is_active.return_value = True
+        self.connector.set_sftp_session(host, username, password)
+        self.assertTrue(self.connector.is_session_active())
+
+    def test_is_session_active__transport_dropped__returns_false(self):
+        self.mock_client.get_transport.return_value.is_active.return_value = False
+        self.connector.set_sftp_session(host, username, password)
+        self.assertFalse(self.connector.is_session_active())
+
+    def test_is_session_active__no_session_opened__returns_false(self):
+        self.assertFalse(self.connector.is_session_active())
+
+    def test_init__no_client_given__does_not_share_clients_between_instances(self):
+        self.assertIsNot(SFTPConnector()._ssh_client, SFTPConnector()._ssh_client)
+
+    def test_set_sftp_session__connection_timed_out__raises_expected_error(self):
+        self.mock_client.connect.side_effect = TimeoutError()
+        with self.assertRaises(SFTPTimeoutError):
+            self.connector.set_sftp_session(host, username, password)
+        self.mock_client.open_sftp.assert_not_called()
+
+    def test_set_sftp_session__connected__sends_keepalives(self):
+        self.connector.set_sftp_session(host, username, password)
+        self.mock_client.get_transport.return_value.set_keepalive.assert_called_once_with(30)
+
+    def test_is_session_responsive__server_stopped_answering__returns_false(self):
+        self.mock_client.get_transport.return_value.is_active.return_value = True
+        self.mock_client.open_sftp.return_value.normalize.side_effect = EOFError()
+        self.connector.set_sftp_session(host, username, password)
+        self.assertFalse(self.connector.is_session_responsive())
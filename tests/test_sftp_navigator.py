@@ -1,6 +1,10 @@
+import io
+import stat
+import time
 from unittest import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call, patch
 
+from file_navigator.cleanup_report import CleanupReport
 from file_navigator.sftp_file_navigator import SFTPNavigator
 
 fake_file = "Fake File"
@@ -9,21 +13,59 @@ wrong_directory = "wrong/directory/to/file"
 directory_path_does_not_exist = "wrong/directory/raise/error"
 
 
-def create_file_directory_response(directory):
-    if directory == correct_directory:
-        return ["File One", "File Two", fake_file]
-    elif directory == wrong_directory:
-        return ["File One", "File Two"]
-    elif directory == directory_path_does_not_exist:
+existing_paths = {
+    "directory",
+    "directory/to",
+    correct_directory,
+    f"{correct_directory}/File One",
+    f"{correct_directory}/{fake_file}",
+    "wrong",
+    "wrong/directory",
+    "wrong/directory/to",
+    "wrong/directory/raise",
+    wrong_directory,
+}
+
+
+def create_attributes(filename, days_old=0, size=100, is_directory=False):
+    return MagicMock(
+        filename=filename,
+        st_mode=stat.S_IFDIR if is_directory else stat.S_IFREG,
+        st_mtime=int(time.time()) - days_old * 60 * 60 * 24,
+        st_size=size,
+    )
+
+
+gallery_listing = {
+    ".": [
+        create_attributes(".ssh", is_directory=True),
+        create_attributes("gallery", is_directory=True),
+        create_attributes("notes.txt", days_old=900),
+    ],
+    ".ssh": [create_attributes("authorized_keys", days_old=900)],
+    "gallery": [
+        create_attributes(".content-index", is_directory=True),
+        create_attributes("general", is_directory=True),
+        create_attributes("old.jpg", days_old=400),
+    ],
+    "gallery/.content-index": [create_attributes("index.db", days_old=900)],
+    "gallery/general": [
+        create_attributes("new.jpg", days_old=2),
+        create_attributes("older.jpg", days_old=500, size=250),
+    ],
+}
+
+
+def create_stat_response(path):
+    if path not in existing_paths:
         raise FileNotFoundError
-    else:
-        raise NotImplementedError
+    return object()
 
 
 class TestSFTPNavigator(TestCase):
     def setUp(self) -> None:
         self.mocked_connector = MagicMock(**{
-            "sftp_session.listdir.side_effect": create_file_directory_response
+            "sftp_session.stat.side_effect": create_stat_response
         })
         self.navigator = SFTPNavigator(
             host="some_host",
@@ -33,6 +75,20 @@ class TestSFTPNavigator(TestCase):
             sftp_connector=self.mocked_connector,
         )
 
+    def test_init__app_credential_names__connects_with_credentials(self):
+        navigator = SFTPNavigator(
+            sftp_host="some_host",
+            sftp_username="some_user",
+            sftp_password="my_secret_password",
+            sftp_port=None,
+            slack_bot_token="xoxb-token",
+            sftp_connector=self.mocked_connector,
+        )
+        _ = navigator.sftp_session
+        self.mocked_connector.set_sftp_session.assert_called_once_with(
+            host="some_host", username="some_user", password="my_secret_password", port=22,
+        )
+
     def test_is_file_in_directory__file_exists_in_directory__returns_true(self):
         actual = self.navigator.is_file_in_directory(correct_directory, fake_file)
         self.assertTrue(actual)
@@ -53,10 +109,147 @@ class TestSFTPNavigator(TestCase):
         self.navigator.is_file_in_directory(directory_path_does_not_exist, fake_file)
         self.mocked_connector.sftp_session.mkdir.assert_called_once_with(directory_path_does_not_exist)
 
+    def test_is_file_in_directory__parent_directories_do_not_exist__creates_them_in_order(self):
+        self.navigator.is_file_in_directory("new/nested/gallery", fake_file)
+        self.assertEqual(
+            [call("new"), call("new/nested"), call("new/nested/gallery")],
+            self.mocked_connector.sftp_session.mkdir.call_args_list,
+        )
+
+    def test_is_file_in_directory__directory_already_checked__only_stats_the_file(self):
+        self.navigator.is_file_in_directory(correct_directory, fake_file)
+        self.mocked_connector.sftp_session.stat.reset_mock()
+
+        self.navigator.is_file_in_directory(correct_directory, "Wrong File")
+        self.mocked_connector.sftp_session.stat.assert_called_once_with(f"{correct_directory}/Wrong File")
+
+    def test_is_file_in_directory__does_not_list_the_directory(self):
+        self.navigator.is_file_in_directory(correct_directory, fake_file)
+        self.mocked_connector.sftp_session.listdir.assert_not_called()
+
     def test_is_file_in_directory__file_does_not_exist__does_not_create_a_new_directory(self):
         self.navigator.is_file_in_directory(wrong_directory, fake_file)
         self.mocked_connector.sftp_session.mkdir.assert_not_called()
 
-    def test_save_file_to_directory__makes_expected_request_to_save_file(self):
+    def test_save_file_to_directory__writes_to_a_temporary_file_and_renames_it_into_place(self):
+        self.navigator.save_file_to_directory(b'Some data', f"{correct_directory}/{fake_file}")
+
+        sftp_session = self.mocked_connector.sftp_session
+        [(temp_path, mode), _] = sftp_session.open.call_args
+        self.assertEqual("wb", mode)
+        self.assertTrue(temp_path.startswith(f"{correct_directory}/.{fake_file}."))
+        sftp_session.posix_rename.assert_called_once_with(temp_path, f"{correct_directory}/{fake_file}")
+
+    def test_save_file_to_directory__writes_are_pipelined(self):
+        self.navigator.save_file_to_directory(b'Some data', correct_directory)
+        remote_file = self.mocked_connector.sftp_session.open.return_value.__enter__.return_value
+        remote_file.set_pipelined.assert_called_once_with(True)
+
+    def test_save_file_to_directory__upload_fails__removes_the_temporary_file(self):
+        sftp_session = self.mocked_connector.sftp_session
+        sftp_session.open.return_value.__enter__.return_value.write.side_effect = OSError("connection lost")
+
+        with self.assertRaises(OSError):
+            self.navigator.save_file_to_directory(b'Some data', correct_directory)
+
+        [(temp_path, _), _] = sftp_session.open.call_args
+        sftp_session.remove.assert_called_once_with(temp_path)
+        sftp_session.posix_rename.assert_not_called()
+
+    def test_save_file_to_directory__directory_removed_since_checked__checks_it_again_next_time(self):
+        self.navigator.is_file_in_directory(correct_directory, fake_file)
+        self.mocked_connector.sftp_session.open.side_effect = FileNotFoundError("No such file")
+
+        with self.assertRaises(FileNotFoundError):
+            self.navigator.save_file_to_directory(b'Some data', f"{correct_directory}/{fake_file}")
+        self.mocked_connector.sftp_session.stat.reset_mock()
+        self.navigator.is_file_in_directory(correct_directory, fake_file)
+
+        self.mocked_connector.sftp_session.stat.assert_any_call(correct_directory)
+
+    def test_save_file_to_directory__posix_rename_unsupported__replaces_the_file_with_a_rename(self):
+        sftp_session = self.mocked_connector.sftp_session
+        sftp_session.posix_rename.side_effect = OSError("Operation unsupported")
+
         self.navigator.save_file_to_directory(b'Some data', correct_directory)
-        self.mocked_connector.sftp_session.open.assert_called_once_with(correct_directory, "wb+")
+
+        [(temp_path, _), _] = sftp_session.open.call_args
+        sftp_session.remove.assert_called_once_with(correct_directory)
+        sftp_session.rename.assert_called_once_with(temp_path, correct_directory)
+
+    def test_is_connection_alive__not_connected_yet__returns_true(self):
+        self.assertTrue(self.navigator.is_connection_alive())
+        self.mocked_connector.is_session_active.assert_not_called()
+
+    def test_is_connection_alive__session_dropped__returns_false(self):
+        self.mocked_connector.is_session_active.return_value = False
+        self.navigator.is_file_in_directory(correct_directory, fake_file)
+        self.assertFalse(self.navigator.is_connection_alive())
+
+    def test_close_connection__session_open__closes_the_session(self):
+        self.navigator.is_file_in_directory(correct_directory, fake_file)
+        self.navigator.close_connection()
+        self.mocked_connector.close_sftp_session.assert_called_once()
+
+    @patch("file_navigator.sftp_file_navigator.sftp_navigator.IMAGE_CHUNK_SIZE", new=4)
+    def test_save_file_to_directory__stream_given__writes_the_stream_in_chunks(self):
+        self.navigator.save_file_to_directory(io.BytesIO(b"Some data"), correct_directory)
+        remote_file = self.mocked_connector.sftp_session.open.return_value.__enter__.return_value
+        self.assertEqual([call(b"Some"), call(b" dat"), call(b"a")], remote_file.write.call_args_list)
+
+    def test_cleanup_directory_files__walks_subdirectories__removes_only_expired_files(self):
+        self.mocked_connector.sftp_session.listdir_attr.side_effect = gallery_listing.get
+        report = self.navigator.cleanup_directory_files("gallery", max_workers=2)
+
+        removed = {call_args.args[0] for call_args in self.mocked_connector.sftp_session.remove.call_args_list}
+        self.assertEqual({"gallery/old.jpg", "gallery/general/older.jpg"}, removed)
+        self.assertEqual(350, report.bytes_reclaimed)
+        self.assertEqual(2, report.directories_scanned)
+        self.assertTrue(report.is_complete)
+
+    def test_cleanup_directory_files__files_outside_the_gallery_or_hidden__are_kept(self):
+        self.mocked_connector.sftp_session.listdir_attr.side_effect = gallery_listing.get
+        self.navigator.cleanup_directory_files("gallery")
+
+        removed = {call_args.args[0] for call_args in self.mocked_connector.sftp_session.remove.call_args_list}
+        self.assertEqual({"gallery/old.jpg", "gallery/general/older.jpg"}, removed)
+        listed = [call_args.args[0] for call_args in self.mocked_connector.sftp_session.listdir_attr.call_args_list]
+        self.assertEqual(["gallery", "gallery/general"], listed)
+
+    def test_cleanup_directory_files__root_directory__is_refused(self):
+        for directory_path in ("", ".", "/", None):
+            with self.subTest(directory_path=directory_path):
+                self.assertRaises(ValueError, self.navigator.cleanup_directory_files, directory_path)
+        self.mocked_connector.sftp_session.listdir_attr.assert_not_called()
+
+    def test_iter_expired_batches__yields_a_full_batch_before_walking_on(self):
+        self.mocked_connector.sftp_session.listdir_attr.side_effect = gallery_listing.get
+        report = CleanupReport("gallery", int(time.time()) - 60 * 60 * 24 * 365)
+        batches = self.navigator._iter_expired_batches("gallery", report.cutoff_timestamp, 1, report, None)
+
+        self.assertEqual([("gallery/old.jpg", 100)], next(batches))
+        self.mocked_connector.sftp_session.listdir_attr.assert_called_once_with("gallery")
+        self.assertEqual([("gallery/general/older.jpg", 250)], next(batches))
+
+    def test_cleanup_directory_files__dry_run__reports_without_removing(self):
+        self.mocked_connector.sftp_session.listdir_attr.side_effect = gallery_listing.get
+        report = self.navigator.cleanup_directory_files("gallery", dry_run=True)
+
+        self.mocked_connector.sftp_session.remove.assert_not_called()
+        self.assertEqual(2, report.files_removed)
+        self.assertEqual(350, report.bytes_reclaimed)
+
+    def test_cleanup_directory_files__removal_fails__reports_it_and_continues(self):
+        self.mocked_connector.sftp_session.listdir_attr.side_effect = gallery_listing.get
+        self.mocked_connector.sftp_session.remove.side_effect = [PermissionError("denied"), None]
+        report = self.navigator.cleanup_directory_files("gallery", max_workers=1)
+
+        self.assertEqual(1, report.files_removed)
+        self.assertEqual(1, len(report.failed_files))
+
+    def test_cleanup_directory_files__run_time_cap_reached__stops_early(self):
+        self.mocked_connector.sftp_session.listdir_attr.side_effect = gallery_listing.get
+        report = self.navigator.cleanup_directory_files("gallery", max_seconds=1e-9)
+
+        self.assertFalse(report.is_complete)
+        self.mocked_connector.sftp_session.remove.assert_not_called()
@@ -1,7 +1,9 @@
 from unittest import TestCase
 from unittest.mock import Mock
 
-from slack_api.slack_api_requester import SlackApiRequester
+import requests
+
+from slack_api.slack_api_requester import SlackApiRequester, create_slack_session
 
 channel = "my-channel"
 fake_file_info = {
@@ -34,6 +36,7 @@ class TestSlackApiRequester(TestCase):
         self.request_service = Mock(**{
             "get.return_value.json.return_value": self.FILE_DATA,
             "get.return_value.content": self.IMAGE_DATA,
+            "get.return_value.iter_content.return_value": [self.IMAGE_DATA[:2], self.IMAGE_DATA[2:]],
         })
         self.api_requester = SlackApiRequester(self.bot_token, self.request_service)
 
@@ -51,3 +54,91 @@ class TestSlackApiRequester(TestCase):
         file_url = "https://some_url.com"
         actual_data = self.api_requester.get_image_data(file_url)
         self.assertEqual(self.IMAGE_DATA, actual_data)
+
+    def test_get_image_stream__file_url_given__requests_a_streamed_response(self):
+        file_url = "https://some_url.com"
+        self.api_requester.get_image_stream(file_url)
+        self.request_service.get.assert_called_once_with(
+            file_url, headers=self.api_requester.request_headers, timeout=30, stream=True
+        )
+
+    def test_get_image_stream__file_url_given__stream_returns_expected_data(self):
+        image_stream = self.api_requester.get_image_stream("https://some_url.com")
+        self.assertEqual(self.IMAGE_DATA, image_stream.read())
+
+    def test_get_image_stream__response_has_a_type__stream_has_it(self):
+        self.request_service.get.return_value.headers = {"Content-Type": "image/jpeg"}
+        image_stream = self.api_requester.get_image_stream("https://some_url.com")
+        self.assertEqual("image/jpeg", image_stream.content_type)
+
+    def test_get_image_stream__stream_closed__closes_the_response(self):
+        image_stream = self.api_requester.get_image_stream("https://some_url.com")
+        image_stream.close()
+        self.request_service.get.return_value.close.assert_called_once()
+
+
+def create_fake_response(status_code, headers=None):
+    return Mock(**{"status_code": status_code, "headers": headers or {}, "json.return_value": fake_file_info})
+
+
+class TestSlackApiRequesterRetries(TestCase):
+
+    def setUp(self) -> None:
+        self.request_service = Mock()
+        self.sleep = Mock()
+        self.api_requester = SlackApiRequester(
+            "some_token", self.request_service, max_retries=2, backoff_seconds=1, max_wait_seconds=10, sleep=self.sleep
+        )
+
+    def test_get_file_data__rate_limited__waits_for_retry_after_and_retries(self):
+        self.request_service.get.side_effect = [create_fake_response(429, {"Retry-After": "3"}), create_fake_response(200)]
+
+        actual = self.api_requester.get_file_data("some_id")
+
+        self.assertEqual(fake_file_info, actual)
+        self.assertEqual(2, self.request_service.get.call_count)
+        self.assertTrue(3 <= self.sleep.call_args[0][0] <= 4)
+
+    def test_get_file_data__server_error__retries_with_backoff(self):
+        self.request_service.get.side_effect = [create_fake_response(503), create_fake_response(200)]
+
+        self.api_requester.get_file_data("some_id")
+
+        self.assertTrue(0 <= self.sleep.call_args[0][0] <= 1)
+
+    def test_get_file_data__retries_run_out__raises_last_error(self):
+        failed_response = create_fake_response(503)
+        failed_response.raise_for_status.side_effect = requests.HTTPError("503 Server Error")
+        self.request_service.get.return_value = failed_response
+
+        with self.assertRaises(requests.HTTPError):
+            self.api_requester.get_file_data("some_id")
+        self.assertEqual(3, self.request_service.get.call_count)
+
+    def test_get_file_data__retry_after_longer_than_max_wait__does_not_retry(self):
+        self.request_service.get.return_value = create_fake_response(429, {"Retry-After": "60"})
+
+        self.api_requester.get_file_data("some_id")
+
+        self.request_service.get.assert_called_once()
+        self.sleep.assert_not_called()
+
+    def test_get_file_data__connection_error__retries(self):
+        self.request_service.get.side_effect = [requests.ConnectionError(), create_fake_response(200)]
+
+        self.assertEqual(fake_file_info, self.api_requester.get_file_data("some_id"))
+
+    def test_get_file_data__client_error__does_not_retry(self):
+        self.request_service.get.return_value = create_fake_response(404)
+
+        self.api_requester.get_file_data("some_id")
+
+        self.request_service.get.assert_called_once()
+
+
+class TestCreateSlackSession(TestCase):
+
+    def test_create_slack_session__uses_a_connection_pool_of_the_given_size(self):
+        session = create_slack_session(pool_connections=2, pool_maxsize=8)
+        adapter = session.get_adapter("https://slack.com/api")
+        self.assertEqual(8, adapter._pool_maxsize)
@@ -1,11 +1,19 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import Future
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
-from slack_api.slack_event_api_handler import SlackEventApiHandler
+from slack_api.slack_event_api_handler import SlackEventApiHandler, EventOutcomes
+from utils.content_index import IndexedContent, SQLiteContentIndex
+from utils.metrics import EventMetrics
 from utils.specified_exceptions import (
     UnexpectedEventTypeError,
     SlackApiError,
     FileFormatError,
+    FileTooLargeError,
+    FileAlreadyExistsError,
     WrongChannelProvidedError
 )
 
@@ -56,6 +64,7 @@ fake_event_data = {
     }
 }
 image_data = b"this_is_the_image_data"
+image_stream = Mock(name="image_stream", content_type=None, wait_seconds=0.002, bytes_read=len(image_data))
 
 FAKE_GALLERY_PATH = "wp-content/gallery"
 
@@ -71,7 +80,7 @@ class TestSlackEventApiHandler(TestCase):
     def setUp(self) -> None:
         self._fake_file_data = None  # will be lazy loaded for exception tests
         self.mock_requester = Mock(**{
-            "get_image_data.return_value": image_data,
+            "get_image_stream.return_value": image_stream,
         })
         self.mock_navigator = Mock(**{
             "is_file_in_directory.return_value": False
@@ -121,25 +130,32 @@ class TestSlackEventApiHandler(TestCase):
         self.fake_file_data = fake_file_data
         self.api_handler.handle_slack_event(fake_event_data)
 
-        self.mock_requester.get_image_data.assert_called_once_with(image_url)
+        self.mock_requester.get_image_stream.assert_called_once_with(image_url)
+
+    def test_handle_slack_event__file_shared_event__closes_the_image_stream(self):
+        self.fake_file_data = fake_file_data
+        image_stream.reset_mock()
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        image_stream.close.assert_called_once()
 
     @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=FAKE_GALLERY_PATH)
     def test_handle_slack_event__file_shared_event__gallery_path_present__makes_expected_request_to_save_image_to_file(self):
         self.fake_file_data = fake_file_data
         self.api_handler.handle_slack_event(fake_event_data)
 
-        expected_request = image_data, f"{FAKE_GALLERY_PATH}/{channel_name}/{image_name}"
+        expected_request = image_stream, f"{FAKE_GALLERY_PATH}/{channel_name}/{image_name}"
 
-        self.mock_navigator.save_file_to_directory.assert_called_once_with(*expected_request)
+        self.mock_navigator.save_file_to_directory.assert_called_once_with(*expected_request, content_type=None)
 
     @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
     def test_handle_slack_event__file_shared_event__no_gallery_path__makes_expected_request_to_save_image_to_file(self):
         self.fake_file_data = fake_file_data
         self.api_handler.handle_slack_event(fake_event_data)
 
-        expected_request = image_data, f"{channel_name}/{image_name}"
+        expected_request = image_stream, f"{channel_name}/{image_name}"
 
-        self.mock_navigator.save_file_to_directory.assert_called_once_with(*expected_request)
+        self.mock_navigator.save_file_to_directory.assert_called_once_with(*expected_request, content_type=None)
 
     @patch("slack_api.slack_event_api_handler.EXCLUDE_THREADED_IMAGES", new=False)
     def test_handle_slack_event__exclude_threaded_images_false__file_is_thread__saves_image(self):
@@ -155,6 +171,321 @@ class TestSlackEventApiHandler(TestCase):
 
         self.mock_navigator.save_file_to_directory.assert_not_called()
 
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=FAKE_GALLERY_PATH)
+    def test_handle_slack_event__file_already_exists__checks_the_destination_from_file_info(self):
+        self.fake_file_data = fake_file_data
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        self.mock_navigator.is_file_in_directory.assert_called_once_with(
+            f"{FAKE_GALLERY_PATH}/{channel_name}", image_name
+        )
+
+    def test_handle_slack_event__file_already_exists__does_not_download_the_image(self):
+        self.fake_file_data = fake_file_data
+        self.mock_navigator.is_file_in_directory.return_value = True
+
+        actual = self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.DUPLICATE, actual)
+        self.mock_requester.get_image_stream.assert_not_called()
+        self.mock_navigator.save_file_to_directory.assert_not_called()
+
+    def test_handle_slack_event__file_saved__returns_saved_outcome(self):
+        self.fake_file_data = fake_file_data
+        self.assertEqual(EventOutcomes.SAVED, self.api_handler.handle_slack_event(fake_event_data))
+
+    @patch("slack_api.slack_event_api_handler.EXCLUDE_THREADED_IMAGES", new=True)
+    def test_handle_slack_event__file_is_thread__returns_threaded_outcome(self):
+        self.fake_file_data = fake_threaded_file_data
+        self.assertEqual(EventOutcomes.THREADED, self.api_handler.handle_slack_event(fake_event_data))
+
+    def test_handle_slack_event__file_saved__records_the_duration_of_each_stage(self):
+        self.fake_file_data = fake_file_data
+        metrics = EventMetrics()
+        self.api_handler.handle_slack_event(fake_event_data, metrics=metrics)
+
+        for stage in ("files_info_ms", "exists_check_ms", "download_ms", "upload_ms"):
+            self.assertIsNotNone(metrics.get(stage), stage)
+        self.assertGreaterEqual(metrics.get("download_ms"), 2)  # the time waiting for the image stream
+        self.assertEqual(len(image_data), metrics.get("image_bytes"))
+
+    @patch("slack_api.slack_event_api_handler.get_blocking_io_executor")
+    def test_handle_slack_event__file_shared_event__prepares_the_storage_connection_in_the_background(self, executor):
+        self.fake_file_data = fake_file_data
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        [(prepare, *_), _] = executor.return_value.submit.call_args
+        self.mock_navigator.prepare_connection.assert_not_called()
+        prepare()
+        self.mock_navigator.prepare_connection.assert_called_once()
+
+    @patch("slack_api.slack_event_api_handler.PREPARE_STORAGE_CONNECTION", new=False)
+    @patch("slack_api.slack_event_api_handler.get_blocking_io_executor")
+    def test_handle_slack_event__preparing_turned_off__does_not_prepare_the_connection(self, executor):
+        self.fake_file_data = fake_file_data
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        executor.return_value.submit.assert_not_called()
+
+    def test_prepare_connection__navigator_fails_to_connect__does_not_raise(self):
+        self.mock_navigator.prepare_connection.side_effect = OSError("host unreachable")
+        self.api_handler._prepare_connection()
+
+    def test_handle_slack_event__saving_fails__returns_error_outcome(self):
+        self.fake_file_data = fake_file_data
+        self.mock_navigator.save_file_to_directory.side_effect = OSError("connection lost")
+        self.assertEqual(EventOutcomes.ERROR, self.api_handler.handle_slack_event(fake_event_data))
+
+    def _use_renditions(self, rendered=None, error=None):
+        renditions = Future()
+        if error is not None:
+            renditions.set_exception(error)
+        else:
+            renditions.set_result(rendered)
+        self.api_handler.rendition_processor = Mock(**{"submit.return_value": renditions})
+        self.fake_file_data = fake_file_data
+        image_stream.read.return_value = image_data
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__renditions_configured__saves_them_next_to_the_image(self):
+        self._use_renditions({f"{channel_name}/image-medium.webp": b"medium"})
+
+        outcome = self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.SAVED, outcome)
+        self.api_handler.rendition_processor.submit.assert_called_once_with(image_data, f"{channel_name}/{image_name}")
+        self.mock_navigator.save_file_to_directory.assert_any_call(
+            image_data, f"{channel_name}/{image_name}", content_type=None
+        )
+        self.mock_navigator.save_file_to_directory.assert_any_call(b"medium", f"{channel_name}/image-medium.webp")
+
+    def test_handle_slack_event__renditions_fail__still_saves_the_image(self):
+        self._use_renditions(error=OSError("cannot identify image file"))
+        metrics = EventMetrics()
+
+        outcome = self.api_handler.handle_slack_event(fake_event_data, metrics=metrics)
+
+        self.assertEqual(EventOutcomes.SAVED, outcome)
+        self.mock_navigator.save_file_to_directory.assert_called_once()
+        self.assertEqual(1, metrics.get("rendition_errors"))
+
+    def test_handle_slack_event__image_not_saved__does_not_save_the_renditions(self):
+        self._use_renditions({"image-medium.webp": b"medium"})
+        self.mock_navigator.save_file_to_directory.side_effect = OSError("connection lost")
+
+        outcome = self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.ERROR, outcome)
+        self.mock_navigator.save_file_to_directory.assert_called_once()
+
+    def test_select_url_key__target_size__picks_the_smallest_thumbnail_meeting_it(self):
+        file = {"url_private": "original", "thumb_160": "a", "thumb_480": "b", "thumb_1024": "c", "thumb_480_w": "d"}
+
+        self.assertEqual("thumb_480", SlackEventApiHandler._select_url_key(file, target_size=400))
+        self.assertEqual("thumb_160", SlackEventApiHandler._select_url_key(file, target_size=64))
+
+    def test_select_url_key__no_thumbnail_meets_the_target__picks_the_original(self):
+        file = {"url_private": "original", "thumb_360": "a", "size": 100}
+        self.assertEqual("url_private", SlackEventApiHandler._select_url_key(file, target_size=1024))
+
+    def test_select_url_key__no_target_size__picks_the_original(self):
+        file = {"url_private": "original", "thumb_1024": "a", "size": 100}
+        self.assertEqual("url_private", SlackEventApiHandler._select_url_key(file, target_size=None))
+
+    def test_select_url_key__original_too_large__picks_the_largest_thumbnail(self):
+        file = {"url_private": "original", "thumb_360": "a", "thumb_720": "b", "size": 5000}
+
+        actual = SlackEventApiHandler._select_url_key(file, target_size=None, max_download_bytes=1000)
+
+        self.assertEqual("thumb_720", actual)
+
+    def test_select_url_key__original_too_large_without_thumbnails__raises_expected_exception(self):
+        file = {"url_private": "original", "size": 5000}
+
+        with self.assertRaises(FileTooLargeError):
+            SlackEventApiHandler._select_url_key(file, target_size=1024, max_download_bytes=1000)
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__thumbnail_of_a_heic_image__saves_it_with_the_thumbnails_type(self):
+        self.fake_file_data = {"file": {**fake_file_data["file"], "name": "image.heic", "mimetype": "image/heic"}}
+        self.mock_requester.get_image_stream.return_value = Mock(
+            content_type="image/jpeg; charset=binary", wait_seconds=0.0, bytes_read=0
+        )
+
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        content_type = self.mock_navigator.save_file_to_directory.call_args.kwargs["content_type"]
+        self.assertEqual("image/jpeg", content_type)
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__original_without_a_response_type__saves_it_with_slacks_mimetype(self):
+        self.fake_file_data = {"file": {
+            "name": "image.tiff", "channels": [channel_id], "shares": fake_file_data["file"]["shares"],
+            "url_private": image_url, "mimetype": "image/tiff",
+        }}
+        self.mock_requester.get_image_stream.return_value = Mock(
+            content_type="application/octet-stream", wait_seconds=0.0, bytes_read=0
+        )
+
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        content_type = self.mock_navigator.save_file_to_directory.call_args.kwargs["content_type"]
+        self.assertEqual("image/tiff", content_type)
+
+    def test_handle_slack_event__file_shared_event__records_the_download_source(self):
+        self.fake_file_data = fake_file_data
+        metrics = EventMetrics()
+        self.api_handler.handle_slack_event(fake_event_data, metrics=metrics)
+
+        self.assertEqual("thumb_1024", metrics.properties["download_source"])
+
+    def _use_content_index(self, indexed=None, is_claimed=True, existing_paths=(), reserved_paths=(), references=None):
+        self.api_handler.content_index = Mock(**{"get.return_value": indexed, "claim.return_value": is_claimed})
+        self.api_handler.content_index.reserve_path.side_effect = lambda path: path not in reserved_paths
+        self.api_handler.content_index.resolve.side_effect = lambda path: (references or {}).get(path)
+        self.mock_navigator.is_file_in_directory.side_effect = lambda directory, name: \
+            f"{directory}/{name}" in existing_paths
+        self.fake_file_data = fake_file_data
+        self.mock_requester.get_image_stream.return_value = Mock(
+            name="image_stream",
+            content_type=None,
+            wait_seconds=0.0,
+            bytes_read=len(image_data),
+            **{"read.side_effect": [image_data, b""]},
+        )
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_new_content__claims_saves_and_commits_it(self):
+        self._use_content_index()
+
+        outcome = self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.SAVED, outcome)
+        content_index = self.api_handler.content_index
+        content_hash = content_index.claim.call_args.args[0]
+        self.assertEqual(64, len(content_hash))
+        content_index.claim.assert_called_once_with(content_hash, f"{channel_name}/{image_name}", None)
+        [(saved_file, file_path), _] = self.mock_navigator.save_file_to_directory.call_args
+        self.assertEqual(f"{channel_name}/{image_name}", file_path)
+        content_index.commit.assert_called_once_with(content_hash, file_path)
+        content_index.release_path.assert_called_once_with(file_path)
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_identical_content_saved__returns_duplicate_outcome(self):
+        self._use_content_index(indexed=IndexedContent("random/other.jpg", False), existing_paths=["random/other.jpg"])
+        metrics = EventMetrics()
+
+        outcome = self.api_handler.handle_slack_event(fake_event_data, metrics=metrics)
+
+        self.assertEqual(EventOutcomes.DUPLICATE, outcome)
+        self.mock_navigator.save_file_to_directory.assert_not_called()
+        self.assertEqual("random/other.jpg", metrics.properties["duplicate_of"])
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_identical_content_in_another_channel__references_it(self):
+        self._use_content_index(indexed=IndexedContent("random/other.jpg", False), existing_paths=["random/other.jpg"])
+        metrics = EventMetrics()
+
+        self.api_handler.handle_slack_event(fake_event_data, metrics=metrics)
+
+        content_index = self.api_handler.content_index
+        content_index.add_reference.assert_called_once_with(f"{channel_name}/{image_name}", "random/other.jpg")
+        content_index.release_path.assert_called_once_with(f"{channel_name}/{image_name}")
+        self.assertEqual(f"{channel_name}/{image_name}", metrics.properties["referenced_as"])
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_identical_content_already_referenced__keeps_the_reference(self):
+        self._use_content_index(
+            indexed=IndexedContent("random/other.jpg", False),
+            existing_paths=["random/other.jpg"],
+            references={f"{channel_name}/{image_name}": "random/other.jpg"},
+        )
+
+        self.assertEqual(EventOutcomes.DUPLICATE, self.api_handler.handle_slack_event(fake_event_data))
+        self.api_handler.content_index.add_reference.assert_not_called()
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_name_referenced__saves_under_a_suffixed_name(self):
+        self._use_content_index(references={f"{channel_name}/{image_name}": "random/other.jpg"})
+
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        [(_, file_path), _] = self.mock_navigator.save_file_to_directory.call_args
+        self.assertEqual(f"{channel_name}/image-1.jpg", file_path)
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__identical_image_saved_in_another_channel__this_channel_resolves_it(self):
+        self._use_content_index(existing_paths=["random/image.jpg"])
+        content_index = SQLiteContentIndex(os.path.join(tempfile.mkdtemp(), "content-index.sqlite3"), gallery="A123")
+        content_hash = hashlib.sha256(image_data).hexdigest()
+        content_index.claim(content_hash, "random/image.jpg")
+        content_index.commit(content_hash, "random/image.jpg")
+        self.api_handler.content_index = content_index
+
+        self.assertEqual(EventOutcomes.DUPLICATE, self.api_handler.handle_slack_event(fake_event_data))
+        self.assertEqual("random/image.jpg", content_index.resolve(f"{channel_name}/{image_name}"))
+        self.mock_navigator.save_file_to_directory.assert_not_called()
+
+    def test_handle_slack_event__content_index_and_identical_content_being_saved__returns_duplicate_outcome(self):
+        self._use_content_index(indexed=IndexedContent("random/other.jpg", is_pending=True))
+
+        self.assertEqual(EventOutcomes.DUPLICATE, self.api_handler.handle_slack_event(fake_event_data))
+        self.api_handler.content_index.claim.assert_not_called()
+        self.mock_navigator.save_file_to_directory.assert_not_called()
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_name_taken__saves_under_a_suffixed_name(self):
+        taken = [f"{channel_name}/{image_name}", f"{channel_name}/image-1.jpg"]
+        self._use_content_index(existing_paths=taken)
+
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        [(_, file_path), _] = self.mock_navigator.save_file_to_directory.call_args
+        self.assertEqual(f"{channel_name}/image-2.jpg", file_path)
+        self.assertEqual(3, self.api_handler.content_index.release_path.call_count)  # the two taken ones, then its own
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_name_being_saved_concurrently__saves_under_a_suffixed_name(self):
+        self._use_content_index(reserved_paths=[f"{channel_name}/{image_name}"])
+
+        self.api_handler.handle_slack_event(fake_event_data)
+
+        [(_, file_path), _] = self.mock_navigator.save_file_to_directory.call_args
+        self.assertEqual(f"{channel_name}/image-1.jpg", file_path)
+
+    @patch("slack_api.slack_event_api_handler.MAX_NAME_SUFFIX", new=1)
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_every_suffix_taken__raises_expected_exception(self):
+        self._use_content_index(existing_paths=[f"{channel_name}/{image_name}", f"{channel_name}/image-1.jpg"])
+
+        with self.assertRaises(FileAlreadyExistsError):
+            self.api_handler.handle_slack_event(fake_event_data)
+
+    @patch("slack_api.slack_event_api_handler.GALLERY_PATH", new=None)
+    def test_handle_slack_event__content_index_and_indexed_file_removed__saves_and_reclaims_it(self):
+        self._use_content_index(indexed=IndexedContent("random/other.jpg", is_pending=False))
+
+        outcome = self.api_handler.handle_slack_event(fake_event_data)
+
+        self.assertEqual(EventOutcomes.SAVED, outcome)
+        self.assertEqual("random/other.jpg", self.api_handler.content_index.claim.call_args.args[2])
+
+    def test_handle_slack_event__content_index_and_identical_content_claimed_concurrently__returns_duplicate(self):
+        self._use_content_index(is_claimed=False)
+
+        self.assertEqual(EventOutcomes.DUPLICATE, self.api_handler.handle_slack_event(fake_event_data))
+        self.mock_navigator.save_file_to_directory.assert_not_called()
+        self.api_handler.content_index.release_path.assert_called_once()
+
+    def test_handle_slack_event__content_index_and_saving_fails__releases_the_content_and_path(self):
+        self._use_content_index()
+        self.mock_navigator.save_file_to_directory.side_effect = OSError("connection lost")
+
+        self.assertEqual(EventOutcomes.ERROR, self.api_handler.handle_slack_event(fake_event_data))
+        self.api_handler.content_index.release.assert_called_once()
+        self.api_handler.content_index.release_path.assert_called_once()
+        self.api_handler.content_index.commit.assert_not_called()
+
     # Test Exceptions ----------------------------------------
 
     def test_handle_slack_event__the_wrong_event_type__raises_expected_exception(self):
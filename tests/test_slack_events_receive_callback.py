@@ -0,0 +1,178 @@
+import datetime as dt
+from unittest import TestCase
+from unittest.mock import ANY, Mock, patch
+
+from callback_functions.slack_events_receive_callback import slack_events_receive_callback
+from callback_functions.queue_worker_callback import slack_events_queue_worker
+from event_queue import InMemoryEventQueue
+from slack_api.slack_event_api_handler import EventOutcomes
+from utils.idempotency_store import InMemoryIdempotencyStore
+from utils.metrics import ListMetricsSink
+from utils.specified_exceptions import FileFormatError
+
+app_id = "A123"
+app_credentials = {"slack_app_id": app_id, "slack_bot_token": "some_token", "bucket_name": "my_bucket"}
+file_event = {
+    "type": "event_callback",
+    "api_app_id": app_id,
+    "event_id": "Ev123",
+    "event": {"type": "file_shared", "file_id": "F123", "channel_id": "C123", "user_id": "U123"},
+}
+
+
+def create_fake_request(request_data, headers=None):
+    timestamp = str(int(dt.datetime.now().timestamp()))
+    return Mock(**{
+        "headers": {"x-slack-request-timestamp": timestamp, **(headers or {})},
+        "get_json.return_value": request_data,
+    })
+
+
+class TestSlackEventsReceiveCallback(TestCase):
+
+    def setUp(self) -> None:
+        self.patch_store = patch("callback_functions.slack_events_receive_callback.credential_store")
+        self.credential_store = self.patch_store.start()
+        self.credential_store.get.side_effect = lambda slack_app_id: app_credentials if slack_app_id == app_id else None
+
+        self.patch_registry = patch("callback_functions.slack_events_receive_callback.handler_registry")
+        self.handler_registry = self.patch_registry.start()
+        self.event_handler = self.handler_registry.get_handler.return_value
+        self.event_handler.handle_slack_event.return_value = EventOutcomes.SAVED
+
+        self.event_queue = InMemoryEventQueue()
+        self.patch_queue = patch("event_queue.get_event_queue", return_value=self.event_queue)
+        self.patch_queue.start()
+
+        self.patch_idempotency_store = patch(
+            "callback_functions.slack_events_receive_callback.idempotency_store",
+            new=InMemoryIdempotencyStore(ttl_seconds=60),
+        )
+        self.patch_idempotency_store.start()
+
+        self.metrics_sink = ListMetricsSink()
+        patch("utils.metrics._metrics_sink", new=self.metrics_sink).start()
+
+    def tearDown(self) -> None:
+        patch.stopall()
+
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="sync")
+    def test_slack_events_receive_callback__sync_mode__handles_event_before_responding(self):
+        response = slack_events_receive_callback(create_fake_request(file_event))
+
+        self.event_handler.handle_slack_event.assert_called_once_with(file_event, metrics=ANY)
+        self.assertEqual(EventOutcomes.SAVED, response["body"]["outcome"])
+
+    def test_slack_events_receive_callback__app_not_registered__does_not_handle_event(self):
+        response = slack_events_receive_callback(create_fake_request({**file_event, "api_app_id": "unknown"}))
+
+        self.assertEqual("failed", response["body"]["status"])
+        self.handler_registry.get_handler.assert_not_called()
+
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_receive_callback__queue_mode__queues_a_compact_job_without_handling_it(self):
+        response = slack_events_receive_callback(create_fake_request(file_event))
+
+        self.assertEqual(EventOutcomes.QUEUED, response["body"]["outcome"])
+        self.event_handler.handle_slack_event.assert_not_called()
+        [(_, job)] = self.event_queue.receive(10)
+        self.assertNotIn("user_id", job["event"])
+        self.assertEqual("F123", job["event"]["file_id"])
+
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_receive_callback__queue_mode__wrong_event_type__is_not_queued(self):
+        wrong_event = {**file_event, "event": {"type": "message"}}
+        response = slack_events_receive_callback(create_fake_request(wrong_event))
+
+        self.assertEqual(EventOutcomes.INVALID, response["body"]["outcome"])
+        self.assertEqual([], self.event_queue.receive(10))
+
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_queue_worker__queued_events__handles_and_acknowledges_them(self):
+        slack_events_receive_callback(create_fake_request(file_event))
+
+        response = slack_events_queue_worker(event_queue=self.event_queue)
+
+        self.assertEqual({"processed": 1, "outcomes": {EventOutcomes.SAVED: 1}, "dead_letters": 0}, response["body"])
+        self.assertEqual([], self.event_queue.receive(10))
+
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_queue_worker__event_fails__returns_it_to_the_queue_with_a_delay(self):
+        self.event_handler.handle_slack_event.side_effect = OSError("connection lost")
+        slack_events_receive_callback(create_fake_request(file_event))
+
+        response = slack_events_queue_worker(event_queue=self.event_queue)
+
+        self.assertEqual(1, response["body"]["processed"])
+        self.assertEqual([], self.event_queue.receive(10))
+
+    @patch("callback_functions.queue_worker_callback.QUEUE_RETRY_DELAY_SECONDS", new=0)
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_queue_worker__event_fails_and_no_delay__is_not_processed_again_in_the_run(self):
+        self.event_handler.handle_slack_event.side_effect = OSError("connection lost")
+        slack_events_receive_callback(create_fake_request(file_event))
+
+        response = slack_events_queue_worker(event_queue=self.event_queue)
+
+        self.assertEqual(1, response["body"]["processed"])
+        self.assertEqual(1, len(self.event_queue.receive(10)))
+
+    @patch("callback_functions.queue_worker_callback.QUEUE_MAX_ATTEMPTS", new=1)
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_queue_worker__event_fails_too_many_times__is_dead_lettered(self):
+        self.event_handler.handle_slack_event.side_effect = OSError("connection lost")
+        slack_events_receive_callback(create_fake_request(file_event))
+
+        response = slack_events_queue_worker(event_queue=self.event_queue)
+
+        self.assertEqual(1, response["body"]["dead_letters"])
+        self.assertEqual(1, len(self.event_queue.dead_letters))
+        self.assertEqual([], self.event_queue.receive(10))
+
+    def test_slack_events_receive_callback__event_redelivered__is_only_handled_once(self):
+        slack_events_receive_callback(create_fake_request(file_event))
+        retry_headers = {"X-Slack-Retry-Num": "1", "X-Slack-Retry-Reason": "http_timeout"}
+        response = slack_events_receive_callback(create_fake_request(file_event, retry_headers))
+
+        self.assertEqual(EventOutcomes.REDELIVERED, response["body"]["outcome"])
+        self.event_handler.handle_slack_event.assert_called_once()
+        self.assertEqual(1, self.metrics_sink.records[-1][EventOutcomes.REDELIVERED])
+
+    def test_slack_events_receive_callback__same_file_in_a_new_event__is_only_handled_once(self):
+        slack_events_receive_callback(create_fake_request(file_event))
+        response = slack_events_receive_callback(create_fake_request({**file_event, "event_id": "Ev456"}))
+
+        self.assertEqual(EventOutcomes.REDELIVERED, response["body"]["outcome"])
+        self.event_handler.handle_slack_event.assert_called_once()
+
+    def test_slack_events_receive_callback__handling_failed__retry_is_handled_again(self):
+        self.event_handler.handle_slack_event.return_value = EventOutcomes.ERROR
+        slack_events_receive_callback(create_fake_request(file_event))
+        slack_events_receive_callback(create_fake_request(file_event, {"x-slack-retry-num": "1"}))
+
+        self.assertEqual(2, self.event_handler.handle_slack_event.call_count)
+
+    def test_slack_events_receive_callback__event_handled__emits_one_metrics_record(self):
+        slack_events_receive_callback(create_fake_request(file_event))
+
+        [record] = self.metrics_sink.records
+        self.assertEqual(1, record[EventOutcomes.SAVED])
+        self.assertEqual("Ev123", record["event_id"])
+        self.assertIn("callback_ms", record)
+        metric_names = [metric["Name"] for metric in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+        self.assertIn("get_handler_ms", metric_names)
+
+    def test_slack_events_receive_callback__wrong_file_format__counts_wrong_format_outcome(self):
+        self.event_handler.handle_slack_event.side_effect = FileFormatError("Format is mov")
+        response = slack_events_receive_callback(create_fake_request(file_event))
+
+        self.assertEqual(EventOutcomes.WRONG_FORMAT, response["body"]["outcome"])
+        self.assertEqual(1, self.metrics_sink.records[0][EventOutcomes.WRONG_FORMAT])
+
+    @patch("callback_functions.slack_events_receive_callback.PROCESSING_MODE", new="queue")
+    def test_slack_events_queue_worker__queued_event__emits_metrics_for_the_callback_and_the_job(self):
+        slack_events_receive_callback(create_fake_request(file_event))
+        slack_events_queue_worker(event_queue=self.event_queue)
+
+        outcomes = [record["outcome"] for record in self.metrics_sink.records]
+        self.assertEqual([EventOutcomes.QUEUED, EventOutcomes.SAVED], outcomes)
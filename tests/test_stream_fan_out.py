@@ -0,0 +1,65 @@
+import io
+import threading
+from unittest import TestCase
+
+from utils.stream_fan_out import StreamFanOut
+
+
+class FailingStream(io.RawIOBase):
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        raise ConnectionError("download interrupted")
+
+
+class TestStreamFanOut(TestCase):
+
+    def _read_all(self, fan_out, read=lambda pipe: pipe.read()):
+        results = {}
+
+        def reader(index, pipe):
+            try:
+                results[index] = read(pipe)
+            except Exception as err:
+                results[index] = err
+            finally:
+                pipe.close()
+
+        threads = [threading.Thread(target=reader, args=item) for item in enumerate(fan_out.pipes)]
+        for thread in threads:
+            thread.start()
+        fan_out.pump()
+        for thread in threads:
+            thread.join(timeout=5)
+        return results
+
+    def test_pump__several_readers__each_reads_the_whole_stream(self):
+        fan_out = StreamFanOut(io.BytesIO(b"some image data"), readers=3, chunk_size=4, max_chunks=1)
+
+        results = self._read_all(fan_out)
+
+        self.assertEqual({0: b"some image data", 1: b"some image data", 2: b"some image data"}, results)
+
+    def test_pump__reads_of_a_fixed_size__are_only_short_at_the_end(self):
+        fan_out = StreamFanOut(io.BytesIO(b"0123456789"), readers=1, chunk_size=3)
+
+        results = self._read_all(fan_out, read=lambda pipe: [pipe.read(4), pipe.read(4), pipe.read(4), pipe.read(4)])
+
+        self.assertEqual([b"0123", b"4567", b"89", b""], results[0])
+
+    def test_pump__one_reader_stops__the_others_still_read_everything(self):
+        fan_out = StreamFanOut(io.BytesIO(b"x" * 100), readers=2, chunk_size=1, max_chunks=1)
+
+        results = self._read_all(fan_out, read=lambda pipe: pipe.read(1) if pipe is fan_out.pipes[0] else pipe.read())
+
+        self.assertEqual(b"x", results[0])
+        self.assertEqual(b"x" * 100, results[1])
+
+    def test_pump__source_fails__readers_get_the_error(self):
+        fan_out = StreamFanOut(FailingStream(), readers=2)
+
+        results = self._read_all(fan_out)
+
+        self.assertIsInstance(results[0], ConnectionError)
+        self.assertIsInstance(results[1], ConnectionError)
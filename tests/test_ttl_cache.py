@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from utils.ttl_cache import TTLCache
+
+
+class TestTTLCache(TestCase):
+
+    def setUp(self) -> None:
+        self.now = 0
+        self.cache = TTLCache(max_size=2, ttl_seconds=10, clock=lambda: self.now)
+
+    def test_get__entry_not_expired__returns_value(self):
+        self.cache.set("key", "value")
+        self.now = 9
+        self.assertEqual("value", self.cache.get("key"))
+
+    def test_get__entry_expired__returns_default(self):
+        self.cache.set("key", "value")
+        self.now = 10
+        self.assertIsNone(self.cache.get("key"))
+        self.assertNotIn("key", self.cache)
+
+    def test_set__cache_is_full__evicts_least_recently_used_entry(self):
+        self.cache.set("first")
+        self.cache.set("second")
+        self.cache.get("first")
+        self.cache.set("third")
+
+        self.assertIn("first", self.cache)
+        self.assertNotIn("second", self.cache)
+        self.assertIn("third", self.cache)
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from utils.unpack_credentials import CredentialStore
+
+app_credentials = {"slack_app_id": "A123", "slack_bot_token": "some_token"}
+other_app_credentials = {"slack_app_id": "B456", "slack_bot_token": "another_token"}
+env_var = "FAKE_SLACK_APP_CREDENTIALS"
+
+
+class TestCredentialStore(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "app-credentials.json")
+        self.write_credentials([app_credentials])
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def write_credentials(self, credential_list, modified_time=None):
+        with open(self.path, "w") as cred_file:
+            json.dump(credential_list, cred_file)
+        if modified_time is not None:
+            os.utime(self.path, ns=(modified_time, modified_time))
+
+    def test_get__app_registered__returns_expected_credentials(self):
+        store = CredentialStore(path=self.path)
+        self.assertEqual(app_credentials, store.get("A123"))
+
+    def test_get__app_not_registered__returns_none(self):
+        store = CredentialStore(path=self.path)
+        self.assertIsNone(store.get("unknown"))
+
+    def test_get__file_unchanged__file_is_only_parsed_once(self):
+        store = CredentialStore(path=self.path)
+        with patch("utils.unpack_credentials.get_credential_list", return_value=[app_credentials]) as loader:
+            store.get("A123")
+            store.get("A123")
+        loader.assert_called_once()
+
+    def test_get__file_changed__reloads_credentials(self):
+        store = CredentialStore(path=self.path)
+        store.get("A123")
+
+        self.write_credentials([app_credentials, other_app_credentials], modified_time=10 ** 18)
+        self.assertEqual(other_app_credentials, store.get("B456"))
+
+    @patch.dict(os.environ, {env_var: json.dumps([other_app_credentials])})
+    def test_get__env_var_set__takes_precedence_over_file(self):
+        store = CredentialStore(path=self.path, env_var=env_var)
+        self.assertEqual(other_app_credentials, store.get("B456"))
+        self.assertIsNone(store.get("A123"))
+
+    @patch.dict(os.environ, {env_var: json.dumps([other_app_credentials])})
+    def test_get__env_var_set__is_only_read_and_parsed_once(self):
+        store = CredentialStore(path=self.path, env_var=env_var)
+        store.get("B456")
+
+        with patch("utils.unpack_credentials.os.environ") as environ:
+            with patch("utils.unpack_credentials.json.loads") as loads:
+                self.assertEqual(other_app_credentials, store.get("B456"))
+        environ.get.assert_not_called()
+        loads.assert_not_called()
+
+    def test_get__loader_given__reads_credentials_from_loader(self):
+        loader = Mock(return_value=[other_app_credentials])
+        store = CredentialStore(loader=loader)
+
+        self.assertEqual(other_app_credentials, store.get("B456"))
+        store.get("B456")
+        loader.assert_called_once()
@@ -0,0 +1,155 @@
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from callback_functions.wsgi_callback import (
+    SlackEventsWSGIApp, ThreadPoolWSGIServer, QuietWSGIRequestHandler, drain_and_stop
+)
+
+request_data = {"type": "event_callback", "api_app_id": "A123"}
+
+
+def create_environ(method="POST", body=request_data):
+    data = json.dumps(body).encode()
+    return {
+        "REQUEST_METHOD": method,
+        "CONTENT_LENGTH": str(len(data)),
+        "HTTP_X_SLACK_REQUEST_TIMESTAMP": "1733519316",
+        "wsgi.input": io.BytesIO(data),
+    }
+
+
+class TestSlackEventsWSGIApp(TestCase):
+
+    def setUp(self) -> None:
+        self.callback = Mock(return_value={"statusCode": 200, "body": {"response": "received"}})
+        self.registry = Mock()
+        self.app = SlackEventsWSGIApp(callback=self.callback, registry=self.registry)
+        self.start_response = Mock()
+
+    def test_call__post_request__responds_with_the_callback_body(self):
+        response = self.app(create_environ(), self.start_response)
+
+        self.assertEqual({"response": "received"}, json.loads(b"".join(response)))
+        self.assertEqual("200 OK", self.start_response.call_args.args[0])
+
+    def test_call__post_request__passes_slack_headers_and_body_like_flask(self):
+        self.app(create_environ(), self.start_response)
+
+        [request] = self.callback.call_args.args
+        self.assertEqual("1733519316", request.headers["x-slack-request-timestamp"])
+        self.assertEqual(request_data, request.get_json(force=True))
+
+    def test_call__draining__rejects_new_requests(self):
+        self.app.drain(timeout=0)
+        self.app(create_environ(), self.start_response)
+
+        self.assertEqual("503 Service Unavailable", self.start_response.call_args.args[0])
+        self.callback.assert_not_called()
+
+    def test_call__draining__health_check_fails(self):
+        self.app.drain(timeout=0)
+        response = self.app(create_environ(method="GET"), self.start_response)
+
+        self.assertEqual("503 Service Unavailable", self.start_response.call_args.args[0])
+        self.assertEqual({"status": "draining"}, json.loads(b"".join(response)))
+
+    def test_drain__request_in_flight__waits_for_it_before_closing_connections(self):
+        in_callback, release_request = threading.Event(), threading.Event()
+        self.callback.side_effect = lambda request: in_callback.set() or release_request.wait() and {"body": {}}
+        request_thread = threading.Thread(target=self.app, args=(create_environ(), self.start_response))
+        request_thread.start()
+        self.assertTrue(in_callback.wait(timeout=5))
+
+        threading.Timer(0.05, release_request.set).start()
+        self.assertTrue(self.app.drain(timeout=5))
+        request_thread.join()
+        self.registry.clear.assert_called_once()
+
+    def test_drain__request_does_not_finish_in_time__still_closes_connections(self):
+        self.app._in_flight = 1
+        self.assertFalse(self.app.drain(timeout=0.01))
+        self.registry.clear.assert_called_once()
+
+
+class TestThreadPoolWSGIServer(TestCase):
+
+    def _start_server(self, wsgi_app):
+        server = ThreadPoolWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler, worker_threads=3)
+        server.set_app(wsgi_app)
+        serving = threading.Thread(target=server.serve_forever, daemon=True)
+        serving.start()
+        return server, serving, f"http://127.0.0.1:{server.server_address[1]}/"
+
+    @staticmethod
+    def _get_status(url, method="POST"):
+        data = json.dumps(request_data).encode() if method == "POST" else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method), timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def test_drain_and_stop__while_a_request_is_in_flight__answers_503_until_it_finishes(self):
+        in_callback, release_request, draining = threading.Event(), threading.Event(), threading.Event()
+        wsgi_app = SlackEventsWSGIApp(
+            callback=lambda request: in_callback.set() or release_request.wait() and {"body": {}}, registry=Mock()
+        )
+        server, serving, url = self._start_server(wsgi_app)
+        in_flight_request = threading.Thread(target=self._get_status, args=(url,))
+        in_flight_request.start()
+        self.assertTrue(in_callback.wait(timeout=5))
+
+        wait_for_requests = wsgi_app._condition.wait_for
+
+        def start_draining(predicate, timeout=None):  # called once new requests are turned away
+            draining.set()
+            return wait_for_requests(predicate, timeout)
+
+        stopping = threading.Thread(target=drain_and_stop, args=(server, wsgi_app, 5))
+        with patch.object(wsgi_app._condition, "wait_for", side_effect=start_draining):
+            stopping.start()
+            self.assertTrue(draining.wait(timeout=5))
+
+        self.assertEqual(503, self._get_status(url))
+        self.assertEqual(503, self._get_status(url, method="GET"))
+        self.assertTrue(serving.is_alive())
+
+        release_request.set()
+        stopping.join(timeout=5)
+        serving.join(timeout=5)
+        in_flight_request.join(timeout=5)
+        server.server_close()
+        self.assertFalse(serving.is_alive())
+
+    def test_serve__concurrent_requests__are_handled_by_the_worker_threads(self):
+        requests_in_callback = threading.Barrier(3, timeout=5)
+
+        def callback(request):
+            requests_in_callback.wait()  # only passes once all three requests are handled at once
+            return {"body": {"response": "received"}}
+
+        server = ThreadPoolWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler, worker_threads=3)
+        server.set_app(SlackEventsWSGIApp(callback=callback, registry=Mock()))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        def post():
+            request = urllib.request.Request(url, data=json.dumps(request_data).encode(), method="POST")
+            with urllib.request.urlopen(request, timeout=5) as response:
+                responses.append(json.loads(response.read()))
+
+        responses = []
+        clients = [threading.Thread(target=post) for _ in range(3)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        server.shutdown()
+        server.server_close()
+
+        self.assertEqual([{"response": "received"}] * 3, responses)
@@ -0,0 +1,11 @@
+import functools
+
+from utils.blocking_io import get_blocking_io_executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """ Awaits a blocking call without blocking the event loop """
+    import asyncio  # only the async API needs it, so the synchronous cold start doesn't pay for it
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_blocking_io_executor(), functools.partial(func, *args, **kwargs))
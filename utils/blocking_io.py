@@ -0,0 +1,16 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ASYNC_BLOCKING_IO_THREADS
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_io_executor() -> ThreadPoolExecutor:
+    """ Bounded pool for blocking client calls (requests, boto3, paramiko) kept off the request thread or event loop """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+        return _executor
@@ -0,0 +1,61 @@
+import io
+import time
+
+
+class ChunkedStream(io.RawIOBase):
+    """ Read-only file-like object over an iterator of byte chunks (e.g. `requests.Response.iter_content`)
+
+        Only the current chunk is held in memory, so the whole file is never buffered.
+        `on_close` is called when the stream is closed, e.g. to release the HTTP connection.
+        `wait_seconds` is the time spent waiting for chunks, e.g. downloading, as opposed to consuming them.
+        `content_type` is the type of the data, when the source states it (e.g. the response's Content-Type).
+    """
+
+    def __init__(self, chunks, on_close=None, clock=time.perf_counter, content_type=None):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._on_close = on_close
+        self._clock = clock
+        self.bytes_read = 0
+        self.wait_seconds = 0.0
+        self.content_type = content_type
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        """ Fills the buffer as far as the data allows - a short read only happens at the end of the stream,
+            which consumers such as multipart uploads rely on
+        """
+        size = 0
+        while size < len(buffer):
+            if not self._buffer:
+                start = self._clock()
+                chunk = next(self._chunks, None)
+                self.wait_seconds += self._clock() - start
+                if chunk is None:
+                    break
+                self._buffer = chunk
+                continue
+
+            copied = min(len(buffer) - size, len(self._buffer))
+            buffer[size:size + copied] = self._buffer[:copied]
+            self._buffer = self._buffer[copied:]
+            size += copied
+
+        self.bytes_read += size
+        return size
+
+    def iter_chunks(self, chunk_size: int):
+        """ Yields the remaining data in chunks of at most `chunk_size` bytes """
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        if not self.closed and self._on_close is not None:
+            self._on_close()
+        super().close()
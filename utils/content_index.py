@@ -0,0 +1,361 @@
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from config import IMAGE_CHUNK_SIZE, CONTENT_SPOOL_MAX_MEMORY, CONTENT_CLAIM_LEASE_SECONDS
+
+
+class IndexedContent(NamedTuple):
+    file_path: str
+    is_pending: bool  # claimed by an event that is still saving it
+
+
+class ContentIndexBase(ABC):
+    """ Abstract base class for the content-addressed index of a gallery: the path the image with each
+        content hash (SHA-256) is stored at, so identical images are only stored once.
+        A claim is pending until the image is saved and committed; a pending claim older than `lease_seconds` was
+        abandoned (e.g. the container stopped) and can be taken over. The paths being saved to are reserved the same
+        way, so two different images with the same name never get the same path.
+        An image identical to one stored in another channel's gallery is referenced at a path of its own gallery
+        instead of being stored again, so every channel can resolve its images.
+    """
+
+    def __init__(self, lease_seconds: float = CONTENT_CLAIM_LEASE_SECONDS):
+        self.lease_seconds = lease_seconds
+
+    @abstractmethod
+    def get(self, content_hash: str) -> IndexedContent | None:
+        """ Abstract method returning where the content is (being) stored, if it is indexed """
+        pass
+
+    @abstractmethod
+    def claim(self, content_hash: str, file_path: str, replaced_path: str | None = None) -> bool:
+        """ Abstract method indexing the content as pending at the path, unless it is already indexed.
+            With `replaced_path`, the content indexed there (a file that no longer exists) is claimed instead.
+
+        Returns:
+            True if the caller should save the content
+            False if the content was claimed in the meantime, e.g. by a concurrent event
+        """
+        pass
+
+    @abstractmethod
+    def commit(self, content_hash: str, file_path: str) -> None:
+        """ Abstract method marking the caller's claim as saved """
+        pass
+
+    @abstractmethod
+    def release(self, content_hash: str, file_path: str) -> None:
+        """ Abstract method forgetting the caller's pending claim, e.g. when saving it failed """
+        pass
+
+    @abstractmethod
+    def reserve_path(self, file_path: str) -> bool:
+        """ Abstract method reserving the path for the caller's image until it is saved
+
+        Returns:
+            True if the path was free, False if another event is saving an image at it
+        """
+        pass
+
+    @abstractmethod
+    def release_path(self, file_path: str) -> None:
+        """ Abstract method freeing a reserved path, once the image is saved at it or saving it failed """
+        pass
+
+    @abstractmethod
+    def add_reference(self, file_path: str, stored_path: str) -> bool:
+        """ Abstract method recording the path as a reference to the image stored at `stored_path`
+
+        Returns:
+            True if the reference was added, False if the path already references an image
+        """
+        pass
+
+    @abstractmethod
+    def resolve(self, file_path: str) -> str | None:
+        """ Abstract method returning the path the image referenced at the path is stored at, if it is a reference """
+        pass
+
+
+class SQLiteContentIndex(ContentIndexBase):
+    """ Index in a SQLite file, one per gallery - a local stand-in for an index shared between containers """
+
+    def __init__(self, path: str, gallery: str, lease_seconds: float = CONTENT_CLAIM_LEASE_SECONDS):
+        import sqlite3  # only imported when the index is used, to keep cold starts short
+
+        super().__init__(lease_seconds)
+        self.gallery = gallery
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS content_index ("
+            "gallery TEXT NOT NULL, content_hash TEXT NOT NULL, file_path TEXT NOT NULL, "
+            "is_pending INTEGER NOT NULL, claimed_at REAL NOT NULL, PRIMARY KEY (gallery, content_hash))"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS reserved_paths ("
+            "gallery TEXT NOT NULL, file_path TEXT NOT NULL, claimed_at REAL NOT NULL, "
+            "PRIMARY KEY (gallery, file_path))"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS content_references ("
+            "gallery TEXT NOT NULL, file_path TEXT NOT NULL, stored_path TEXT NOT NULL, "
+            "PRIMARY KEY (gallery, file_path))"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, content_hash: str) -> IndexedContent | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT file_path, is_pending FROM content_index WHERE gallery = ? AND content_hash = ? "
+                "AND (is_pending = 0 OR claimed_at >= ?)",
+                (self.gallery, content_hash, self._get_lease_start()),
+            ).fetchone()
+        return IndexedContent(row[0], bool(row[1])) if row else None
+
+    def claim(self, content_hash: str, file_path: str, replaced_path: str | None = None) -> bool:
+        with self._lock:
+            if replaced_path is None:
+                cursor = self._connection.execute(
+                    "INSERT INTO content_index (gallery, content_hash, file_path, is_pending, claimed_at) "
+                    "VALUES (?, ?, ?, 1, ?) ON CONFLICT (gallery, content_hash) DO UPDATE SET "
+                    "file_path = excluded.file_path, claimed_at = excluded.claimed_at "
+                    "WHERE is_pending = 1 AND claimed_at < ?",  # takes over an abandoned claim
+                    (self.gallery, content_hash, file_path, time.time(), self._get_lease_start()),
+                )
+            else:
+                cursor = self._connection.execute(
+                    "UPDATE content_index SET file_path = ?, is_pending = 1, claimed_at = ? "
+                    "WHERE gallery = ? AND content_hash = ? AND file_path = ? AND is_pending = 0",
+                    (file_path, time.time(), self.gallery, content_hash, replaced_path),
+                )
+            return cursor.rowcount == 1
+
+    def commit(self, content_hash: str, file_path: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE content_index SET is_pending = 0 WHERE gallery = ? AND content_hash = ? AND file_path = ?",
+                (self.gallery, content_hash, file_path),
+            )
+
+    def release(self, content_hash: str, file_path: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM content_index WHERE gallery = ? AND content_hash = ? AND file_path = ? AND is_pending = 1",
+                (self.gallery, content_hash, file_path),
+            )
+
+    def reserve_path(self, file_path: str) -> bool:
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO reserved_paths (gallery, file_path, claimed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (gallery, file_path) DO UPDATE SET claimed_at = excluded.claimed_at "
+                "WHERE claimed_at < ?",
+                (self.gallery, file_path, time.time(), self._get_lease_start()),
+            )
+            return cursor.rowcount == 1
+
+    def release_path(self, file_path: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM reserved_paths WHERE gallery = ? AND file_path = ?", (self.gallery, file_path)
+            )
+
+    def add_reference(self, file_path: str, stored_path: str) -> bool:
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO content_references (gallery, file_path, stored_path) VALUES (?, ?, ?) "
+                "ON CONFLICT (gallery, file_path) DO NOTHING",
+                (self.gallery, file_path, stored_path),
+            )
+            return cursor.rowcount == 1
+
+    def resolve(self, file_path: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT stored_path FROM content_references WHERE gallery = ? AND file_path = ?",
+                (self.gallery, file_path),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _get_lease_start(self) -> float:
+        return time.time() - self.lease_seconds
+
+
+class S3ContentIndex(ContentIndexBase):
+    """ Index stored in the bucket next to the gallery, as one small object per content hash holding its path and
+        whether it is pending, one empty object per reserved path under 'paths/', and one object per reference under
+        'references/' holding the path the image is stored at.
+        Every change is a conditional write (If-None-Match, or If-Match on the ETag that was read), so concurrent
+        containers never both claim the same content or path. Leases are measured from the object's LastModified.
+    """
+    CLAIMED_ERROR_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412", "409")
+    MISSING_ERROR_CODES = ("404", "NoSuchKey", "NotFound")
+
+    def __init__(self, bucket_name: str, prefix: str, s3_client=None, lease_seconds=CONTENT_CLAIM_LEASE_SECONDS):
+        from botocore.exceptions import ClientError  # only imported when the index is used, like boto3
+
+        super().__init__(lease_seconds)
+        self._client_error = ClientError
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self._s3_client = s3_client
+        self._lock = threading.Lock()
+
+    @property
+    def s3_client(self):
+        with self._lock:
+            if self._s3_client is None:
+                import boto3
+                self._s3_client = boto3.client("s3")
+        return self._s3_client
+
+    def _get_key(self, content_hash: str) -> str:
+        return f"{self.prefix}{content_hash}"
+
+    def _get_path_key(self, file_path: str) -> str:
+        return f"{self.prefix}paths/{file_path}"
+
+    def _get_reference_key(self, file_path: str) -> str:
+        return f"{self.prefix}references/{file_path}"
+
+    def get(self, content_hash: str) -> IndexedContent | None:
+        entry = self._read(self._get_key(content_hash))
+        if entry is None or (entry.content.is_pending and self._is_expired(entry.last_modified)):
+            return None
+        return entry.content
+
+    def claim(self, content_hash: str, file_path: str, replaced_path: str | None = None) -> bool:
+        key = self._get_key(content_hash)
+        body = self._encode(IndexedContent(file_path, is_pending=True))
+        if replaced_path is None and self._put(key, body, IfNoneMatch="*"):
+            return True
+
+        entry = self._read(key)
+        if entry is None:  # released in the meantime
+            return replaced_path is None and self._put(key, body, IfNoneMatch="*")
+        if replaced_path is None:
+            is_claimable = entry.content.is_pending and self._is_expired(entry.last_modified)
+        else:
+            is_claimable = not entry.content.is_pending and entry.content.file_path == replaced_path
+        return is_claimable and self._put(key, body, IfMatch=entry.etag)
+
+    def commit(self, content_hash: str, file_path: str) -> None:
+        key = self._get_key(content_hash)
+        entry = self._read(key)
+        if entry is not None and entry.content == IndexedContent(file_path, is_pending=True):
+            self._put(key, self._encode(IndexedContent(file_path, is_pending=False)), IfMatch=entry.etag)
+
+    def release(self, content_hash: str, file_path: str) -> None:
+        key = self._get_key(content_hash)
+        entry = self._read(key)
+        if entry is not None and entry.content == IndexedContent(file_path, is_pending=True):
+            self._delete(key, IfMatch=entry.etag)
+
+    def reserve_path(self, file_path: str) -> bool:
+        key = self._get_path_key(file_path)
+        if self._put(key, b"", IfNoneMatch="*"):
+            return True
+
+        entry = self._read(key)
+        if entry is None:
+            return self._put(key, b"", IfNoneMatch="*")
+        return self._is_expired(entry.last_modified) and self._put(key, b"", IfMatch=entry.etag)
+
+    def release_path(self, file_path: str) -> None:
+        self._delete(self._get_path_key(file_path))
+
+    def add_reference(self, file_path: str, stored_path: str) -> bool:
+        body = self._encode(IndexedContent(stored_path, is_pending=False))
+        return self._put(self._get_reference_key(file_path), body, IfNoneMatch="*")
+
+    def resolve(self, file_path: str) -> str | None:
+        entry = self._read(self._get_reference_key(file_path))
+        return entry.content.file_path if entry is not None else None
+
+    def _read(self, key: str):
+        """ The object's content, ETag and LastModified, or None if it doesn't exist """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        except self._client_error as error:
+            if error.response.get("Error", {}).get("Code") in self.MISSING_ERROR_CODES:
+                return None
+            raise
+        return _IndexObject(self._decode(response["Body"].read()), response["ETag"], response["LastModified"])
+
+    def _put(self, key: str, body: bytes, **conditions) -> bool:
+        """ Writes the object if the conditions hold
+
+        Returns:
+            False if another container changed the object first
+        """
+        try:
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=body, **conditions)
+        except self._client_error as error:
+            if error.response.get("Error", {}).get("Code") in self.CLAIMED_ERROR_CODES:
+                return False
+            raise
+        return True
+
+    def _delete(self, key: str, **conditions) -> None:
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=key, **conditions)
+        except self._client_error as error:
+            if error.response.get("Error", {}).get("Code") not in self.CLAIMED_ERROR_CODES + self.MISSING_ERROR_CODES:
+                raise
+
+    def _is_expired(self, last_modified: datetime) -> bool:
+        return (datetime.now(timezone.utc) - last_modified).total_seconds() > self.lease_seconds
+
+    @staticmethod
+    def _encode(content: IndexedContent) -> bytes:
+        return json.dumps({"file_path": content.file_path, "is_pending": content.is_pending}).encode()
+
+    @staticmethod
+    def _decode(body: bytes) -> IndexedContent:
+        data = json.loads(body) if body else {}  # reserved paths are empty objects
+        return IndexedContent(data.get("file_path"), data.get("is_pending", False))
+
+
+class _IndexObject(NamedTuple):
+    content: IndexedContent
+    etag: str
+    last_modified: datetime
+
+
+def spool_and_hash(stream, chunk_size=IMAGE_CHUNK_SIZE, max_memory=CONTENT_SPOOL_MAX_MEMORY):
+    """ Reads the stream into a spooled file (on disk once larger than `max_memory`), hashing it on the way,
+        so the content is known before deciding whether and where to save it
+
+    Returns:
+        The spooled file, rewound, and the SHA-256 hex digest of the content
+    """
+    content_hash = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        while chunk := stream.read(chunk_size):
+            content_hash.update(chunk)
+            spool.write(chunk)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool, content_hash.hexdigest()
+
+
+def create_content_index(index_type, gallery_path=None, sqlite_path=None, **credentials) -> ContentIndexBase | None:
+    """ Creates the content index of an app's gallery - `None` ("sqlite" or "s3" otherwise) turns it off """
+    if index_type is None:
+        return None
+    elif index_type == "sqlite":
+        return SQLiteContentIndex(sqlite_path, gallery=credentials["slack_app_id"])
+    elif index_type == "s3":
+        prefix = f"{gallery_path}/.content-index/" if gallery_path else ".content-index/"
+        return S3ContentIndex(credentials["bucket_name"], prefix)
+    else:
+        raise NotImplementedError(f"Unknown content index: {index_type}")
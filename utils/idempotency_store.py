@@ -0,0 +1,116 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from utils.ttl_cache import TTLCache
+
+
+class IdempotencyStoreBase(ABC):
+    """ Abstract base class for stores remembering which events were already accepted, so redelivered events
+        are only processed once. Keys expire after a time to live.
+    """
+
+    @abstractmethod
+    def claim(self, key: str) -> bool:
+        """ Abstract method recording the key
+
+        Returns:
+            True if the key is new and the caller should process the event
+            False if the key was already claimed
+        """
+        pass
+
+    @abstractmethod
+    def release(self, key: str) -> None:
+        """ Abstract method forgetting the key, e.g. when processing failed and a retry should go through """
+        pass
+
+    def claim_all(self, keys: list[str]) -> bool:
+        """ Claims every key, releasing the ones claimed so far when one of them is already taken """
+        claimed = []
+        for key in keys:
+            if not self.claim(key):
+                for claimed_key in claimed:
+                    self.release(claimed_key)
+                return False
+            claimed.append(key)
+        return True
+
+    def release_all(self, keys: list[str]) -> None:
+        for key in keys:
+            self.release(key)
+
+
+class InMemoryIdempotencyStore(IdempotencyStoreBase):
+    """ LRU store that lives as long as the (warm) container """
+
+    def __init__(self, ttl_seconds: float, max_size=10000):
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def claim(self, key: str) -> bool:
+        return self._cache.add(key)
+
+    def release(self, key: str) -> None:
+        self._cache.discard(key)
+
+
+class SQLiteIdempotencyStore(IdempotencyStoreBase):
+    """ Store in a SQLite file, shared by every process that can reach the file - a local stand-in for
+        a shared store such as DynamoDB or Firestore
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, clock=time.time):
+        import sqlite3  # only imported when the shared store is used, to keep cold starts short
+
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS claimed_keys (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> bool:
+        now = self._clock()
+        with self._lock:
+            self._connection.execute("DELETE FROM claimed_keys WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO claimed_keys (key, expires_at) VALUES (?, ?)", (key, now + self.ttl_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM claimed_keys WHERE key = ?", (key,))
+
+    def remove_expired(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM claimed_keys WHERE expires_at <= ?", (self._clock(),))
+
+
+class LayeredIdempotencyStore(IdempotencyStoreBase):
+    """ Answers repeated keys from the in-memory store without touching the shared store behind it """
+
+    def __init__(self, local_store: IdempotencyStoreBase, shared_store: IdempotencyStoreBase):
+        self.local_store = local_store
+        self.shared_store = shared_store
+
+    def claim(self, key: str) -> bool:
+        if not self.local_store.claim(key):
+            return False
+        return self.shared_store.claim(key)  # a key claimed elsewhere stays claimed locally
+
+    def release(self, key: str) -> None:
+        self.shared_store.release(key)
+        self.local_store.release(key)
+
+
+def create_idempotency_store(ttl_seconds, max_size=10000, shared_store=None, sqlite_path=None) -> IdempotencyStoreBase:
+    """ Creates the in-memory store, in front of a shared store when one is set ("sqlite") """
+    local_store = InMemoryIdempotencyStore(ttl_seconds=ttl_seconds, max_size=max_size)
+    if shared_store is None:
+        return local_store
+    elif shared_store == "sqlite":
+        return LayeredIdempotencyStore(local_store, SQLiteIdempotencyStore(sqlite_path, ttl_seconds=ttl_seconds))
+    else:
+        raise NotImplementedError(f"Unknown idempotency store: {shared_store}")
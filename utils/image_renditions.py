@@ -0,0 +1,115 @@
+import io
+import multiprocessing
+import posixpath
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image, ImageOps  # requires the `Pillow` dependency, only imported when IMAGE_RENDITIONS are set
+
+from config import IMAGE_RENDITIONS, RENDITION_PROCESSES
+from utils.blocking_io import get_blocking_io_executor
+
+_processor = None
+_processor_lock = threading.Lock()
+
+# Pillow format -> file extension of the rendition
+EXTENSIONS = {
+    "avif": "avif",
+    "jpeg": "jpg",
+    "png": "png",
+    "webp": "webp",
+}
+# formats without an alpha channel
+OPAQUE_FORMATS = ("jpeg",)
+# the process is multi-threaded (server workers, I/O pools), and a forked child could inherit a lock held by a thread
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def get_rendition_path(file_path: str, rendition: dict) -> str:
+    """ The rendition is saved next to the original, e.g. 'gallery/photo.jpg' -> 'gallery/photo-medium.webp' """
+    stem = posixpath.splitext(file_path)[0]
+    return f"{stem}-{rendition['name']}.{EXTENSIONS[rendition['format'].lower()]}"
+
+
+def create_renditions(image_data: bytes, file_path: str, renditions: list[dict]) -> dict:
+    """ Decodes the image once and encodes each rendition - CPU bound, so it runs in a worker process.
+        Renditions are rotated upright and saved without the EXIF metadata (location, camera, ...).
+
+    Returns:
+        The data of each rendition, by rendition path
+    """
+    with Image.open(io.BytesIO(image_data)) as original:
+        image = ImageOps.exif_transpose(original)  # the orientation is lost with the EXIF data
+        image.load()
+
+    rendered = {}
+    for rendition in renditions:
+        image_format = rendition["format"].lower()
+        resized = image.copy()
+        resized.thumbnail((rendition["max_size"], rendition["max_size"]))  # keeps the aspect ratio, never enlarges
+        if image_format in OPAQUE_FORMATS and resized.mode not in ("RGB", "L"):
+            resized = resized.convert("RGB")
+        elif resized.mode not in ("RGB", "RGBA", "L", "LA"):
+            resized = resized.convert("RGBA")
+
+        buffer = io.BytesIO()
+        resized.save(
+            buffer,
+            format=image_format,
+            quality=rendition.get("quality", 80),
+            icc_profile=image.info.get("icc_profile"),  # colors stay the same, unlike the rest of the metadata
+        )
+        rendered[get_rendition_path(file_path, rendition)] = buffer.getvalue()
+    return rendered
+
+
+class RenditionProcessor:
+    """ Creates the configured renditions of images (sizes and formats) in a pool of worker processes,
+        so encoding doesn't hold up the uploads and downloads of other events
+    """
+
+    def __init__(self, renditions=IMAGE_RENDITIONS, processes=RENDITION_PROCESSES):
+        self.renditions = [dict(rendition) for rendition in renditions]
+        for rendition in self.renditions:
+            if rendition["format"].lower() not in EXTENSIONS:
+                raise ValueError(
+                    f"Unknown rendition format '{rendition['format']}', expected one of {list(EXTENSIONS)}."
+                )
+        self._processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # without processes (e.g. on AWS Lambda, which lacks the shared memory a process pool needs)
+                # the renditions are encoded on the blocking I/O threads
+                self._executor = ProcessPoolExecutor(
+                    self._processes, mp_context=multiprocessing.get_context(START_METHOD)
+                ) if self._processes else get_blocking_io_executor()
+        return self._executor
+
+    def submit(self, image_data: bytes, file_path: str) -> Future:
+        """ Starts creating the renditions of the image
+
+        Returns:
+            A future of the data of each rendition, by rendition path
+        """
+        return self.executor.submit(create_renditions, image_data, file_path, self.renditions)
+
+    def close(self) -> None:
+        """ Stops the worker processes once the submitted renditions are done - they are started again when needed """
+        with self._lock:
+            if self._processes and self._executor is not None:
+                self._executor.shutdown()
+            self._executor = None
+
+
+def get_rendition_processor() -> RenditionProcessor:
+    """ The processor shared by every event handler in the process, created on first use """
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = RenditionProcessor()
+        return _processor
@@ -0,0 +1,8 @@
+import importlib
+
+
+def import_object(path: str):
+    """ Imports an object from its "package.module:attribute" path, so it is only loaded once it is needed """
+    module_name, _, attribute = path.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute) if attribute else module
@@ -0,0 +1,129 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from config import METRICS_NAMESPACE, METRICS_SINK, SOURCE_CONNECTION
+
+
+class MetricsSinkBase(ABC):
+    """ Where the metric records of events end up """
+
+    @abstractmethod
+    def emit(self, record: dict) -> None:
+        pass
+
+
+class PrintMetricsSink(MetricsSinkBase):
+    """ Prints each record as one JSON line. CloudWatch extracts the metrics from the `_aws` (EMF) key,
+        and Cloud Logging turns the line into a structured `jsonPayload` (`severity` and `message` included).
+    """
+
+    def emit(self, record: dict) -> None:
+        print(json.dumps(record, default=str), flush=True)
+
+
+class ListMetricsSink(MetricsSinkBase):
+    """ Keeps the records in memory, for tests and local runs """
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record: dict) -> None:
+        self.records.append(record)
+
+
+def get_backend_name(connection=SOURCE_CONNECTION) -> str:
+    """ e.g. "s3", or "s3+sftp" when saving to several destinations """
+    return connection if isinstance(connection, str) else "+".join(connection)
+
+
+class EventMetrics:
+    """ Stage timings and outcome counters of one event, emitted as a single structured log record
+        in the CloudWatch Embedded Metric Format (EMF). Without a sink nothing is emitted.
+    """
+    DURATION_UNIT = "Milliseconds"
+    COUNT_UNIT = "Count"
+    BYTES_UNIT = "Bytes"
+
+    def __init__(self, sink=None, namespace=METRICS_NAMESPACE, dimensions=None, clock=time.perf_counter, **properties):
+        self.sink = sink
+        self.namespace = namespace
+        self.dimensions = dimensions if dimensions is not None else {"Backend": get_backend_name()}
+        self.properties = properties
+        self._clock = clock
+        self._metrics = {}  # name -> (value, unit)
+
+    @contextmanager
+    def time(self, stage: str):
+        """ Records the duration of the block as `<stage>_ms`, also when it raises """
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add_duration(stage, self._clock() - start)
+
+    def add_duration(self, stage: str, seconds: float) -> None:
+        name = f"{stage}_ms"
+        value, _ = self._metrics.get(name, (0, None))
+        self._metrics[name] = (value + seconds * 1000, self.DURATION_UNIT)
+
+    def count(self, name: str, value: int = 1) -> None:
+        current, _ = self._metrics.get(name, (0, None))
+        self._metrics[name] = (current + value, self.COUNT_UNIT)
+
+    def set_bytes(self, name: str, value: int) -> None:
+        self._metrics[name] = (value, self.BYTES_UNIT)
+
+    def set_property(self, name: str, value) -> None:
+        """ Searchable in the logs, but not a metric """
+        self.properties[name] = value
+
+    def get(self, name: str, default=None):
+        value, _ = self._metrics.get(name, (default, None))
+        return value
+
+    def to_record(self) -> dict:
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [list(self.dimensions)],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in self._metrics.items()],
+                }],
+            },
+            "severity": "INFO",
+            "message": "event metrics",
+            **self.properties,
+            **self.dimensions,
+            **{name: value for name, (value, _) in self._metrics.items()},
+        }
+
+    def emit(self) -> None:
+        if self.sink is not None:
+            self.sink.emit(self.to_record())
+
+
+_metrics_sink = PrintMetricsSink() if METRICS_SINK == "print" else None
+
+
+def get_metrics_sink():
+    return _metrics_sink
+
+
+def set_metrics_sink(sink) -> None:
+    """ Replaces where event metrics are emitted to - `None` turns them off """
+    global _metrics_sink
+    _metrics_sink = sink
+
+
+def create_event_metrics(request_data: dict) -> EventMetrics:
+    """ Metrics of an event callback (or queued job), identified by its app, event and file """
+    event = request_data.get("event", {})
+    return EventMetrics(
+        sink=get_metrics_sink(),
+        slack_app_id=request_data.get("api_app_id"),
+        event_id=request_data.get("event_id"),
+        file_id=event.get("file_id"),
+    )
@@ -2,7 +2,9 @@ class ErrorMessages:
     WRONG_EVENT_TYPE = "The event type cannot be handled."
     EVENT_HANDLED_SUCCESSFULLY = "File event handled successfully."
     FILE_EXISTS = "File already exists at the specified directory."
+    CONTENT_EXISTS = "An identical file already exists in the gallery."
     FILE_FORMAT_ERROR = "Cannot accept file format."
+    FILE_TOO_LARGE = "File is larger than the maximum download size."
     SLACK_RETRIEVAL_ERROR = "There was an error retrieving the file data from Slack API."
     WRONG_CHANNEL_ERROR = "File was not found in expected channels."
 
@@ -19,6 +21,10 @@ class FileFormatError(Exception):
     pass
 
 
+class FileTooLargeError(Exception):
+    pass
+
+
 class SlackApiError(Exception):
     pass
 
@@ -37,3 +43,9 @@ class SFTPAuthenticationError(Exception):
 
 class SFTPTimeoutError(Exception):
     pass
+
+
+class DestinationWriteError(Exception):
+    def __init__(self, message, failures: dict):
+        super().__init__(message)
+        self.failures = failures  # destination name -> error
@@ -0,0 +1,87 @@
+import io
+import queue
+
+from config import IMAGE_CHUNK_SIZE, FAN_OUT_CHUNKS_IN_MEMORY
+
+
+class StreamPipe(io.RawIOBase):
+    """ Read end of a `StreamFanOut`, one per reader. At most `max_chunks` chunks wait to be read,
+        so a slow reader holds back the source instead of the stream piling up in memory.
+    """
+    END = object()
+
+    def __init__(self, max_chunks=FAN_OUT_CHUNKS_IN_MEMORY):
+        super().__init__()
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._buffer = b""
+        self._is_finished = False
+        self.is_abandoned = False  # the reader closed the pipe before the end of the stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        """ Fills the buffer as far as the data allows, like `ChunkedStream`. Errors of the source are raised here. """
+        size = 0
+        while size < len(buffer) and not self._is_finished:
+            if not self._buffer:
+                chunk = self._chunks.get()
+                if chunk is self.END:
+                    self._is_finished = True
+                elif isinstance(chunk, Exception):
+                    self._is_finished = True
+                    raise chunk
+                else:
+                    self._buffer = chunk
+                continue
+
+            copied = min(len(buffer) - size, len(self._buffer))
+            buffer[size:size + copied] = self._buffer[:copied]
+            self._buffer = self._buffer[copied:]
+            size += copied
+        return size
+
+    def put(self, chunk) -> bool:
+        """ Hands a chunk (or `END`, or the error of the source) to the reader, waiting while the pipe is full
+
+        Returns:
+            False if the reader has abandoned the pipe
+        """
+        if self.is_abandoned:
+            return False
+        self._chunks.put(chunk)
+        return True
+
+    def close(self) -> None:
+        if not self._is_finished:
+            self.is_abandoned = True
+            while not self._chunks.empty():  # unblocks a `put` waiting on the full pipe
+                self._chunks.get_nowait()
+        super().close()
+
+
+class StreamFanOut:
+    """ Reads a stream once and hands every chunk to several readers, e.g. to upload one download to several
+        destinations at the same time. The slowest reader sets the pace, and one that stops reading (a failed
+        upload) is skipped from then on.
+    """
+
+    def __init__(self, source, readers: int, chunk_size=IMAGE_CHUNK_SIZE, max_chunks=FAN_OUT_CHUNKS_IN_MEMORY):
+        self._source = source
+        self._chunk_size = chunk_size
+        self.pipes = [StreamPipe(max_chunks) for _ in range(readers)]
+
+    def pump(self) -> None:
+        """ Copies the source into the pipes until it ends or every reader has stopped, on the calling thread
+            while the readers run on others
+        """
+        end = StreamPipe.END
+        try:
+            while chunk := self._source.read(self._chunk_size):
+                is_read = [pipe.put(chunk) for pipe in self.pipes]
+                if not any(is_read):
+                    return
+        except Exception as err:
+            end = err
+        for pipe in self.pipes:
+            pipe.put(end)
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """ Thread-safe, size-bounded LRU cache whose entries expire after `ttl_seconds` """
+
+    def __init__(self, max_size=1024, ttl_seconds=300, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict_expired()
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value=True) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def add(self, key, value=True) -> bool:
+        """ Stores the entry only if the key isn't already cached
+
+        Returns:
+            True if the entry was added
+            False if an unexpired entry already exists
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                return False
+            self._store(key, value)
+            return True
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, value) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _evict_expired(self) -> None:
+        now = self._clock()
+        expired_keys = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired_keys:
+            del self._entries[key]
+
+
+_MISSING = object()
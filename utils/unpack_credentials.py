@@ -1,4 +1,6 @@
 import json
+import os
+import threading
 
 
 def get_credential_list(path: str) -> dict:
@@ -8,8 +10,79 @@ def get_credential_list(path: str) -> dict:
     return credentials
 
 
+def index_credentials(credential_list: list) -> dict:
+    """ Indexes a list of app credentials by their Slack app id """
+    return {credentials["slack_app_id"]: credentials for credentials in credential_list}
+
+
+class CredentialStore:
+    """ Holds the app credentials indexed by Slack app id, so a lookup doesn't depend on how many apps are registered.
+
+        The credentials are read from (in order of precedence):
+            * `loader` - any callable returning the list of app credentials, e.g. a secrets manager request
+            * `env_var` - an environment variable holding the credentials JSON, when it is set - it is only read on the
+              first lookup, as the environment of a running function doesn't change (`reload` reads it again)
+            * `path` - the credentials JSON file, which is only re-read when its modified time or size changes
+    """
+
+    def __init__(self, path=None, env_var=None, loader=None):
+        self._path = path
+        self._env_var = env_var
+        self._loader = loader
+        self._index = None
+        self._source_signature = None
+        self._env_value = None
+        self._lock = threading.Lock()
+
+    def get(self, app_id: str) -> dict | None:
+        return self._get_index().get(app_id)
+
+    def get_all(self) -> list[dict]:
+        """ The credentials of every registered app """
+        return list(self._get_index().values())
+
+    def reload(self) -> None:
+        """ Forces the credentials to be read again on the next lookup """
+        with self._lock:
+            self._index = None
+            self._source_signature = None
+            self._env_value = None
+
+    def _get_index(self) -> dict:
+        signature = self._get_source_signature()
+        with self._lock:
+            if self._index is None or signature != self._source_signature:
+                self._index = index_credentials(self._load_credential_list())
+                self._source_signature = signature
+            return self._index
+
+    def _get_source_signature(self):
+        """ A cheap value that changes whenever the credential source changes """
+        if self._loader is not None:
+            return "loader"
+        if self._read_env_var():
+            return "env"
+        file_stats = os.stat(self._path)
+        return "file", file_stats.st_mtime_ns, file_stats.st_size
+
+    def _load_credential_list(self) -> list:
+        if self._loader is not None:
+            return self._loader()
+        if self._read_env_var():
+            return json.loads(self._env_value)
+        return get_credential_list(self._path)
+
+    def _read_env_var(self) -> str:
+        """ The credentials JSON of the environment variable ("" when it isn't set), read once """
+        if self._env_value is None:
+            self._env_value = os.environ.get(self._env_var, "") if self._env_var else ""
+        return self._env_value
+
+
+_credential_stores = {}
+
+
 def get_app_credentials(app_id: str, path: str) -> dict | None:
-    credential_list = get_credential_list(path)
-    app_credentials = [credentials for credentials in credential_list if app_id == credentials["slack_app_id"]]
-    if app_credentials:
-        return app_credentials[0]
+    if path not in _credential_stores:
+        _credential_stores[path] = CredentialStore(path=path)
+    return _credential_stores[path].get(app_id)